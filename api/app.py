@@ -1,22 +1,32 @@
+# 起動時間を計測するため、他のモジュールより先に読み込む
+from startup import startup_report
+
+import os
+
 from flask import Flask
-from flask_debugtoolbar import DebugToolbarExtension
 
+from cache import response_cache
 from model.models import db
 from routes import main_routes, api_routes
+from run_coordinator import run_coordinator
 from config import config
 
 
 app = Flask(__name__)
-# 設定を読み込み
-app.config.from_object(config["development"])
+# 設定を読み込み（FLASK_CONFIG: development / testing / production）
+app.config.from_object(config[os.environ.get("FLASK_CONFIG", "development")])
 
+# from flask_debugtoolbar import DebugToolbarExtension
 # toolbar = DebugToolbarExtension(app)
 
 db.init_app(app)
+response_cache.init_app(app)
+run_coordinator.init_app(app)
 
 # ルーティングの登録（Blueprintを利用）
 app.register_blueprint(main_routes.bp)
 app.register_blueprint(api_routes.bp)
+startup_report.init_app(app)
     
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
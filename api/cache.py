@@ -0,0 +1,154 @@
+"""読み取り専用APIのレスポンスキャッシュ
+
+データが変わるのはスクレイプ完了時だけなので、レスポンスを
+「スクレイプ世代番号 + パス + クエリ文字列」をキーにキャッシュする。スクレイパーが
+close_spider で ScrapeGeneration.generation を進めるとキーが変わり、古いキャッシュは
+使われなくなる（LRU / TTL で自然に消える）。
+
+世代番号の確認は CACHE_GENERATION_CHECK_INTERVAL 秒に1回だけ行うため、その間の
+キャッシュヒットはDBに接続しない（スクレイプ完了後、最大でその秒数だけ古いレスポンスを返す）。
+利用者が変更する通知設定のレスポンスはキャッシュしない。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, make_response, request
+
+from model.models import ScrapeGeneration, db
+
+
+# 定数定義
+DEFAULT_TTL = 3600  # キャッシュの有効期間（秒）
+DEFAULT_MAX_ENTRIES = 512  # プロセス内キャッシュの最大件数
+DEFAULT_GENERATION_CHECK_INTERVAL = 60  # 世代番号をDBに確認する間隔（秒）
+SCRAPE_GENERATION_ID = 1  # ScrapeGeneration は1行のみ
+REDIS_KEY_PREFIX = "dell-price-check:response"
+
+
+class TTLCache:
+    """有効期限付きのLRUキャッシュ（スレッドセーフ）"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: dict, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisCache:
+    """Redis互換サーバーを使うキャッシュ（複数プロセス・Lambdaインスタンス間で共有）"""
+
+    def __init__(self, url: str):
+        import redis  # 使う場合のみ必要な依存関係
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> dict | None:
+        value = self.client.get(f"{REDIS_KEY_PREFIX}:{key}")
+        return json.loads(value) if value else None
+
+    def set(self, key: str, value: dict, ttl: float) -> None:
+        self.client.set(f"{REDIS_KEY_PREFIX}:{key}", json.dumps(value), ex=int(ttl))
+
+
+class ResponseCache:
+    """スクレイプ世代番号で無効化するレスポンスキャッシュ（ETag / If-None-Match 対応）"""
+
+    def __init__(self, app=None):
+        self.backend = TTLCache()
+        self.ttl = DEFAULT_TTL
+        self.check_interval = DEFAULT_GENERATION_CHECK_INTERVAL
+        self._generation = 0
+        self._checked_at = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """アプリの設定（CACHE_*）を読み込む。"""
+        self.ttl = app.config.get("CACHE_TTL", DEFAULT_TTL)
+        self.check_interval = app.config.get("CACHE_GENERATION_CHECK_INTERVAL",
+                                             DEFAULT_GENERATION_CHECK_INTERVAL)
+        self.backend = TTLCache(app.config.get("CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        redis_url = app.config.get("CACHE_REDIS_URL")
+        if redis_url:
+            try:
+                self.backend = RedisCache(redis_url)
+            except ImportError:
+                app.logger.warning("redis がインストールされていないため、プロセス内キャッシュを使用します")
+        app.extensions["response_cache"] = self
+
+    def generation(self) -> int:
+        """現在のスクレイプ世代番号を返す（DBへの確認は check_interval 秒に1回）。"""
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return self._generation
+            try:
+                generation = db.session.query(ScrapeGeneration.generation).filter_by(
+                    id=SCRAPE_GENERATION_ID).scalar()
+                self._generation = generation or 0
+            except Exception as e:
+                # DBに接続できない・テーブルが無い場合は前回の世代番号のまま使う
+                # （PostgreSQLでは失敗したトランザクションのままだと同じリクエストの後続のクエリも失敗するため戻す）
+                db.session.rollback()
+                current_app.logger.warning(f"スクレイプ世代番号の取得エラー: {e}")
+            self._checked_at = now
+            return self._generation
+
+    def skip(self) -> None:
+        """現在のリクエストのレスポンスをキャッシュしない（エラー時のフォールバック表示など）。"""
+        g.skip_response_cache = True
+
+    def cached(self, view):
+        """GETリクエストのレスポンス（200のみ）をキャッシュするデコレータ"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = f"{self.generation()}:{request.full_path}"
+            entry = self.backend.get(key)
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or g.get("skip_response_cache"):
+                    return response
+                body = response.get_data()
+                entry = {
+                    "body": body.decode("utf-8"),
+                    "mimetype": response.mimetype,
+                    "etag": hashlib.sha1(body).hexdigest(),
+                }
+                self.backend.set(key, entry, self.ttl)
+
+            response = current_app.response_class(entry["body"], mimetype=entry["mimetype"])
+            response.set_etag(entry["etag"])
+            # ブラウザは毎回 If-None-Match で再検証し、変更がなければ 304 を受け取る
+            response.cache_control.no_cache = True
+            return response.make_conditional(request)
+        return wrapper
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,22 @@
+"""外部サービスのクライアント（初回使用時に作成し、ウォームスタート間で使い回す）"""
+from __future__ import annotations
+
+import threading
+
+AWS_REGION = "ap-northeast-1"
+CLUSTER_NAME = "scraping-ecs-cluster"  # スクレイピングを実行するECSクラスター
+
+_ecs_client = None
+_lock = threading.Lock()
+
+
+def get_ecs_client():
+    """ECSクライアントを取得（boto3 の読み込みとクライアント作成は初回のみ）"""
+    global _ecs_client
+    if _ecs_client is None:
+        with _lock:
+            if _ecs_client is None:
+                import boto3  # コールドスタート時の読み込みを避けるため、使うときに読み込む
+
+                _ecs_client = boto3.client("ecs", region_name=AWS_REGION)
+    return _ecs_client
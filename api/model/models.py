@@ -2,20 +2,173 @@ from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
 
+_ensured_tables: set[str] = set()  # このプロセスで存在を確認したテーブル
+
+
+def ensure_table(model) -> None:
+    """テーブルが無ければ作成する（スクレイパーがまだ一度も実行されていないDBでもAPIが動くようにする）。
+
+    確認はプロセスごとにテーブル1つにつき初回だけ行う。
+    """
+    if model.__tablename__ in _ensured_tables:
+        return
+    model.__table__.create(db.engine, checkfirst=True)
+    _ensured_tables.add(model.__tablename__)
+
 
 class Products(db.Model):
     __tablename__ = "Products"
+    __table_args__ = (
+        db.Index("ix_products_name_model", "name", "model"),  # name と model からの商品検索用
+        db.Index("ix_products_normalized_name_model", "normalized_name", "model"),  # 商品名ごとのグループ化用
+    )
     order_code = db.Column(db.String, primary_key=True, nullable=False)
     name = db.Column(db.String)
+    normalized_name = db.Column(db.String)  # 表記揺らぎを吸収した商品名（スクレイパーが設定）
     model = db.Column(db.String)
+    category = db.Column(db.String)  # 商品カテゴリ（スクレイパーが設定）
     url = db.Column(db.String)
     price = db.Column(db.Integer)
     scraped_at = db.Column(db.DateTime)
+    run_id = db.Column(db.String)  # 最後に一覧ページで見つかったクロールの実行ID（スクレイパーが設定）
     is_line_notification = db.Column(db.Boolean)
 
 class PriceHistory(db.Model):
+    """価格の変化点の履歴（scraped_at から valid_to までその価格。valid_to が NULL の行が現在の価格）"""
     __tablename__ = 'PriceHistory'
+    __table_args__ = (
+        db.Index("ix_price_history_order_code_scraped_at", "order_code", "scraped_at"),
+        db.Index("ix_price_history_run_id", "run_id"),
+    )
     id = db.Column(db.Integer, primary_key=True)  # 主キー
     order_code = db.Column(db.String(50), nullable=False)  # 注文コード
     price = db.Column(db.Float, nullable=False)  # 価格
-    scraped_at = db.Column(db.DateTime, nullable=False)  # スクレイプ日時
+    scraped_at = db.Column(db.DateTime, nullable=False)  # スクレイプ日時（この価格になった日時）
+    valid_to = db.Column(db.DateTime)  # 次の価格に変わった日時
+    run_id = db.Column(db.String)  # この行を追加したクロールの実行ID
+    valid_from = db.synonym("scraped_at")
+
+class PriceDailyRollup(db.Model):
+    """商品ごと・日ごとの価格の最小・最大・最終値（スクレイパーのパイプラインが更新）"""
+    __tablename__ = 'PriceDailyRollup'
+    order_code = db.Column(db.String, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    min_price = db.Column(db.Integer)
+    max_price = db.Column(db.Integer)
+    last_price = db.Column(db.Integer)
+
+class PriceWeeklyRollup(db.Model):
+    """商品ごと・週ごと（月曜始まり）の価格の最小・最大・最終値（スクレイパーのパイプラインが更新）"""
+    __tablename__ = 'PriceWeeklyRollup'
+    order_code = db.Column(db.String, primary_key=True)
+    week_start = db.Column(db.Date, primary_key=True)
+    min_price = db.Column(db.Integer)
+    max_price = db.Column(db.Integer)
+    last_price = db.Column(db.Integer)
+
+class ScrapeGeneration(db.Model):
+    """スクレイプ完了ごとに加算される世代番号（キャッシュ無効化用。id=1 の1行のみ）"""
+    __tablename__ = 'ScrapeGeneration'
+    id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime)
+
+class ScrapeTasks(db.Model):
+    """APIから起動したスクレイピング（ECSタスク）の記録（同じ種類の実行の重複起動を防ぐ）"""
+    __tablename__ = 'ScrapeTasks'
+    __table_args__ = (
+        db.Index("ix_scrape_tasks_trigger_started_at", "trigger", "started_at"),
+    )
+    task_arn = db.Column(db.String, primary_key=True)
+    trigger = db.Column(db.String, nullable=False)  # 起動したエンドポイント（check_price など）
+    run_id = db.Column(db.String)  # 同時に起動したタスク（分担クロールのワーカー）で共通の実行ID
+    status = db.Column(db.String)  # ECSタスクの最後に確認した状態
+    started_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime)
+
+
+class ScrapeRuns(db.Model):
+    """クロール1回ごとの処理時間と最大RSSの記録（スクレイパーが追加する）"""
+    __tablename__ = 'ScrapeRuns'
+    __table_args__ = (
+        db.Index("ix_scrape_runs_finished_at", "finished_at"),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    spider = db.Column(db.String, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    finish_reason = db.Column(db.String)
+    duration_seconds = db.Column(db.Float)
+    item_count = db.Column(db.Integer)
+    page_count = db.Column(db.Integer)
+    updated_count = db.Column(db.Integer)
+    download_avg_seconds = db.Column(db.Float)  # 一覧ページ1つあたりの平均取得時間
+    extraction_seconds = db.Column(db.Float)  # 商品の抽出時間の合計
+    db_flush_seconds = db.Column(db.Float)  # DBへの書き込み時間の合計
+    notification_avg_seconds = db.Column(db.Float)  # 通知を積んでから送信完了までの平均時間
+    peak_rss_mb = db.Column(db.Float)
+    report = db.Column(db.Text)  # 実行記録全体（JSON）
+
+
+class CrawlShards(db.Model):
+    """分担クロールの一覧ページの分担と、各ワーカーによる確保・完了の記録（スクレイパーが追加する）"""
+    __tablename__ = 'CrawlShards'
+    __table_args__ = (
+        db.UniqueConstraint("run_id", "category", "shard_index", name="uq_crawl_shards_run_category_index"),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    run_id = db.Column(db.String, nullable=False)
+    category = db.Column(db.String, nullable=False)
+    shard_index = db.Column(db.Integer, nullable=False)  # 0 は1ページ目（総ページ数の取得）
+    shard_count = db.Column(db.Integer, nullable=False)
+    first_page = db.Column(db.Integer, nullable=False)
+    last_page = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String, nullable=False)  # pending / claimed / done / failed
+    worker = db.Column(db.String)
+    claimed_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    item_count = db.Column(db.Integer)
+
+
+class PriceChanges(db.Model):
+    """クロール1回ごとの価格の変動（new / changed / disappeared。スクレイパーがクロールの終了時に追加する）"""
+    __tablename__ = 'PriceChanges'
+    __table_args__ = (
+        db.UniqueConstraint("run_id", "order_code", name="uq_price_changes_run_order_code"),
+        db.Index("ix_price_changes_detected_at", "detected_at"),
+    )
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    run_id = db.Column(db.String, nullable=False)
+    order_code = db.Column(db.String, nullable=False)
+    change_type = db.Column(db.String, nullable=False)
+    old_price = db.Column(db.Integer)
+    new_price = db.Column(db.Integer)
+    price_delta = db.Column(db.Integer)
+    percent_delta = db.Column(db.Float)
+    detected_at = db.Column(db.DateTime, nullable=False)
+    notified_at = db.Column(db.DateTime)
+
+
+class PriceChangeRuns(db.Model):
+    """価格の変動を検出済みの実行ID（スクレイパーが追加する）"""
+    __tablename__ = 'PriceChangeRuns'
+    run_id = db.Column(db.String, primary_key=True)
+    detected_at = db.Column(db.DateTime, nullable=False)
+    complete = db.Column(db.Integer)
+
+
+class ProductStats(db.Model):
+    """商品ごとの価格の統計（スクレイパーのパイプラインが更新）"""
+    __tablename__ = 'ProductStats'
+    order_code = db.Column(db.String, primary_key=True)
+    current_price = db.Column(db.Integer)
+    all_time_min_price = db.Column(db.Integer)
+    all_time_max_price = db.Column(db.Integer)
+    min_price_30d = db.Column(db.Integer)
+    avg_price_30d = db.Column(db.Float)
+    min_price_90d = db.Column(db.Integer)
+    avg_price_90d = db.Column(db.Float)
+    # 直近90日のうち、日ごとの最終価格が現在の価格より安かった日の割合（%。価格の分布のパーセンタイルではない）
+    price_percentile_90d = db.Column(db.Float)
+    last_changed_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_, tuple_
+
+from model.models import Products, PriceChanges, PriceHistory, ProductStats, ScrapeRuns, db
+from utils.text import normalize_name
+
+
+@dataclass
+class PriceTrend:
+    """1商品分の価格推移"""
+    name: str
+    model: str
+    order_code: str
+    url: str
+    points: list[tuple[datetime, float]] = field(default_factory=list)  # (日時, 価格) の時刻順
+
+
+def fetch_product_by_order_code(order_code: str) -> Products | None:
+    """order_code で該当する商品を取得"""
+    return db.session.query(Products).filter_by(order_code=order_code).first()
+
+
+def fetch_order_code(name: str, model: str) -> str | None:
+    """商品の name と model を用いて order_code を取得"""
+    product = db.session.query(Products.order_code).filter_by(name=name, model=model).first()
+    return product[0] if product else None
+
+
+def fetch_model_by_name(name: str) -> list[str]:
+    """商品名（表記揺らぎは同一視）に該当する model の一覧を取得"""
+    rows = (db.session.query(Products.model)
+            .filter(Products.normalized_name == normalize_name(name))
+            .distinct()
+            .order_by(Products.model))
+    return [model for (model,) in rows]
+
+
+def fetch_catalog() -> list[dict]:
+    """正規化した商品名ごとに、表示名と model の一覧をまとめたカタログを取得
+
+    Returns:
+        list[dict]: {"normalized_name", "name", "models"} の商品名順のリスト
+    """
+    rows = (db.session.query(Products.normalized_name, func.min(Products.name), Products.model)
+            .filter(Products.normalized_name.is_not(None))
+            .group_by(Products.normalized_name, Products.model)
+            .order_by(Products.normalized_name, Products.model))
+    catalog: dict[str, dict] = {}
+    for normalized_name, name, model in rows:
+        entry = catalog.setdefault(normalized_name,
+                                   {"normalized_name": normalized_name, "name": name, "models": []})
+        entry["name"] = min(entry["name"], name)  # 表記揺らぎがある場合も表示名を1つに決める
+        entry["models"].append(model)
+    return sorted(catalog.values(), key=lambda entry: entry["name"])
+
+
+def fetch_price_trend(name: str, model: str, start: datetime | None = None,
+                      end: datetime | None = None) -> PriceTrend | None:
+    """name と model に対応する商品の期間内の価格推移を取得（見つからない場合は None）"""
+    return fetch_price_trends([(name, model)], start, end).get((name, model))
+
+
+def fetch_price_trends(products: list[tuple[str, str]], start: datetime | None = None,
+                       end: datetime | None = None) -> dict[tuple[str, str], PriceTrend]:
+    """(name, model) の組ごとに、商品情報と期間内の価格推移を1回のクエリで取得
+
+    name は表記揺らぎを同一視して（正規化した商品名で）検索する。
+
+    価格履歴は変化点のみのため、start 時点で有効だった価格を start の点として先頭に、
+    最後に取得した日時（end 指定時は end まで）を終点として末尾に加える。
+    start が最後に取得した日時より後の場合は、その期間の価格は分からないため空の推移を返す。
+    """
+    # start 時点で有効だった行（valid_to が start より後）以降を取得する
+    history_conditions = [PriceHistory.order_code == Products.order_code]
+    if start:
+        history_conditions.append(or_(PriceHistory.valid_to.is_(None), PriceHistory.valid_to > start))
+    if end:
+        history_conditions.append(PriceHistory.scraped_at <= end)
+
+    requested = {(name, model): (normalize_name(name), model) for name, model in products}
+    rows = (
+        db.session.query(Products.normalized_name, Products.name, Products.model,
+                         Products.order_code, Products.url, Products.scraped_at.label("last_seen_at"),
+                         PriceHistory.scraped_at, PriceHistory.price)
+        .outerjoin(PriceHistory, and_(*history_conditions))
+        .filter(tuple_(Products.normalized_name, Products.model).in_(list(set(requested.values()))))
+        .order_by(Products.order_code, PriceHistory.scraped_at)
+    )
+
+    trends: dict[tuple[str, str], PriceTrend] = {}  # (正規化した商品名, model) ごと
+    last_seen: dict[tuple[str, str], datetime | None] = {}
+    for row in rows:
+        key = (row.normalized_name, row.model)
+        trend = trends.get(key)
+        if trend is None:
+            trend = trends[key] = PriceTrend(row.name, row.model, row.order_code, row.url)
+            last_seen[key] = row.last_seen_at
+        elif trend.order_code != row.order_code:
+            continue  # 同じ name と model の商品が複数ある場合は最初の1件のみ
+        if row.scraped_at is None:
+            continue
+        if start and row.scraped_at < start:
+            # start 以前の行は start 時点の価格として扱う（最後の1行が残る）
+            trend.points[:] = [(start, row.price)]
+        else:
+            trend.points.append((row.scraped_at, row.price))
+
+    for key, trend in trends.items():
+        last_seen_at = min(last_seen[key], end) if end and last_seen[key] else last_seen[key]
+        if start and last_seen_at and start > last_seen_at:
+            # 販売終了などで start 以降に取得していない商品に、取得していない期間の点を作らない
+            trend.points.clear()
+            continue
+        if trend.points and last_seen_at and trend.points[-1][0] < last_seen_at:
+            trend.points.append((last_seen_at, trend.points[-1][1]))
+    return {key: trends[normalized] for key, normalized in requested.items() if normalized in trends}
+
+
+def fetch_scrape_runs(limit: int) -> list[ScrapeRuns]:
+    """直近のクロールの実行記録を新しい順に取得"""
+    return (db.session.query(ScrapeRuns)
+            .order_by(ScrapeRuns.finished_at.desc())
+            .limit(limit)
+            .all())
+
+
+def fetch_latest_change_run() -> str | None:
+    """直近に価格の変動を検出したクロールの実行IDを取得（まだない場合は None）"""
+    return (db.session.query(PriceChanges.run_id)
+            .order_by(PriceChanges.detected_at.desc())
+            .limit(1)
+            .scalar())
+
+
+def fetch_price_changes(run_id: str, change_type: str | None, limit: int) -> tuple[dict, list[tuple]]:
+    """実行IDの価格の変動を、値下がり率の大きい順に商品情報と合わせて取得
+
+    Returns:
+        tuple[dict, list[tuple]]: (種類ごとの件数, (PriceChanges, name, model, url) のリスト)
+    """
+    counts = dict(db.session.query(PriceChanges.change_type, func.count())
+                  .filter(PriceChanges.run_id == run_id)
+                  .group_by(PriceChanges.change_type))
+    query = (db.session.query(PriceChanges, Products.name, Products.model, Products.url)
+             .outerjoin(Products, Products.order_code == PriceChanges.order_code)
+             .filter(PriceChanges.run_id == run_id))
+    if change_type:
+        query = query.filter(PriceChanges.change_type == change_type)
+    rows = (query.order_by(PriceChanges.percent_delta.is_(None), PriceChanges.percent_delta,
+                           PriceChanges.order_code)
+            .limit(limit)
+            .all())
+    return counts, rows
+
+
+# 価格の統計の並べ替えに使える項目（avg_90d_diff は90日平均からの差の割合）
+PRICE_STATS_SORT_KEYS = {
+    "percentile": ProductStats.price_percentile_90d,
+    "avg_90d_diff": (ProductStats.current_price - ProductStats.avg_price_90d) / ProductStats.avg_price_90d,
+    "price": ProductStats.current_price,
+    "last_changed_at": ProductStats.last_changed_at,
+    "name": Products.name,
+}
+
+
+def fetch_price_stats(category: str | None, sort: str, descending: bool,
+                      limit: int | None) -> list[tuple]:
+    """商品ごとの価格の統計を商品情報と合わせて取得（統計が無い商品・値が NULL の商品は末尾）
+
+    Returns:
+        list[tuple]: (ProductStats, name, model, url, category) のリスト
+    """
+    sort_column = PRICE_STATS_SORT_KEYS[sort]
+    query = (db.session.query(ProductStats, Products.name, Products.model, Products.url, Products.category)
+             .join(Products, Products.order_code == ProductStats.order_code))
+    if category:
+        query = query.filter(Products.category == category)
+    query = query.order_by(sort_column.is_(None), sort_column.desc() if descending else sort_column,
+                           ProductStats.order_code)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
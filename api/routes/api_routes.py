@@ -1,81 +1,119 @@
 from __future__ import annotations
 
-from datetime import datetime
+import json
+import os
+import uuid
 
-import boto3
-from flask import Blueprint, jsonify, request, render_template, Response
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
 
-from model.models import Products, PriceHistory, db
+from flask import Blueprint, current_app, jsonify, request, render_template, Response
 
+from cache import response_cache
+from model.models import Products, db
+from model.repository import (
+    PRICE_STATS_SORT_KEYS, fetch_catalog, fetch_latest_change_run, fetch_model_by_name, fetch_price_changes,
+    fetch_price_stats, fetch_price_trend, fetch_price_trends, fetch_product_by_order_code, fetch_scrape_runs
+)
+from run_coordinator import run_coordinator
+from task_status import NOT_FOUND_STATUS, task_status_poller
+from utils.downsampling import lttb
 
-bp = Blueprint("api", __name__, url_prefix="/api")
 
-ecs_client = boto3.client("ecs", region_name="ap-northeast-1") 
+bp = Blueprint("api", __name__, url_prefix="/api")
 
 # 定数定義
 NOTIFICATION_UPDATED_MSG = "通知設定を更新しました order_code: {}"
 PRODUCT_NOT_FOUND_MSG = "商品が見つかりません order_code: {}"
-CLUSTER_NAME = "scraping-ecs-cluster"
-TASK_FAMILY = "scraper-ecs-task"
-SUBNETS = ["subnet-0aeb6f09a8223f928", "subnet-08ababb4f6a70f6c1"]
-SECURITY_GROUPS =["sg-049f994ecd0660ac2"]
+DEFAULT_MAX_POINTS = 500  # 価格推移の既定の最大点数
+MAX_POINTS_LIMIT = 5000  # max_points に指定できる上限
+MIN_POINTS = 3  # 間引き後も先頭・末尾と1点以上を残す
+JST = timezone(timedelta(hours=9))  # スクレイパーは日本時間で保存している
+MAX_COMPARE_PRODUCTS = 10  # 価格推移を一度に比較できる商品数
+DEFAULT_SCRAPE_RUNS = 20  # 既定で返すクロールの実行記録の件数
+MAX_SCRAPE_RUNS = 100  # 一度に返すクロールの実行記録の上限
+DEFAULT_PRICE_CHANGES = 100  # 既定で返す価格の変動の件数
+MAX_PRICE_CHANGES = 1000  # 一度に返す価格の変動の上限
+CHANGE_TYPES = ("new", "changed", "disappeared")  # PriceChanges.change_type
+DEFAULT_PRICE_STATS_SORT = "percentile"  # 既定は直近90日の中で安い順
+STATUS_STREAM_TIMEOUT = 600  # タスクの状態を配信する最大時間（秒）
+IS_LAMBDA = bool(os.environ.get("AWS_LAMBDA_FUNCTION_NAME"))  # Lambda（Zappa）上では状態を配信し続けない
+TRIGGER_CHECK_PRICE = "check_price"  # ScrapeTasks.trigger に記録する実行の種類
+TRIGGER_NOTIFICATION_TEST = "notification_test"
+NOTIFICATION_TEST_ENVIRONMENT = {"NOTIFICATION_TEST_MODE": "1"}  # スクレイパーを通知テストモードで起動する
+MAX_SCRAPE_SHARDS = 10  # ECSの run_task で一度に起動できるタスク数の上限
 
 # ヘルパー関数
-def fetch_product_by_order_code(order_code: str) -> Products | None:
-    """order_code で該当する商品を取得"""
-    return db.session.query(Products).filter_by(order_code=order_code).first()
-
+def shard_task_options() -> dict:
+    """SCRAPE_SHARDS が2以上なら、同じ実行IDの分担クロールのワーカーとして複数のタスクを起動するオプションを返す"""
+    shards = min(current_app.config.get("SCRAPE_SHARDS", 1), MAX_SCRAPE_SHARDS)
+    if shards <= 1:
+        return {}
+    run_id = uuid.uuid4().hex
+    return {
+        "environment": {"SHARD_RUN_ID": run_id, "SHARD_COUNT": str(shards)},
+        "count": shards,
+        "run_id": run_id,
+    }
 
-def fetch_price_trends(order_code: str) -> list[dict]:
-    """order_code に対応する価格推移を取得"""
-    trends = PriceHistory.query.filter_by(order_code=order_code).all()
-    return [
-        {"date": trend.scraped_at.isoformat() if isinstance(trend.scraped_at, datetime) else trend.scraped_at,
-         "price": trend.price}
-        for trend in trends
-    ]
 
+def downsample_price_trends(trends: list[tuple[datetime, float]], max_points: int) -> list[dict]:
+    """価格推移を max_points 点以下に間引き、レスポンス用の形式に変換
 
-def fetch_order_code(name: str, model: str) -> str | None:
-    """商品の name と model を用いて order_code を取得"""
-    product = db.session.query(Products.order_code).filter_by(name=name, model=model).first()
-    return product[0] if product else None
+    価格履歴は価格が変わったときだけの変化点で、期間内の行数は取得回数ではなく価格の変更回数に
+    比例するため、SQLでのバケット化やNumPyは使わずに Python の LTTB で間引く。点数が max_points
+    以下なら間引かずにそのまま返す。
+    """
+    if len(trends) <= max_points:
+        return [{"date": scraped_at.isoformat(), "price": price} for scraped_at, price in trends]
+    points = lttb([(scraped_at.timestamp(), price) for scraped_at, price in trends], max_points)
+    timestamps = {scraped_at.timestamp(): scraped_at for scraped_at, _ in trends}
+    return [{"date": timestamps[x].isoformat(), "price": price} for x, price in points]
 
 
-def fetch_model_by_name(name: str, ) -> str | None:
-    """商品の name と model を用いて model を取得"""
-    models = db.session.query(Products.model).filter_by(name=name).all()
-    return models if models else None
+def parse_jst_datetime(value: str) -> datetime:
+    """ISO 8601 形式の日時を、DBと同じ日本時間（タイムゾーンなし）の datetime に変換"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(JST).replace(tzinfo=None)
+    return parsed
 
 
-def get_latest_task_definition(task_family):
-    """タスク定義の最新リビジョンを取得"""
-    response = ecs_client.list_task_definitions(
-        familyPrefix=task_family,
-        sort="DESC",
-        status="ACTIVE",
-        maxResults=1
-    )
-    if response["taskDefinitionArns"]:
-        return response["taskDefinitionArns"][0]  # 最新のリビジョン ARN を取得
-    else:
-        raise ValueError("No active task definition found.")
+def parse_trend_range(params: Mapping) -> tuple[datetime | None, datetime | None, int]:
+    """パラメータ from / to / max_points を解析（不正な値は ValueError）"""
+    start = params.get("from")
+    end = params.get("to")
+    max_points = int(params.get("max_points", DEFAULT_MAX_POINTS))
+    if not MIN_POINTS <= max_points <= MAX_POINTS_LIMIT:
+        raise ValueError(f"max_points は {MIN_POINTS}〜{MAX_POINTS_LIMIT} で指定してください")
+    start = parse_jst_datetime(start) if start else None
+    end = parse_jst_datetime(end) if end else None
+    if start and end and start > end:
+        raise ValueError("from は to 以前の日時を指定してください")
+    return start, end, max_points
 
 
 # ルート定義
 @bp.route("/")
+@response_cache.cached
 def index():
     """ホーム画面表示"""
     try:
-        products = Products.query.all()
-        # TODO: DELL HP上で表記揺らぎあり「inspiron 14ノートパソコン」と「inspiron14ノートパソコン」など。
-        #       スペースを詰めて重複削除が必要。その後、モデル名を選択するときにさらなる工夫が必要・・・
-        product_names_list = sorted(set([product.name for product in products]))
+        # 表記揺らぎ（「inspiron 14ノートパソコン」と「inspiron14ノートパソコン」など）は正規化した商品名でまとめる
+        catalog = fetch_catalog()
     except Exception as e:
         from app import app
         app.logger.info(f"DBからのデータ取得エラー: {e}")
-        product_names_list = []
-    return render_template("api.html", product_names_list=product_names_list)
+        catalog = []
+        response_cache.skip()  # 空のリストをキャッシュしない
+    return render_template("api.html", catalog=catalog)
+
+
+@bp.route("/catalog", methods=["GET"])
+@response_cache.cached
+def catalog() -> Response:
+    """正規化した商品名ごとの商品名・model 一覧を取得"""
+    return jsonify(fetch_catalog())
 
 
 @bp.route("/line_notification_setting")
@@ -92,23 +130,59 @@ def register_line_notification():
 
 
 @bp.route("/get_price_trend/<string:name>/<string:model>", methods=["GET"])
+@response_cache.cached
 def price_trends(name, model) -> Response:
-    """価格推移データを取得"""
-    order_code = fetch_order_code(name, model)
-    if not order_code:
+    """価格推移データを取得（from / to で期間を絞り込み、max_points 点以下に間引いて返す）"""
+    try:
+        start, end, max_points = parse_trend_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"パラメータが不正です: {e}"}), 400
+
+    trend = fetch_price_trend(name, model, start, end)
+    if not trend:
         return jsonify({"error": "商品の注文コードが見つかりません"}), 404
 
-    price_data = fetch_price_trends(order_code)
+    price_data = downsample_price_trends(trend.points, max_points)
 
-    product = fetch_product_by_order_code(order_code)
-    url = product.url
+    return jsonify({"prices": price_data, "url": trend.url, "total_points": len(trend.points)})
 
-    return jsonify({"prices": price_data, "url": url})
+
+@bp.route("/get_price_trends", methods=["POST"])
+def compare_price_trends() -> Response:
+    """複数商品の価格推移データをまとめて取得（比較グラフ用）
+
+    リクエスト例: {"products": [{"name": "...", "model": "..."}, ...], "from": "...", "to": "...", "max_points": 500}
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        start, end, max_points = parse_trend_range(data)
+        products = [(product["name"], product["model"]) for product in data.get("products", [])]
+    except (ValueError, TypeError, KeyError) as e:
+        return jsonify({"error": f"パラメータが不正です: {e}"}), 400
+    if not 1 <= len(products) <= MAX_COMPARE_PRODUCTS:
+        return jsonify({"error": f"products は1〜{MAX_COMPARE_PRODUCTS}件で指定してください"}), 400
+
+    trends = fetch_price_trends(products, start, end)
+
+    return jsonify({
+        "trends": [
+            {
+                "name": trend.name,
+                "model": trend.model,
+                "order_code": trend.order_code,
+                "url": trend.url,
+                "prices": downsample_price_trends(trend.points, max_points),
+                "total_points": len(trend.points),
+            }
+            for trend in (trends[key] for key in dict.fromkeys(products) if key in trends)
+        ],
+        "not_found": [{"name": name, "model": model} for name, model in products if (name, model) not in trends],
+    })
 
 
 @bp.route("/get_notification_setting", methods=["GET"])
 def notification_setting() -> Response:
-    """通知設定を取得"""
+    """通知設定を取得（利用者が変更するため、更新がすぐに反映されるようキャッシュしない）"""
     products = db.session.query(Products.order_code, Products.is_line_notification).all()
     toggle_values = {}
     if products:
@@ -133,81 +207,181 @@ def update_notification_setting() -> Response:
 
 
 @bp.route('/get_model/<string:name>', methods=['GET'])
+@response_cache.cached
 def get_subcategories(name) -> Response:
+    """商品名（表記揺らぎは同一視）に該当する model の一覧を取得"""
     models = fetch_model_by_name(name)
-    return jsonify([{"model": row[0]} for row in models])
+    return jsonify([{"model": model} for model in models])
+
+
+@bp.route("/get_scrape_runs", methods=["GET"])
+def get_scrape_runs() -> Response:
+    """直近のクロールの実行記録（処理時間・最大RSS）を取得
+
+    実行記録はスクレイプ世代番号を進めた後に追加されるため、レスポンスキャッシュは使わない。
+    """
+    try:
+        limit = int(request.args.get("limit", DEFAULT_SCRAPE_RUNS))
+    except ValueError:
+        return jsonify({"error": "limit は整数で指定してください"}), 400
+    limit = min(max(limit, 1), MAX_SCRAPE_RUNS)
+
+    runs = []
+    for run in fetch_scrape_runs(limit):
+        report = json.loads(run.report) if run.report else {}
+        runs.append({
+            "spider": run.spider,
+            "started_at": run.started_at.isoformat() if run.started_at else None,
+            "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+            "finish_reason": run.finish_reason,
+            "duration_seconds": run.duration_seconds,
+            "item_count": run.item_count,
+            "page_count": run.page_count,
+            "updated_count": run.updated_count,
+            "download_avg_seconds": run.download_avg_seconds,
+            "extraction_seconds": run.extraction_seconds,
+            "db_flush_seconds": run.db_flush_seconds,
+            "notification_avg_seconds": run.notification_avg_seconds,
+            "peak_rss_mb": run.peak_rss_mb,
+            "timings": report.get("timings", {}),
+        })
+    return jsonify(runs)
+
+
+@bp.route("/get_price_changes", methods=["GET"])
+@response_cache.cached
+def get_price_changes() -> Response:
+    """クロール1回分の価格の変動（新規・価格変更・掲載終了）を取得
+
+    パラメータ run_id（省略時は直近の実行）、type（new / changed / disappeared）、limit。
+    """
+    change_type = request.args.get("type")
+    if change_type and change_type not in CHANGE_TYPES:
+        return jsonify({"error": f"type は {' / '.join(CHANGE_TYPES)} のいずれかで指定してください"}), 400
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PRICE_CHANGES))
+    except ValueError:
+        return jsonify({"error": "limit は整数で指定してください"}), 400
+    limit = min(max(limit, 1), MAX_PRICE_CHANGES)
+
+    run_id = request.args.get("run_id") or fetch_latest_change_run()
+    if run_id is None:
+        return jsonify({"run_id": None, "counts": {}, "changes": []})
+    counts, rows = fetch_price_changes(run_id, change_type, limit)
+    return jsonify({
+        "run_id": run_id,
+        "detected_at": rows[0][0].detected_at.isoformat() if rows else None,
+        "counts": {change: counts.get(change, 0) for change in CHANGE_TYPES},
+        "changes": [
+            {
+                "order_code": change.order_code,
+                "name": name,
+                "model": model,
+                "url": url,
+                "change_type": change.change_type,
+                "old_price": change.old_price,
+                "new_price": change.new_price,
+                "price_delta": change.price_delta,
+                "percent_delta": change.percent_delta,
+            }
+            for change, name, model, url in rows
+        ],
+    })
+
+
+@bp.route("/get_price_stats", methods=["GET"])
+@response_cache.cached
+def get_price_stats() -> Response:
+    """商品ごとの価格の統計（全期間の最安・最高値、30日・90日の最安値・平均、現在の価格の位置）を取得
+
+    パラメータ category、sort（percentile / avg_90d_diff / price / last_changed_at / name）、
+    order（asc / desc）、limit（省略時は全商品）。
+    """
+    sort = request.args.get("sort", DEFAULT_PRICE_STATS_SORT)
+    if sort not in PRICE_STATS_SORT_KEYS:
+        return jsonify({"error": f"sort は {' / '.join(PRICE_STATS_SORT_KEYS)} のいずれかで指定してください"}), 400
+    order = request.args.get("order", "asc")
+    if order not in ("asc", "desc"):
+        return jsonify({"error": "order は asc / desc のいずれかで指定してください"}), 400
+    limit = request.args.get("limit")
+    if limit is not None:
+        try:
+            limit = max(int(limit), 1)
+        except ValueError:
+            return jsonify({"error": "limit は整数で指定してください"}), 400
+
+    rows = fetch_price_stats(request.args.get("category"), sort, order == "desc", limit)
+    return jsonify([
+        {
+            "order_code": stats.order_code,
+            "name": name,
+            "model": model,
+            "url": url,
+            "category": category,
+            "current_price": stats.current_price,
+            "all_time_min_price": stats.all_time_min_price,
+            "all_time_max_price": stats.all_time_max_price,
+            "min_price_30d": stats.min_price_30d,
+            "avg_price_30d": stats.avg_price_30d,
+            "min_price_90d": stats.min_price_90d,
+            "avg_price_90d": stats.avg_price_90d,
+            "avg_90d_diff_percent": (
+                (stats.current_price - stats.avg_price_90d) * 100 / stats.avg_price_90d
+                if stats.current_price is not None and stats.avg_price_90d else None
+            ),
+            "price_percentile_90d": stats.price_percentile_90d,
+            "is_all_time_low": stats.current_price is not None and stats.current_price == stats.all_time_min_price,
+            "last_changed_at": stats.last_changed_at.isoformat() if stats.last_changed_at else None,
+            "updated_at": stats.updated_at.isoformat() if stats.updated_at else None,
+        }
+        for stats, name, model, url, category in rows
+    ])
 
 
 @bp.route("/check_price", methods=["GET"])
 def price_check() -> Response:
-    """現在の価格を取得"""
-    response = ecs_client.run_task(
-        cluster=CLUSTER_NAME,
-        taskDefinition=get_latest_task_definition(TASK_FAMILY),
-        capacityProviderStrategy=[
-            {"capacityProvider": "FARGATE_SPOT", "weight": 1}
-        ],
-        networkConfiguration={
-            "awsvpcConfiguration": {
-                "subnets": SUBNETS,
-                "securityGroups": SECURITY_GROUPS,
-                "assignPublicIp": "ENABLED",
-            }
-        },
-        startedBy="Flask-API-trigger"
-    )
-    # 起動されたタスクの ARN を取得
-    task_arn = response["tasks"][0]["taskArn"]
-    
-    return jsonify({"taskArn": task_arn}) 
+    """現在の価格を取得（実行中のスクレイピングがあれば新しく起動せずにそのタスクを返す）"""
+    task_arns, started = run_coordinator.start(TRIGGER_CHECK_PRICE, **shard_task_options())
+    # taskArn は状態の確認用（分担クロールでは全ワーカーのタスクを taskArns で返す）
+    return jsonify({"taskArn": task_arns[0], "taskArns": task_arns, "reused": not started})
 
 @bp.route("/get_scraping_status/<path:task_arn>", methods=["GET"])
 def check_task_status(task_arn):
-    # タスクの状態を取得
-    response = ecs_client.describe_tasks(
-        cluster=CLUSTER_NAME,
-        tasks=[task_arn]
-    )
-
-    # タスクの状態を確認
-    tasks = response.get("tasks", [])
-    if not tasks:
+    """タスクの状態を取得（同じタスクへの問い合わせは task_status_poller が共有する）"""
+    result = task_status_poller.get_status(task_arn)
+    if result["status"] == NOT_FOUND_STATUS:
         return {"error": "Task not found"}, 404
-    task = tasks[0]
-    status = task.get("lastStatus", "UNKNOWN")# タスクの状態 (PROVISIONING, PENDING, RUNNING, STOPPED)
-    
-    # タスクが STOPPED の場合、追加情報を取得
-    result = {
-        "status": status,
-        "stoppedAt": task.get("stoppedAt"),
-        "stopReason": task.get("stoppedReason", "No reason provided"),
-        "exitCode": task.get("containers", [{}])[0].get("exitCode", "Unknown"),
-        "taskArn": task_arn,
-    } if status == "STOPPED" else {
-        "status": status,
-        "stoppedAt": None,
-        "stopReason": None,
-        "exitCode": None,
-        "taskArn": task_arn,
-    }
-    
     return jsonify(result)
+
+
+@bp.route("/stream_scraping_status/<path:task_arn>", methods=["GET"])
+def stream_task_status(task_arn) -> Response:
+    """タスクの状態を Server-Sent Events で配信（状態が変わるたびに status イベントを送る）
+
+    Lambda（Zappa）上では、接続している間ずっと実行時間が課金され同時実行数も消費するため、
+    現在の状態を1回だけ送って終える（画面は get_scraping_status の定期確認に切り替わり、
+    状態の取得は task_status_poller のキャッシュを共有する）。
+    """
+    def generate():
+        if IS_LAMBDA:
+            yield f"event: status\ndata: {json.dumps(task_status_poller.get_status(task_arn))}\n\n"
+            return
+        for state in task_status_poller.watch(task_arn, timeout=STATUS_STREAM_TIMEOUT):
+            if state is None:
+                yield ": keepalive\n\n"  # 接続を維持するためのコメント行
+            else:
+                yield f"event: status\ndata: {json.dumps(state)}\n\n"
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
        
 @bp.route("/notification_test", methods=["GET"])
 def notification_test() -> Response:
-    """すべての価格を0円に変更後、最新価格を取得"""
-    
+    """通知テストモードでスクレイピングを実行（DBの価格は変更せず、通知設定ONの商品を価格変更として通知する）"""
     try:
-        # すべての価格を0円に変更
-        products = Products.query.all()
-        for product in products:
-            product.price = 0
-
-        db.session.commit()  # データベースに変更を反映
-
-        # 現在の価格を取得
-        return price_check()
+        task_arns, started = run_coordinator.start(TRIGGER_NOTIFICATION_TEST,
+                                                   environment=NOTIFICATION_TEST_ENVIRONMENT)
+        return jsonify({"taskArn": task_arns[0], "reused": not started})
 
     except Exception as e:
-        db.session.rollback()  # 失敗時にロールバック
         return jsonify({"result": 0, "error": str(e)})
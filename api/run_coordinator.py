@@ -0,0 +1,206 @@
+"""スクレイピング（ECSタスク）の起動の重複排除
+
+ボタンの連打や複数の利用者からの同時実行で同じスクレイピングが複数起動しないよう、
+起動したタスクを ScrapeTasks に記録し、実行中のタスクがあれば新しく起動せずにそのタスクARNを返す。
+実行中かどうかは種類（trigger）に関係なく判定する（check_price と notification_test も同じ商品・
+一覧ページに書き込むため同時に実行しない）。trigger は記録と最小間隔の判定にだけ使う。
+
+- 最新のタスク定義ARNは task_definition_ttl 秒キャッシュする（ECSの list 呼び出しを減らす）
+- 複数のAPIインスタンスから同時に呼ばれた場合も、PostgreSQLのアドバイザリロックで
+  1つずつ判定する
+- 分担クロールでは同じ環境変数（実行ID）で複数のタスクを起動し、同じ実行IDで記録する。
+  再利用の判定は実行ID単位で行い、1つでも終了していないタスクがあれば実行中とみなす
+- ScrapeTasks が無い（スクレイパーがまだ一度も実行されていない）DBでは最初に作成する
+"""
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_, text
+
+from clients import CLUSTER_NAME, get_ecs_client
+from model.models import ScrapeTasks, db, ensure_table
+from task_status import NOT_FOUND_STATUS, STOPPED_STATUS, TaskStatusPoller, task_status_poller
+
+
+# 定数定義
+TASK_FAMILY = "scraper-ecs-task"
+SUBNETS = ["subnet-0aeb6f09a8223f928", "subnet-08ababb4f6a70f6c1"]
+SECURITY_GROUPS = ["sg-049f994ecd0660ac2"]
+SCRAPER_CONTAINER_NAME = "scraper-container"  # タスク定義（.aws/task-definition.json）のコンテナ名
+DEFAULT_TASK_DEFINITION_TTL = 300  # 最新のタスク定義ARNをキャッシュする期間（秒）
+DEFAULT_MIN_INTERVAL = 0  # 同じ種類の実行の最小間隔（秒）。0 の場合は実行中の重複のみ防ぐ
+LAUNCH_GRACE_PERIOD = timedelta(seconds=30)  # 起動直後は describe_tasks で見つからなくても実行中とみなす
+ADVISORY_LOCK_KEY = 7305001  # 起動判定を直列化する pg_advisory_xact_lock のキー
+JST = timezone(timedelta(hours=9))
+
+
+class RunCoordinator:
+    """スクレイピングの重複起動を防ぐ（種類に関係なく、実行中の間は新しく起動しない）
+
+    Args:
+        client_factory: ECSクライアントを返す関数（テストではスタブを返す関数を渡す）
+        poller (TaskStatusPoller): 実行中のタスクの状態の取得元
+    """
+
+    def __init__(self, client_factory: Callable = get_ecs_client, poller: TaskStatusPoller = task_status_poller):
+        self.client_factory = client_factory
+        self.poller = poller
+        self.task_definition_ttl = DEFAULT_TASK_DEFINITION_TTL
+        self.min_interval = DEFAULT_MIN_INTERVAL
+        self._task_definition: str | None = None
+        self._task_definition_fetched_at: float | None = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        """アプリの設定（SCRAPE_*）を読み込む。"""
+        self.task_definition_ttl = app.config.get("SCRAPE_TASK_DEFINITION_TTL", DEFAULT_TASK_DEFINITION_TTL)
+        self.min_interval = app.config.get("SCRAPE_MIN_INTERVAL", DEFAULT_MIN_INTERVAL)
+        app.extensions["run_coordinator"] = self
+
+    def start(self, trigger: str, environment: dict[str, str] | None = None,
+              count: int = 1, run_id: str | None = None) -> tuple[list[str], bool]:
+        """種類に関係なくタスクが実行中（または同じ種類を min_interval 秒以内に起動済み）ならそのタスクを、
+        そうでなければ新しく起動したタスクを返す。
+
+        Args:
+            trigger (str): 実行の種類（起動したエンドポイント名）
+            environment (dict[str, str] | None): 新しく起動する場合にスクレイパーのコンテナに渡す環境変数
+            count (int): 新しく起動するタスク数（分担クロールのワーカー数）
+            run_id (str | None): 新しく起動するタスクの実行ID（省略時は新しく作成する）
+
+        Returns:
+            tuple[list[str], bool]: (タスクARNのリスト, 新しく起動した場合は True)
+                実行中のタスクを再利用する場合は、その実行（同じ実行IDで起動した分担クロール）の全タスクを返す
+        """
+        ensure_table(ScrapeTasks)
+        with self._lock:
+            try:
+                self._acquire_advisory_lock()
+                existing = self._find_reusable_tasks(trigger)
+                if existing:
+                    db.session.commit()
+                    return [task.task_arn for task in existing], False
+
+                tasks = self._run_task(environment, count)
+                now = self._now()
+                run_id = run_id or uuid.uuid4().hex
+                for task in tasks:
+                    db.session.add(ScrapeTasks(task_arn=task["taskArn"], trigger=trigger, run_id=run_id,
+                                               status=task.get("lastStatus"), started_at=now, updated_at=now))
+                db.session.commit()
+                return [task["taskArn"] for task in tasks], True
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def latest_task_definition(self) -> str:
+        """最新のタスク定義ARNを返す（task_definition_ttl 秒以内は前回の結果を使う）"""
+        now = time.monotonic()
+        if (self._task_definition is None
+                or now - self._task_definition_fetched_at >= self.task_definition_ttl):
+            response = self.client_factory().list_task_definitions(
+                familyPrefix=TASK_FAMILY,
+                sort="DESC",
+                status="ACTIVE",
+                maxResults=1
+            )
+            if not response["taskDefinitionArns"]:
+                raise ValueError("No active task definition found.")
+            self._task_definition = response["taskDefinitionArns"][0]  # 最新のリビジョン ARN を取得
+            self._task_definition_fetched_at = now
+        return self._task_definition
+
+    def _find_reusable_tasks(self, trigger: str) -> list[ScrapeTasks]:
+        """再利用できる実行（種類に関係なく実行中、または同じ種類の最小間隔内）があれば、その実行の全タスクを返す。"""
+        now = self._now()
+        if self.min_interval:
+            latest = (db.session.query(ScrapeTasks)
+                      .filter_by(trigger=trigger)
+                      .order_by(ScrapeTasks.started_at.desc())
+                      .first())
+            if latest is not None and now - latest.started_at < timedelta(seconds=self.min_interval):
+                return self._tasks_of_run(latest)
+
+        # 終了を確認済みのタスク（起動直後を除く）は問い合わせない
+        candidates = (db.session.query(ScrapeTasks)
+                      .filter(or_(ScrapeTasks.status.is_(None),
+                                  ScrapeTasks.status.notin_([STOPPED_STATUS, NOT_FOUND_STATUS]),
+                                  ScrapeTasks.started_at > now - LAUNCH_GRACE_PERIOD))
+                      .order_by(ScrapeTasks.started_at.desc())
+                      .all())
+        for task in candidates:
+            if self._is_running(task, now):
+                return self._tasks_of_run(task)
+        return []
+
+    @staticmethod
+    def _tasks_of_run(task: ScrapeTasks) -> list[ScrapeTasks]:
+        """タスクと同じ実行IDで起動した全タスクを返す（実行IDの無い古い記録はそのタスクのみ）。"""
+        if task.run_id is None:
+            return [task]
+        return (db.session.query(ScrapeTasks)
+                .filter_by(run_id=task.run_id)
+                .order_by(ScrapeTasks.task_arn)
+                .all())
+
+    def _is_running(self, task: ScrapeTasks, now: datetime) -> bool:
+        """タスクの最新の状態を記録し、まだ終了していないかを返す。"""
+        if task.status == STOPPED_STATUS:
+            return False
+        status = self.poller.get_status(task.task_arn)["status"]
+        task.status, task.updated_at = status, now
+        if status == STOPPED_STATUS:
+            return False
+        if status == NOT_FOUND_STATUS:
+            return now - task.started_at < LAUNCH_GRACE_PERIOD
+        return True
+
+    def _run_task(self, environment: dict[str, str] | None = None, count: int = 1) -> list[dict]:
+        """Fargate Spot でスクレイピングのタスクを count 個起動する（environment はコンテナの環境変数に追加する）。"""
+        options = {}
+        if environment:
+            options["overrides"] = {
+                "containerOverrides": [{
+                    "name": SCRAPER_CONTAINER_NAME,
+                    "environment": [{"name": name, "value": value} for name, value in environment.items()],
+                }]
+            }
+        response = self.client_factory().run_task(
+            cluster=CLUSTER_NAME,
+            taskDefinition=self.latest_task_definition(),
+            capacityProviderStrategy=[
+                {"capacityProvider": "FARGATE_SPOT", "weight": 1}
+            ],
+            networkConfiguration={
+                "awsvpcConfiguration": {
+                    "subnets": SUBNETS,
+                    "securityGroups": SECURITY_GROUPS,
+                    "assignPublicIp": "ENABLED",
+                }
+            },
+            startedBy="Flask-API-trigger",
+            count=count,
+            **options
+        )
+        if not response.get("tasks"):
+            raise RuntimeError(f"タスクを起動できませんでした: {response.get('failures')}")
+        return response["tasks"]
+
+    def _acquire_advisory_lock(self) -> None:
+        """複数のAPIインスタンス間で起動判定を直列化する（トランザクション終了時に解放される）。"""
+        if db.session.get_bind().dialect.name == "postgresql":
+            db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+
+    @staticmethod
+    def _now() -> datetime:
+        """DBと同じ日本時間（タイムゾーンなし）の現在時刻"""
+        return datetime.now(JST).replace(tzinfo=None)
+
+
+run_coordinator = RunCoordinator()
@@ -0,0 +1,66 @@
+"""起動時間の計測（app の読み込み完了までの時間、最初のクエリ・最初のリクエストの所要時間）"""
+from __future__ import annotations
+
+import time
+
+# app.py の先頭で読み込むことで、プロセスがアプリの読み込みを始めた時刻とみなす
+PROCESS_STARTED_AT = time.perf_counter()
+
+
+class StartupReport:
+    """起動時間の計測結果（app.extensions["startup_report"] から参照できる）"""
+
+    def __init__(self):
+        self.import_seconds = None  # アプリの読み込み完了まで
+        self.first_query_seconds = None  # DB接続（TLSハンドシェイクを含む）と最初のクエリ
+        self.first_request_seconds = None  # 最初のリクエストの処理時間
+        self._request_started_at = None
+
+    def init_app(self, app) -> None:
+        """読み込み完了までの時間を記録し、DB_WARMUP が有効ならDBに接続しておく。"""
+        from sqlalchemy import text
+
+        from model.models import db
+
+        self.import_seconds = time.perf_counter() - PROCESS_STARTED_AT
+        if app.config.get("DB_WARMUP"):
+            # Lambda の初期化フェーズで接続を張っておき、最初のリクエストで待たないようにする
+            started = time.perf_counter()
+            try:
+                with app.app_context():
+                    db.session.execute(text("SELECT 1"))
+                    db.session.remove()
+                self.first_query_seconds = time.perf_counter() - started
+            except Exception as e:
+                app.logger.warning(f"DBのウォームアップに失敗しました: {e}")
+
+        app.before_request(self._before_first_request)
+        app.after_request(self._after_first_request)
+        app.extensions["startup_report"] = self
+        app.logger.info(f"起動レポート: {self.as_dict()}")
+
+    def as_dict(self) -> dict:
+        return {
+            "import_seconds": self._round(self.import_seconds),
+            "first_query_seconds": self._round(self.first_query_seconds),
+            "first_request_seconds": self._round(self.first_request_seconds),
+        }
+
+    def _before_first_request(self) -> None:
+        if self.first_request_seconds is None and self._request_started_at is None:
+            self._request_started_at = time.perf_counter()
+
+    def _after_first_request(self, response):
+        if self.first_request_seconds is None and self._request_started_at is not None:
+            self.first_request_seconds = time.perf_counter() - self._request_started_at
+            from flask import current_app
+
+            current_app.logger.info(f"起動レポート: {self.as_dict()}")
+        return response
+
+    @staticmethod
+    def _round(seconds: float | None) -> float | None:
+        return round(seconds, 4) if seconds is not None else None
+
+
+startup_report = StartupReport()
@@ -56,11 +56,15 @@ document.addEventListener("DOMContentLoaded", async () => {
     // 前回のチャートを破棄
     if (chartInstance) chartInstance.destroy();
 
-    const name = productNameSelect.value;
+    const name = productNameSelect.value; // 正規化した商品名
+    const displayName = productNameSelect.selectedOptions[0]?.textContent.trim() ?? name;
     const model = productModelSelect.value;
 
     try {
-      const response = await fetch(`${BASE_URL}/api/get_price_trend/${encodeURIComponent(name)}/${encodeURIComponent(model)}`);
+      // 描画幅を超える点数は見た目が変わらないため、キャンバスの幅までサーバー側で間引く
+      const maxPoints = Math.max(100, Math.round(priceTrendCanvas.clientWidth));
+      const params = new URLSearchParams({ max_points: maxPoints });
+      const response = await fetch(`${BASE_URL}/api/get_price_trend/${encodeURIComponent(name)}/${encodeURIComponent(model)}?${params}`);
       const data = await response.json();
 
       if (data.prices?.length > 0) {
@@ -78,13 +82,14 @@ document.addEventListener("DOMContentLoaded", async () => {
                 borderColor: "rgba(75, 192, 192, 1)",
                 backgroundColor: "rgba(75, 192, 192, 0.2)",
                 borderWidth: 2,
+                stepped: true, // 価格は次の変化点まで一定
               },
             ],
           },
           options: {
             responsive: true,
             plugins: {
-              title: { display: true, text: `${name} - ${model}` },
+              title: { display: true, text: `${displayName} - ${model}` },
               legend: { display: true, position: "top" },
               tooltip: { enabled: true },
             },
@@ -148,7 +153,7 @@ document.addEventListener("DOMContentLoaded", async () => {
 
     if (data.taskArn) {
       alert("スクレイピングを開始しました！");
-      checkScrapingStatus(data.taskArn)
+      watchScrapingStatus(data.taskArn)
     } else {
       console.error(`スクレイピングを開始できませんでした data:${data}, taskArn:${taskArn}`);
       alert("スクレイピングを開始できませんでした");
@@ -158,6 +163,47 @@ document.addEventListener("DOMContentLoaded", async () => {
 
   }
 
+  // ✅ スクレイピングの状態を通知する。終了した（これ以上確認不要な）場合は true を返す
+  function handleScrapingStatus(result) {
+    if (result.status === "STOPPED" && result.stopReason === "Essential container in task exited"){
+      alert(`スクレイピング完了！`);
+      loadScrapeRuns();
+      loadPriceChanges();
+      loadPriceStats();
+    } else if (result.status === "STOPPED") {
+      alert(`スクレイピング異常終了: ${result.stopReason}`);
+    } else if (result.status ==="UNKNOWN") {
+      alert(`AWSタスクが見つかりません。ステータス不明。`)
+    } else {
+      return false;
+    }
+    return true;
+  }
+
+  // ✅ スクレイピングの状態をサーバーからの配信（Server-Sent Events）で受け取る関数
+  //    配信を使えない環境（接続エラー時など）では定期的な確認に切り替える
+  function watchScrapingStatus(taskArn) {
+    if (!window.EventSource) {
+      checkScrapingStatus(taskArn);
+      return;
+    }
+    const taskArn_encoded = encodeURIComponent(taskArn);  // taskArnをURLエンコードする
+    const eventSource = new EventSource(`${BASE_URL}/api/stream_scraping_status/${taskArn_encoded}`);
+    let finished = false;
+
+    eventSource.addEventListener("status", (event) => {
+      if (handleScrapingStatus(JSON.parse(event.data))) {
+        finished = true;
+        eventSource.close();
+      }
+    });
+    eventSource.onerror = () => {
+      // サーバーが配信を終えた場合も error になるため、未終了のときだけ定期確認に切り替える
+      eventSource.close();
+      if (!finished) checkScrapingStatus(taskArn);
+    };
+  }
+
   // ✅ 定期的にスクレイピングの結果を取得する関数
   async function checkScrapingStatus(taskArn) {
     const checkInterval = 10000; // 10秒ごとに確認
@@ -178,18 +224,11 @@ document.addEventListener("DOMContentLoaded", async () => {
         }
         const result = await response.json();
 
-        if (result.status === "STOPPED" && result.stopReason === "Essential container in task exited"){
-          clearInterval(interval);
-          alert(`スクレイピング完了！`);
-        } else if (result.status === "STOPPED") {
+        if (handleScrapingStatus(result)) {
           clearInterval(interval);
-          alert(`スクレイピング異常終了: ${result.stopReason}`);
         } else if (attempts >= maxRetries) {
           clearInterval(interval);
           alert("タイムアウトしました。");
-        } else if (result.status ==="UNKNOWN") {
-          clearInterval(interval);
-          alert(`AWSタスクが見つかりません。ステータス不明。`)
         }
 
       } catch (error) {
@@ -200,4 +239,127 @@ document.addEventListener("DOMContentLoaded", async () => {
     }, checkInterval);
   }
 
+  // ✅ クロールの実行記録を表に表示する関数
+  const scrapeRunsTableBody = document.querySelector("#scrapeRunsTable tbody");
+
+  async function loadScrapeRuns() {
+    if (!scrapeRunsTableBody) return;
+    try {
+      const response = await fetch(`${BASE_URL}/api/get_scrape_runs`);
+      if (!response.ok) throw new Error(`${response.status} - ${response.statusText}`);
+      const runs = await response.json();
+
+      const format = (value) => (value === null || value === undefined ? "-" : value);
+      scrapeRunsTableBody.innerHTML = "";
+      runs.forEach((run) => {
+        const row = document.createElement("tr");
+        [
+          run.finished_at ? new Date(run.finished_at).toLocaleString("ja-JP") : "-",
+          run.finish_reason,
+          run.duration_seconds?.toFixed(1),
+          run.item_count,
+          run.download_avg_seconds?.toFixed(2),
+          run.extraction_seconds?.toFixed(2),
+          run.db_flush_seconds?.toFixed(2),
+          run.notification_avg_seconds?.toFixed(2),
+          run.peak_rss_mb,
+        ].forEach((value) => {
+          const cell = document.createElement("td");
+          cell.textContent = format(value);
+          row.appendChild(cell);
+        });
+        scrapeRunsTableBody.appendChild(row);
+      });
+    } catch (error) {
+      console.error("クロール実行記録の取得に失敗しました:", error);
+    }
+  }
+
+  loadScrapeRuns();
+
+  // ✅ 直近のクロールで検出した価格の変動を表に表示する関数
+  const priceChangesTableBody = document.querySelector("#priceChangesTable tbody");
+  const priceChangesSummary = document.getElementById("priceChangesSummary");
+  const CHANGE_TYPE_LABELS = { new: "新規", changed: "価格変更", disappeared: "掲載終了" };
+
+  async function loadPriceChanges() {
+    if (!priceChangesTableBody) return;
+    try {
+      const response = await fetch(`${BASE_URL}/api/get_price_changes`);
+      if (!response.ok) throw new Error(`${response.status} - ${response.statusText}`);
+      const result = await response.json();
+
+      if (priceChangesSummary) {
+        priceChangesSummary.textContent = result.run_id
+          ? Object.entries(CHANGE_TYPE_LABELS).map(([type, label]) => `${label}: ${result.counts[type] ?? 0}件`).join(" / ")
+          : "まだ価格の変動はありません";
+      }
+      const format = (value) => (value === null || value === undefined ? "-" : value);
+      priceChangesTableBody.innerHTML = "";
+      result.changes.forEach((change) => {
+        const row = document.createElement("tr");
+        [
+          CHANGE_TYPE_LABELS[change.change_type] ?? change.change_type,
+          change.name,
+          change.model,
+          change.old_price?.toLocaleString(),
+          change.new_price?.toLocaleString(),
+          change.price_delta?.toLocaleString(),
+          change.percent_delta?.toFixed(1),
+        ].forEach((value) => {
+          const cell = document.createElement("td");
+          cell.textContent = format(value);
+          row.appendChild(cell);
+        });
+        priceChangesTableBody.appendChild(row);
+      });
+    } catch (error) {
+      console.error("価格の変動の取得に失敗しました:", error);
+    }
+  }
+
+  loadPriceChanges();
+
+  // ✅ 商品ごとの価格の統計を選択した並び順で表に表示する関数
+  const priceStatsTableBody = document.querySelector("#priceStatsTable tbody");
+  const priceStatsSort = document.getElementById("priceStatsSort");
+
+  async function loadPriceStats() {
+    if (!priceStatsTableBody) return;
+    try {
+      const sort = priceStatsSort ? priceStatsSort.value : "percentile";
+      const response = await fetch(`${BASE_URL}/api/get_price_stats?sort=${encodeURIComponent(sort)}`);
+      if (!response.ok) throw new Error(`${response.status} - ${response.statusText}`);
+      const products = await response.json();
+
+      const format = (value) => (value === null || value === undefined ? "-" : value);
+      priceStatsTableBody.innerHTML = "";
+      products.forEach((product) => {
+        const row = document.createElement("tr");
+        [
+          product.is_all_time_low ? `${product.name}（最安値）` : product.name,
+          product.model,
+          product.current_price?.toLocaleString(),
+          product.all_time_min_price?.toLocaleString(),
+          product.all_time_max_price?.toLocaleString(),
+          product.min_price_30d?.toLocaleString(),
+          product.avg_price_90d === null ? null : Math.round(product.avg_price_90d).toLocaleString(),
+          product.avg_90d_diff_percent?.toFixed(1),
+          product.price_percentile_90d?.toFixed(0),
+          product.last_changed_at ? new Date(product.last_changed_at).toLocaleDateString("ja-JP") : "-",
+        ].forEach((value) => {
+          const cell = document.createElement("td");
+          cell.textContent = format(value);
+          row.appendChild(cell);
+        });
+        priceStatsTableBody.appendChild(row);
+      });
+    } catch (error) {
+      console.error("価格の統計の取得に失敗しました:", error);
+    }
+  }
+
+  if (priceStatsSort) priceStatsSort.addEventListener("change", loadPriceStats);
+  loadPriceStats();
+
 });
\ No newline at end of file
@@ -0,0 +1,175 @@
+"""スクレイピング（ECSタスク）の状態の取得と配信
+
+同じタスクを複数の画面が監視していても、ECS の describe_tasks はタスクARNごとに
+poll_interval 秒に1回だけ呼び出し、最後に取得した状態を共有する。
+
+- get_status: 最後に取得した状態を返す（poll_interval 秒より古い場合のみ取得し直す）
+- watch: 状態が変わるたびに返すジェネレータ（SSE 用）。監視中はタスクARNごとに1つの
+  バックグラウンドスレッドが取得し、監視者がいなくなるかタスクが終了すると止まる
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from collections.abc import Callable, Iterator
+
+from clients import CLUSTER_NAME, get_ecs_client
+
+logger = logging.getLogger(__name__)
+
+# 定数定義
+DEFAULT_POLL_INTERVAL = 10  # describe_tasks を呼び出す間隔（秒）
+HEARTBEAT_INTERVAL = 15  # 状態が変わらない間に watch が None を返す間隔（秒）
+MAX_TRACKED_TASKS = 100  # 状態を保持しておくタスク数の上限
+STOPPED_STATUS = "STOPPED"  # タスクの最終状態
+NOT_FOUND_STATUS = "UNKNOWN"  # タスクが見つからない場合の状態
+
+
+def summarize_task(task_arn: str, task: dict | None) -> dict:
+    """describe_tasks の結果をAPIのレスポンス形式に変換"""
+    if task is None:
+        return {"status": NOT_FOUND_STATUS, "stoppedAt": None, "stopReason": None,
+                "exitCode": None, "taskArn": task_arn}
+    status = task.get("lastStatus", "UNKNOWN")  # タスクの状態 (PROVISIONING, PENDING, RUNNING, STOPPED)
+    # タスクが STOPPED の場合、追加情報を取得
+    if status == STOPPED_STATUS:
+        stopped_at = task.get("stoppedAt")
+        return {
+            "status": status,
+            "stoppedAt": stopped_at.isoformat() if hasattr(stopped_at, "isoformat") else stopped_at,
+            "stopReason": task.get("stoppedReason", "No reason provided"),
+            "exitCode": task.get("containers", [{}])[0].get("exitCode", "Unknown"),
+            "taskArn": task_arn,
+        }
+    return {"status": status, "stoppedAt": None, "stopReason": None, "exitCode": None, "taskArn": task_arn}
+
+
+def is_finished(state: dict | None) -> bool:
+    """これ以上状態が変わらない（終了した・見つからない）か"""
+    return state is not None and state["status"] in (STOPPED_STATUS, NOT_FOUND_STATUS)
+
+
+class _TaskWatch:
+    """1タスク分の最後に取得した状態と監視者数"""
+
+    def __init__(self):
+        self.state: dict | None = None
+        self.version = 0  # 状態が変わるたびに加算する
+        self.fetched_at: float | None = None
+        self.watchers = 0
+        self.thread: threading.Thread | None = None
+        self.condition = threading.Condition()
+
+
+class TaskStatusPoller:
+    """タスクARNごとに1つの取得処理を共有するECSタスクの状態の取得元
+
+    Args:
+        client_factory: ECSクライアントを返す関数（テストではスタブを返す関数を渡す）
+        cluster (str): ECSクラスター名
+        poll_interval (float): describe_tasks を呼び出す間隔（秒）
+    """
+
+    def __init__(self, client_factory: Callable = get_ecs_client, cluster: str = CLUSTER_NAME,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL):
+        self.client_factory = client_factory
+        self.cluster = cluster
+        self.poll_interval = poll_interval
+        self.upstream_calls = 0  # describe_tasks の呼び出し回数
+        self._watches: dict[str, _TaskWatch] = {}
+        self._lock = threading.Lock()
+
+    def get_status(self, task_arn: str) -> dict:
+        """タスクの状態を返す（最後の取得から poll_interval 秒以内なら取得し直さない）。"""
+        watch = self._get_watch(task_arn)
+        with watch.condition:
+            # 同時に呼ばれた場合は1つだけが取得し、他はその結果を使う
+            if self._is_stale(watch):
+                self._refresh(task_arn, watch)
+            return watch.state
+
+    def watch(self, task_arn: str, timeout: float) -> Iterator[dict | None]:
+        """状態が変わるたびに状態を返し、変わらない間は HEARTBEAT_INTERVAL 秒ごとに None を返す。
+
+        タスクが終了する（STOPPED・見つからない）か timeout 秒が経過すると終わる。
+        """
+        watch = self._get_watch(task_arn)
+        with watch.condition:
+            watch.watchers += 1
+            if watch.thread is None:
+                watch.thread = threading.Thread(target=self._poll_loop, args=(task_arn, watch), daemon=True)
+                watch.thread.start()
+
+        try:
+            seen_version = None
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                with watch.condition:
+                    if watch.version == seen_version or watch.state is None:
+                        watch.condition.wait(timeout=min(HEARTBEAT_INTERVAL, deadline - time.monotonic()))
+                    version, state = watch.version, watch.state
+                if state is not None and version != seen_version:
+                    seen_version = version
+                    yield state
+                    if is_finished(state):
+                        return
+                else:
+                    yield None
+        finally:
+            with watch.condition:
+                watch.watchers -= 1
+
+    def _poll_loop(self, task_arn: str, watch: _TaskWatch) -> None:
+        """監視者がいる間、poll_interval 秒ごとに状態を取得して監視者に通知する。"""
+        while True:
+            with watch.condition:
+                if watch.watchers == 0 or is_finished(watch.state):
+                    watch.thread = None
+                    return
+                if self._is_stale(watch):
+                    try:
+                        self._refresh(task_arn, watch)
+                    except Exception as e:
+                        # 一時的なエラーは次の周期で再取得する
+                        logger.warning(f"タスクの状態の取得エラー ({task_arn}): {e}")
+                        watch.fetched_at = time.monotonic()
+                wait = self.poll_interval - (time.monotonic() - watch.fetched_at)
+            time.sleep(max(wait, 0))
+
+    def _refresh(self, task_arn: str, watch: _TaskWatch) -> None:
+        """describe_tasks で状態を取得し、変わっていれば監視者に通知する（watch.condition を保持して呼ぶ）。"""
+        self.upstream_calls += 1
+        response = self.client_factory().describe_tasks(cluster=self.cluster, tasks=[task_arn])
+        tasks = response.get("tasks", [])
+        state = summarize_task(task_arn, tasks[0] if tasks else None)
+        watch.fetched_at = time.monotonic()
+        if state != watch.state:
+            watch.state = state
+            watch.version += 1
+            watch.condition.notify_all()
+
+    def _is_stale(self, watch: _TaskWatch) -> bool:
+        # STOPPED 以降は状態が変わらないため取得し直さない（見つからない場合は起動直後の可能性があるため取得し直す）
+        if watch.state is not None and watch.state["status"] == STOPPED_STATUS:
+            return False
+        return watch.fetched_at is None or time.monotonic() - watch.fetched_at >= self.poll_interval
+
+    def _get_watch(self, task_arn: str) -> _TaskWatch:
+        with self._lock:
+            watch = self._watches.get(task_arn)
+            if watch is None:
+                if len(self._watches) >= MAX_TRACKED_TASKS:
+                    self._evict()
+                watch = self._watches[task_arn] = _TaskWatch()
+            return watch
+
+    def _evict(self) -> None:
+        """監視者がいないタスクの状態を古いものから破棄する（self._lock を保持して呼ぶ）。"""
+        idle = [arn for arn, watch in self._watches.items() if watch.watchers == 0]
+        for arn in idle[:max(len(idle) // 2, 1)]:
+            del self._watches[arn]
+
+
+task_status_poller = TaskStatusPoller()
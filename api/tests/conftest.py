@@ -0,0 +1,7 @@
+"""api/ 直下のモジュール（task_status など）をアプリと同じ名前で読み込めるようにする。"""
+import os
+import sys
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
@@ -0,0 +1,96 @@
+"""TaskStatusPoller のテスト（ECSクライアントはスタブを client_factory で渡す）
+
+    cd api
+    python -m pytest tests
+"""
+import threading
+
+from task_status import NOT_FOUND_STATUS, STOPPED_STATUS, TaskStatusPoller
+
+TASK_ARN = "arn:aws:ecs:ap-northeast-1:000000000000:task/scraping-ecs-cluster/test"
+
+
+class StubECSClient:
+    """describe_tasks が statuses を順に返すスタブ（最後の状態を返し続ける）"""
+
+    def __init__(self, statuses: list[str | None]):
+        self.statuses = list(statuses)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def describe_tasks(self, cluster: str, tasks: list[str]) -> dict:
+        with self._lock:
+            self.calls.append((cluster, tasks))
+            status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        if status is None:
+            return {"tasks": []}
+        task = {"lastStatus": status}
+        if status == STOPPED_STATUS:
+            task.update(stoppedAt=None, stoppedReason="Essential container in task exited",
+                        containers=[{"exitCode": 0}])
+        return {"tasks": [task]}
+
+
+def make_poller(client: StubECSClient, poll_interval: float = 0.01) -> TaskStatusPoller:
+    return TaskStatusPoller(client_factory=lambda: client, cluster="test-cluster", poll_interval=poll_interval)
+
+
+def test_get_status_reuses_state_within_poll_interval():
+    client = StubECSClient(["RUNNING"])
+    poller = make_poller(client, poll_interval=60)
+
+    first = poller.get_status(TASK_ARN)
+    second = poller.get_status(TASK_ARN)
+
+    assert first == second
+    assert first["status"] == "RUNNING"
+    assert client.calls == [("test-cluster", [TASK_ARN])]
+    assert poller.upstream_calls == 1
+
+
+def test_get_status_does_not_refetch_stopped_task():
+    client = StubECSClient([STOPPED_STATUS])
+    poller = make_poller(client, poll_interval=0)
+
+    state = poller.get_status(TASK_ARN)
+    poller.get_status(TASK_ARN)
+
+    assert state["status"] == STOPPED_STATUS
+    assert state["exitCode"] == 0
+    assert poller.upstream_calls == 1
+
+
+def test_get_status_of_missing_task():
+    poller = make_poller(StubECSClient([None]))
+
+    assert poller.get_status(TASK_ARN)["status"] == NOT_FOUND_STATUS
+
+
+def test_watch_yields_each_change_until_stopped():
+    client = StubECSClient(["PENDING", "PENDING", "RUNNING", "RUNNING", STOPPED_STATUS])
+    poller = make_poller(client)
+
+    states = [state["status"] for state in poller.watch(TASK_ARN, timeout=5) if state is not None]
+
+    assert states == ["PENDING", "RUNNING", STOPPED_STATUS]
+
+
+def test_watchers_share_one_upstream_poll():
+    client = StubECSClient(["RUNNING"] * 20 + [STOPPED_STATUS])
+    poller = make_poller(client)
+    started = threading.Barrier(5)
+    results = []
+
+    def watch():
+        started.wait()
+        results.append([state["status"] for state in poller.watch(TASK_ARN, timeout=5) if state is not None])
+
+    threads = [threading.Thread(target=watch) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert results == [["RUNNING", STOPPED_STATUS]] * 5
+    # 監視者の数によらず、タスクARNごとに1つの取得処理だけが describe_tasks を呼び出す
+    assert poller.upstream_calls == len(client.calls) == 21
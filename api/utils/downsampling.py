@@ -0,0 +1,46 @@
+"""時系列データの間引き（LTTB: Largest-Triangle-Three-Buckets）"""
+from __future__ import annotations
+
+
+def lttb(points: list[tuple[float, float]], max_points: int) -> list[tuple[float, float]]:
+    """グラフの形状を保ったまま、時系列を max_points 点以下に間引く。
+
+    先頭と末尾の点は必ず残し、間の点はバケットごとに前後の点と作る三角形の面積が
+    最大になる点（＝形状への寄与が大きい点）を1点ずつ選ぶ。
+
+    Args:
+        points (list[tuple[float, float]]): x の昇順に並んだ (x, y) のリスト
+        max_points (int): 間引き後の最大点数（3以上）
+
+    Returns:
+        list[tuple[float, float]]: 間引き後の (x, y) のリスト
+    """
+    if max_points < 3 or len(points) <= max_points:
+        return list(points)
+
+    sampled = [points[0]]
+    bucket_size = (len(points) - 2) / (max_points - 2)
+    selected = 0
+    for bucket in range(max_points - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # 次のバケットの平均点（最後のバケットでは末尾の点）
+        next_start, next_end = end, min(int((bucket + 2) * bucket_size) + 1, len(points))
+        if next_start >= next_end:
+            next_start, next_end = len(points) - 1, len(points)
+        avg_x = sum(x for x, _ in points[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(y for _, y in points[next_start:next_end]) / (next_end - next_start)
+
+        prev_x, prev_y = points[selected]
+        best_area, best_index = -1.0, start
+        for index in range(start, end):
+            x, y = points[index]
+            area = abs((prev_x - avg_x) * (y - prev_y) - (prev_x - x) * (avg_y - prev_y))
+            if area > best_area:
+                best_area, best_index = area, index
+        sampled.append(points[best_index])
+        selected = best_index
+
+    sampled.append(points[-1])
+    return sampled
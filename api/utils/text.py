@@ -0,0 +1,10 @@
+"""商品名の正規化（scrapers/dell/items.py の normalize_name と同じ処理。一致は scrapers/tests/test_normalize_name.py で確認する）"""
+import re
+import unicodedata
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_name(name: str) -> str:
+    """全角・半角を統一（NFKC）し、大文字小文字を区別せず、空白を除去する"""
+    return WHITESPACE_PATTERN.sub('', unicodedata.normalize('NFKC', name).casefold())
@@ -1,28 +1,189 @@
+import argparse
 import json
+import os
 import subprocess
+import sys
+import tempfile
+import time
+import uuid
 
+from scrapy.crawler import Crawler, CrawlerProcess
+from scrapy.utils.project import get_project_settings
 
-DEFAULT_SPIDER = 'laptop'  # 意図をより明確にする定数名へリネーム
 
+DEFAULT_SPIDER = os.environ.get("SCRAPE_SPIDER", 'laptop')  # 全カテゴリを取得する場合は catalog
+DEFAULT_TIMEOUT = float(os.environ.get("CRAWL_TIMEOUT", 0))  # スパイダーごとの最大実行時間（秒）。0 は無制限
+SUCCESS_FINISH_REASON = "finished"
+# 分担クロールのワーカーとして起動する場合の実行ID・分担数（APIがECSタスクの環境変数で指定する）
+SHARD_RUN_ID = os.environ.get("SHARD_RUN_ID", "")
+SHARD_COUNT = int(os.environ.get("SHARD_COUNT", 1))
 
-def execute_spider(spider_name=DEFAULT_SPIDER):  # より直感的な関数名にリネーム
+
+def summarize_crawl(crawler: Crawler) -> dict:
+    """クロール1件分の統計情報（stats）から結果を作成する。"""
+    stats = crawler.stats.get_stats()
+    name = crawler.spider.name if crawler.spider else crawler.spidercls.name
+    return {
+        "spider": name,
+        "finish_reason": stats.get("finish_reason"),
+        "elapsed_seconds": stats.get("elapsed_time_seconds"),
+        "items": stats.get("item_scraped_count", 0),
+        "items_dropped": stats.get("item_dropped_count", 0),
+        "updated_count": stats.get("pipeline/updated_count", 0),
+        "pages": stats.get("response_received_count", 0),
+        "errors": stats.get("log_count/ERROR", 0),
+        # スパイダー・拡張が記録した独自の統計（laptop/pages_fetched, incremental/pages_skipped など）
+        "details": {
+            key: value for key, value in stats.items()
+            if key.startswith((f"{name}/", "incremental/", "price_history/", "pipeline/", "perf/", "shard/"))
+        },
+    }
+
+
+def upgrade_database() -> None:
+    """クロールの前に、既存のデータベースを現在のモデルに合わせて更新する（migrations/upgrade.py）。
+
+    分担クロールの各ワーカーが同時に実行しても、PostgreSQLではロックで1つずつ実行される。
+    """
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    from dell.database import create_db_engine
+    from migrations.upgrade import upgrade
+
+    engine = create_db_engine()
+    with engine.begin() as conn:
+        upgrade(conn)
+    engine.dispose()
+
+
+def execute_spider(spider_names=(DEFAULT_SPIDER,), timeout=DEFAULT_TIMEOUT, spider_kwargs=None):
     """
-    Execute a Scrapy spider by its name.
+    Execute Scrapy spiders in this process and return their crawl stats.
 
     The function sets the current working directory to the script's directory (for proper execution),
-    initializes a Scrapy CrawlerProcess with project settings, and starts the specified spider.
+    initializes a Scrapy CrawlerProcess with project settings, and runs all the specified spiders
+    in a single reactor.
+
+    :param spider_names: Names of the spiders to execute. Defaults to ('laptop',).
+    :param timeout: Seconds after which each spider is closed (CLOSESPIDER_TIMEOUT). 0 disables it.
+    :param spider_kwargs: Spider arguments passed to every spider (same as ``scrapy crawl -a``).
+    :return: Crawl result with status ("success" / "error"), total duration and per-spider stats.
+    :rtype: dict
+    """
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    settings = get_project_settings()
+    if timeout:
+        settings.set("CLOSESPIDER_TIMEOUT", timeout)
+
+    process = CrawlerProcess(settings)
+    crawlers = []
+    for spider_name in spider_names:
+        crawler = process.create_crawler(spider_name)
+        crawlers.append(crawler)
+        process.crawl(crawler, **(spider_kwargs or {}))
+
+    started_at = time.monotonic()
+    process.start()
+    results = [summarize_crawl(crawler) for crawler in crawlers]
 
-    :param spider_name: Name of the spider to execute. Defaults to 'laptop'.
-    :type spider_name: str
+    # 成功・失敗に応じたレスポンスを作成（タイムアウトで打ち切った場合も失敗とする）
+    succeeded = all(result["finish_reason"] == SUCCESS_FINISH_REASON for result in results)
+    return {
+        "status": "success" if succeeded else "error",
+        "duration_seconds": round(time.monotonic() - started_at, 3),
+        "spiders": results,
+    }
+
+
+def execute_sharded(spider_names=(DEFAULT_SPIDER,), shard_count=2, timeout=DEFAULT_TIMEOUT, spider_kwargs=None):
+    """一覧ページを shard_count 個の分担に分け、同じ数のワーカープロセスで並行してクロールする。
+
+    各ワーカーはこのスクリプトを --shard-run 付きで実行した別プロセスで、CrawlShards から
+    分担を確保して取得する（dell/sharding.py）。ECSではAPIが同じ実行IDで複数のタスクを起動する。
+
+    :return: Crawl result with status, total duration, per-worker results and the shard summary.
+    :rtype: dict
     """
-    result = subprocess.run(["scrapy", "crawl", spider_name])
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    from dell.database import create_db_engine
+    from dell.sharding import SHARD_DONE, summarize_shards
+
+    engine = create_db_engine()  # ワーカーが同時にテーブルを作成しないよう、起動前に作成しておく
+    run_id = uuid.uuid4().hex
+    started_at = time.monotonic()
+    with tempfile.TemporaryDirectory() as output_dir:
+        workers = []
+        for index in range(shard_count):
+            output = os.path.join(output_dir, f"worker_{index}.json")
+            command = [sys.executable, os.path.abspath(__file__), *spider_names,
+                       "--shard-run", run_id, "--shard-count", str(shard_count),
+                       "--timeout", str(timeout), "--output", output]
+            for key, value in (spider_kwargs or {}).items():
+                command += ["-a", f"{key}={value}"]
+            workers.append((subprocess.Popen(command), output))
+
+        results = []
+        for process, output in workers:
+            returncode = process.wait()
+            try:
+                with open(output, encoding="utf-8") as f:
+                    results.append(json.load(f))
+            except (OSError, ValueError):
+                results.append({"status": "error", "returncode": returncode})
 
-    # 成功・失敗に応じたレスポンスを作成
-    if result.returncode == 0:
-        return json.dumps({"status": "success", "output": "output", "error": "error"}) # printの出力がstdoutに書かれる
+    # 取得されなかった分担が残っていれば失敗とする
+    shards = summarize_shards(engine, run_id)
+    succeeded = (all(result["status"] == "success" for result in results)
+                 and set(shards["statuses"]) == {SHARD_DONE})
+    return {
+        "status": "success" if succeeded else "error",
+        "duration_seconds": round(time.monotonic() - started_at, 3),
+        "shards": shards,
+        "workers": results,
+    }
+
+
+def parse_spider_arguments(values) -> dict:
+    """-a NAME=VALUE の指定を辞書に変換する。"""
+    arguments = {}
+    for value in values:
+        name, separator, argument = value.partition("=")
+        if not separator:
+            raise argparse.ArgumentTypeError(f"-a は NAME=VALUE の形式で指定してください: {value}")
+        arguments[name] = argument
+    return arguments
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="スパイダーを実行し、クロール結果をJSONで出力する")
+    parser.add_argument("spiders", nargs="*", default=[DEFAULT_SPIDER], help="実行するスパイダー名")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="スパイダーごとの最大実行時間（秒）。0 は無制限")
+    parser.add_argument("--output", help="クロール結果のJSONを書き込むファイル（省略時は標準出力）")
+    parser.add_argument("-a", dest="spider_args", action="append", default=[], metavar="NAME=VALUE",
+                        help="スパイダーの引数（scrapy crawl -a と同じ）")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="一覧ページを分担して並行にクロールするワーカープロセス数")
+    parser.add_argument("--shard-run", default=SHARD_RUN_ID,
+                        help="分担クロールのワーカーとして参加する実行ID（--shards が起動するワーカー・ECSタスク用）")
+    parser.add_argument("--shard-count", type=int, default=SHARD_COUNT, help="分担クロールの分担数")
+    args = parser.parse_args(argv)
+    spider_kwargs = parse_spider_arguments(args.spider_args)
+
+    upgrade_database()
+    if args.shards:
+        result = execute_sharded(args.spiders, args.shards, timeout=args.timeout, spider_kwargs=spider_kwargs)
+    else:
+        if args.shard_run:
+            spider_kwargs.update(shard_run=args.shard_run, shard_count=args.shard_count)
+        result = execute_spider(args.spiders, timeout=args.timeout, spider_kwargs=spider_kwargs)
+    output = json.dumps(result, ensure_ascii=False, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
     else:
-        return json.dumps({"status": "error", "output": "output", "error": "error"}), 500
+        print(output)
+    return 0 if result["status"] == "success" else 1
 
 
 if __name__ == "__main__":
-    execute_spider()
\ No newline at end of file
+    sys.exit(main())
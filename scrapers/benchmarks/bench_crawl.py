@@ -0,0 +1,123 @@
+"""ローカルのフィクスチャサーバーに対して LaptopSpider → LaptopItem → SQLAlchemyPipeline を通しで実行し、
+クロール1回ごとの処理量（items/秒）・DB書き込み時間・抽出時間・最大RSSを計測する。
+
+dell.com には接続しない。一覧ページは生成したHTML（--pages × --items 商品）か、
+record_fixtures で保存したHTML（--fixture-dir、--scale 倍に複製）を使う。
+DBは一時ファイルのSQLite（--database-url で PostgreSQL なども指定可）。
+
+同じDBに対して以下の3回のクロールを続けて実行する。
+1. initial: すべて新規の商品（Products の insert、価格履歴の追加）
+2. changed: すべての商品の価格が変わった状態（upsert、価格履歴の追加）
+3. unchanged: 価格が変わらない状態（差分クロールが有効なら一覧ページごとスキップ）
+
+wall_seconds にはScrapyがクロールの終了を検知するまでの待ち（最大5秒程度）が含まれるため、
+処理時間の比較には download / extraction / db_flush の値と、ページ数を増やした場合の伸びを使う。
+
+    cd scrapers
+    python -m benchmarks.bench_crawl --pages 100 --items 24
+    python -m benchmarks.bench_crawl --fixture-dir benchmarks/recorded --scale 20
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import FixtureServer
+
+PRICE_CHANGE = 1000  # changed のクロールで全商品の価格に加算する値
+
+
+def crawl_result(label: str, crawler, wall_seconds: float) -> dict:
+    """クローラーの stats から計測結果を作成する。"""
+    from dell.extensions import (
+        TIMING_DB_FLUSH, TIMING_DOWNLOAD_HTTP, TIMING_DOWNLOAD_PLAYWRIGHT, TIMING_EXTRACTION,
+        peak_rss_mb, summarize_timing
+    )
+
+    stats = crawler.stats.get_stats()
+    items = stats.get("item_scraped_count", 0)
+    listed = items + stats.get("incremental/items_skipped", 0)  # 一覧ページに載っていた商品数
+    return {
+        "crawl": label,
+        "finish_reason": stats.get("finish_reason"),
+        "pages": stats.get("laptop/pages_fetched", 0),
+        "items": items,
+        "items_skipped": stats.get("incremental/items_skipped", 0),
+        "updated_count": stats.get("pipeline/updated_count", 0),
+        "wall_seconds": round(wall_seconds, 3),
+        "items_per_second": round(listed / wall_seconds, 1) if wall_seconds else None,
+        "download": {
+            "http": summarize_timing(stats, TIMING_DOWNLOAD_HTTP),
+            "playwright": summarize_timing(stats, TIMING_DOWNLOAD_PLAYWRIGHT),
+        },
+        "extraction": summarize_timing(stats, TIMING_EXTRACTION),
+        "db_flush": summarize_timing(stats, TIMING_DB_FLUSH),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_crawls(server: FixtureServer, args) -> list[dict]:
+    """1つのリアクターで initial / changed / unchanged のクロールを順に実行する。"""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    from twisted.internet import defer
+
+    from dell.spiders.laptop import LaptopSpider
+
+    settings = get_project_settings()
+    settings.set("LOG_LEVEL", args.log_level)
+    settings.set("FETCH_MODE", args.fetch_mode)
+    settings.set("INCREMENTAL_CRAWL", not args.no_incremental)
+    settings.set("CONCURRENT_REQUESTS", args.concurrency)
+    settings.set("CONCURRENT_REQUESTS_PER_DOMAIN", args.concurrency)
+    settings.set("DB_BATCH_SIZE", args.batch_size)
+    settings.set("PERF_REPORT_DB", False)  # 計測対象のDB書き込みに含めない
+    settings.set("ROBOTSTXT_OBEY", False)
+    process = CrawlerProcess(settings)
+    results = []
+
+    @defer.inlineCallbacks
+    def crawl_all():
+        try:
+            for label, price_offset in (("initial", 0), ("changed", PRICE_CHANGE), ("unchanged", PRICE_CHANGE)):
+                server.set_price_offset(price_offset)
+                crawler = process.create_crawler(LaptopSpider)
+                started = time.perf_counter()
+                yield process.crawl(crawler, start_url=server.listing_url)
+                results.append(crawl_result(label, crawler, time.perf_counter() - started))
+        finally:
+            from twisted.internet import reactor  # CrawlerProcess が設定の TWISTED_REACTOR をインストールした後に読み込む
+            reactor.callLater(0, reactor.stop)
+
+    crawl_all()
+    process.start(stop_after_crawl=False)
+    return results
+
+
+def main(args) -> None:
+    os.environ.setdefault("LINE_ACCESS_TOKEN", "benchmark")  # 新規DBのため通知は送信されない
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        with FixtureServer(total_pages=args.pages, items_per_page=args.items, fixture_dir=args.fixture_dir,
+                           scale=args.scale, asset_delay=args.asset_delay) as server:
+            print(f"一覧ページ: {server.total_pages}ページ, DB: {os.environ['DATABASE_URL']}")
+            for result in run_crawls(server, args):
+                print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50, help="生成する一覧ページ数")
+    parser.add_argument("--items", type=int, default=24, help="1ページあたりの商品数")
+    parser.add_argument("--fixture-dir", help="保存済みHTML（page_N.html）のディレクトリ")
+    parser.add_argument("--scale", type=int, default=1, help="保存済みHTMLを複製する倍数")
+    parser.add_argument("--asset-delay", type=float, default=0.0, help="画像等の配信遅延（秒）")
+    parser.add_argument("--database-url", help="計測に使うDB（省略時は一時ファイルのSQLite）。既存のデータに注意")
+    parser.add_argument("--fetch-mode", default="http", choices=("http", "hybrid", "playwright"),
+                        help="一覧ページの取得方法（settings.py の FETCH_MODE）")
+    parser.add_argument("--concurrency", type=int, default=8, help="同時に取得する一覧ページ数")
+    parser.add_argument("--batch-size", type=int, default=100, help="DB_BATCH_SIZE")
+    parser.add_argument("--no-incremental", action="store_true", help="差分クロールを無効にする")
+    parser.add_argument("--log-level", default="WARNING")
+    main(parser.parse_args())
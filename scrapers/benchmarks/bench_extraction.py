@@ -0,0 +1,103 @@
+"""一覧ページからの商品の抽出時間を、抽出方法（EXTRACTION_MODE）ごとに計測する。
+
+1. loader: 商品ごとに ItemLoader で ProductItem を作る（従来の動作）
+2. fast: コンパイル済みの XPath で dict を作る（dell/extraction.py）
+
+両方の結果が一致することを確認してから計測する。
+
+    cd scrapers
+    python -m benchmarks.bench_extraction --pages 20 --items 60
+    python -m benchmarks.bench_extraction --fixture-dir benchmarks/recorded
+"""
+import argparse
+import json
+import math
+import statistics
+import time
+
+from pathlib import Path
+
+from scrapy.http import HtmlResponse
+from scrapy.settings import Settings
+
+from benchmarks.fixtures import render_listing_page
+from dell.categories import CATEGORY_LAPTOPS
+from dell.spiders.laptop import LaptopSpider
+from dell.spiders.listing import EXTRACTION_MODE_FAST, EXTRACTION_MODE_LOADER
+
+
+def load_pages(args) -> list[str]:
+    """保存済みHTML、または生成したHTMLの一覧ページを返す。"""
+    if args.fixture_dir:
+        paths = sorted(Path(args.fixture_dir).glob("page_*.html"), key=lambda path: int(path.stem.split("_")[1]))
+        return [path.read_text(encoding="utf-8") for path in paths]
+    return [render_listing_page(page, args.pages, args.items, with_assets=False)
+            for page in range(1, args.pages + 1)]
+
+
+def make_spider(mode: str) -> LaptopSpider:
+    spider = LaptopSpider()
+    spider.settings = Settings({"EXTRACTION_MODE": mode})
+    return spider
+
+
+def extract(spider: LaptopSpider, response) -> list:
+    """スパイダーの抽出処理をノートパソコンのカテゴリとして実行する。"""
+    return spider._extract_items_from_articles(response, spider.crawls[CATEGORY_LAPTOPS].category)
+
+
+def measure(mode: str, pages: list[str], repeat: int) -> dict:
+    """各ページの抽出を repeat 回繰り返し、1ページあたりの所要時間を返す。
+
+    レスポンスは毎回作り直す（実際のクロールと同じく、ページごとにHTMLの解析も含めて計測する）。
+    """
+    spider = make_spider(mode)
+    durations = []
+    items = 0
+    for _ in range(repeat):
+        for index, html in enumerate(pages):
+            response = HtmlResponse(url=f"https://example.com/?page={index + 1}", body=html, encoding="utf-8")
+            started = time.perf_counter()
+            items += len(extract(spider, response))
+            durations.append(time.perf_counter() - started)
+
+    durations.sort()
+    total = sum(durations)
+    return {
+        "mode": mode,
+        "pages": len(durations),
+        "items": items,
+        "mean_ms": round(statistics.mean(durations) * 1000, 3),
+        "p95_ms": round(durations[math.ceil(len(durations) * 0.95) - 1] * 1000, 3),
+        "items_per_second": round(items / total) if total else None,
+    }
+
+
+def verify(pages: list[str]) -> int:
+    """両方の抽出方法の結果が一致することを確認し、商品数を返す。"""
+    loader, fast = make_spider(EXTRACTION_MODE_LOADER), make_spider(EXTRACTION_MODE_FAST)
+    count = 0
+    for index, html in enumerate(pages):
+        response = HtmlResponse(url=f"https://example.com/?page={index + 1}", body=html, encoding="utf-8")
+        expected = [dict(item) for item in extract(loader, response)]
+        actual = extract(fast, response)
+        if expected != actual:
+            raise AssertionError(f"{index + 1}ページ目の抽出結果が一致しません: {expected[:1]} != {actual[:1]}")
+        count += len(actual)
+    return count
+
+
+def main(args) -> None:
+    pages = load_pages(args)
+    print(f"一覧ページ: {len(pages)}ページ, 商品: {verify(pages)}件（loader と fast の結果は一致）")
+    for mode in (EXTRACTION_MODE_LOADER, EXTRACTION_MODE_FAST):
+        print(json.dumps(measure(mode, pages, args.repeat), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20, help="生成する一覧ページ数")
+    parser.add_argument("--items", type=int, default=60, help="1ページあたりの商品数")
+    parser.add_argument("--fixture-dir", help="保存済みHTML（page_N.html）のディレクトリ")
+    parser.add_argument("--repeat", type=int, default=5, help="各ページを抽出する回数")
+    main(parser.parse_args())
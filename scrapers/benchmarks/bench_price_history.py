@@ -0,0 +1,153 @@
+"""価格推移の取得クエリの所要時間を、履歴の保存形式ごとに計測する（SQLite）。
+
+1. raw: 毎回のスクレイプ結果をすべて保存した PriceHistory（インデックスなし）
+2. indexed: raw に (order_code, scraped_at) の複合インデックスを追加
+3. compacted: 変化点のみに圧縮した PriceHistory（migrations/compact_price_history.py と同じ処理）
+4. rollup: 日次ロールアップ（PriceDailyRollup）
+
+    cd scrapers
+    python -m benchmarks.bench_price_history --products 500 --observations 2000
+"""
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select
+
+from dell.price_history import close_superseded_rows
+from migrations.compact_price_history import delete_consecutive_duplicates, rebuild_rollups
+from model import models
+
+INSERT_CHUNK_SIZE = 50000
+SCRAPE_INTERVAL = timedelta(hours=6)  # 1日4回のスクレイプを模擬する
+
+
+def generate_history(products: int, observations: int, change_rate: float, seed: int):
+    """商品ごとに一定間隔で観測した価格の履歴行を生成する（価格は change_rate の確率で変わる）。"""
+    rng = random.Random(seed)
+    started_at = datetime(2024, 1, 1)
+    for product in range(products):
+        order_code = f"cn{product:07d}"
+        price = rng.randrange(80000, 300000, 1000)
+        for n in range(observations):
+            if rng.random() < change_rate:
+                price = max(10000, price + rng.choice((-1, 1)) * rng.randrange(1000, 20000, 1000))
+            yield order_code, price, started_at + SCRAPE_INTERVAL * n
+
+
+def load_history(engine, args) -> int:
+    """Products と PriceHistory（インデックスなし）を作成し、生成した履歴を書き込む。"""
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for index in models.PriceHistory.__table__.indexes:
+            index.drop(conn)
+        conn.execute(models.Products.__table__.insert(), [
+            {"order_code": f"cn{product:07d}"} for product in range(args.products)
+        ])
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        chunk, total = [], 0
+        for row in generate_history(args.products, args.observations, args.change_rate, args.seed):
+            chunk.append(row)
+            if len(chunk) >= INSERT_CHUNK_SIZE:
+                cursor.executemany(
+                    f'INSERT INTO "{models.PRICE_HISTORY_TABLE}" (order_code, price, scraped_at) VALUES (?, ?, ?)',
+                    [(code, price, at.isoformat(sep=" ")) for code, price, at in chunk])
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            cursor.executemany(
+                f'INSERT INTO "{models.PRICE_HISTORY_TABLE}" (order_code, price, scraped_at) VALUES (?, ?, ?)',
+                [(code, price, at.isoformat(sep=" ")) for code, price, at in chunk])
+            total += len(chunk)
+        raw.commit()
+    finally:
+        raw.close()
+    return total
+
+
+def measure(engine, label: str, query_for, order_codes: list[str]) -> dict:
+    """商品ごとに価格推移を取得するクエリを実行し、所要時間の統計を返す。"""
+    durations, points = [], 0
+    with engine.connect() as conn:
+        for order_code in order_codes:
+            started = time.perf_counter()
+            points += len(conn.execute(query_for(order_code)).all())
+            durations.append(time.perf_counter() - started)
+    durations.sort()
+    return {
+        "variant": label,
+        "queries": len(durations),
+        "mean_ms": round(statistics.mean(durations) * 1000, 3),
+        "p95_ms": round(durations[math.ceil(len(durations) * 0.95) - 1] * 1000, 3),
+        "points_per_query": round(points / len(durations), 1),
+    }
+
+
+def history_query(order_code: str):
+    history = models.PriceHistory
+    return (select(history.scraped_at, history.price)
+            .where(history.order_code == order_code)
+            .order_by(history.scraped_at))
+
+
+def rollup_query(order_code: str):
+    rollup = models.PriceDailyRollup
+    return (select(rollup.day, rollup.min_price, rollup.max_price, rollup.last_price)
+            .where(rollup.order_code == order_code)
+            .order_by(rollup.day))
+
+
+def count_history(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(models.PriceHistory)).scalar_one()
+
+
+def main(args) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+        started = time.perf_counter()
+        total = load_history(engine, args)
+        print(f"生成: {total}行（{time.perf_counter() - started:.1f}秒）")
+
+        rng = random.Random(args.seed)
+        order_codes = [f"cn{rng.randrange(args.products):07d}" for _ in range(args.queries)]
+        results = [measure(engine, "raw", history_query, order_codes)]
+
+        with engine.begin() as conn:
+            for index in models.PriceHistory.__table__.indexes:
+                index.create(conn)
+        results.append(measure(engine, "indexed", history_query, order_codes))
+
+        with engine.begin() as conn:
+            rebuild_rollups(conn)
+            delete_consecutive_duplicates(conn)
+            close_superseded_rows(conn)
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+        print(f"圧縮後: {count_history(engine)}行")
+        results.append(measure(engine, "compacted", history_query, order_codes))
+        results.append(measure(engine, "rollup", rollup_query, order_codes))
+        engine.dispose()
+
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=500, help="商品数")
+    parser.add_argument("--observations", type=int, default=2000, help="商品ごとの観測回数")
+    parser.add_argument("--change-rate", type=float, default=0.02, help="観測ごとに価格が変わる確率")
+    parser.add_argument("--queries", type=int, default=200, help="計測する価格推移クエリの回数")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
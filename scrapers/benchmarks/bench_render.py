@@ -0,0 +1,91 @@
+"""Playwrightの描画プロファイル（full / light）ごとの一覧ページ描画時間を計測する。
+
+ローカルのフィクスチャサーバーが配信する一覧ページを、dell/rendering.py と同じ条件で描画する。
+
+    cd scrapers
+    python -m benchmarks.bench_render --pages 10 --items 24
+    python -m benchmarks.bench_render --fixture-dir path/to/saved_pages
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import time
+
+from playwright.async_api import async_playwright
+
+from benchmarks.fixtures import FixtureServer
+from dell import settings
+from dell.rendering import (
+    ARTICLE_SELECTOR, RENDER_CONTEXT_KWARGS, RENDER_PROFILE_FULL, RENDER_PROFILE_LIGHT,
+    should_abort_request
+)
+
+
+def launch_options() -> dict:
+    """settings.py の起動オプションを使う（ローカルに実行ファイルが無い場合はPlaywright同梱のものを使う）。"""
+    options = dict(settings.PLAYWRIGHT_LAUNCH_OPTIONS)
+    if not os.path.exists(options.get("executable_path", "")):
+        options.pop("executable_path", None)
+    return options
+
+
+async def render_pages(browser, profile: str, urls: list[str]) -> dict:
+    """1つのコンテキストを使い回して各ページを描画し、所要時間とリクエスト数を返す。"""
+    context = await browser.new_context(**RENDER_CONTEXT_KWARGS)
+    counts = {"requests": 0, "aborted": 0}
+
+    async def route_handler(route):
+        counts["requests"] += 1
+        if profile == RENDER_PROFILE_LIGHT and should_abort_request(route.request):
+            counts["aborted"] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", route_handler)
+    durations = []
+    for url in urls:
+        page = await context.new_page()
+        started = time.perf_counter()
+        if profile == RENDER_PROFILE_LIGHT:
+            await page.goto(url, wait_until="domcontentloaded")
+            await page.wait_for_selector(ARTICLE_SELECTOR)
+        else:
+            await page.goto(url)
+        await page.content()
+        durations.append(time.perf_counter() - started)
+        await page.close()
+    await context.close()
+
+    durations.sort()
+    return {
+        "profile": profile,
+        "pages": len(urls),
+        "total_seconds": round(sum(durations), 3),
+        "mean_seconds": round(statistics.mean(durations), 3),
+        "p95_seconds": round(durations[math.ceil(len(durations) * 0.95) - 1], 3),
+        **counts,
+    }
+
+
+async def main(args) -> None:
+    with FixtureServer(total_pages=args.pages, items_per_page=args.items,
+                       fixture_dir=args.fixture_dir, asset_delay=args.asset_delay) as server:
+        urls = [f"{server.listing_url}?page={page}" for page in range(1, server.total_pages + 1)]
+        async with async_playwright() as playwright:
+            browser = await playwright.chromium.launch(**launch_options())
+            for profile in (RENDER_PROFILE_FULL, RENDER_PROFILE_LIGHT):
+                print(json.dumps(await render_pages(browser, profile, urls), ensure_ascii=False))
+            await browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=10, help="生成する一覧ページ数")
+    parser.add_argument("--items", type=int, default=24, help="1ページあたりの商品数")
+    parser.add_argument("--asset-delay", type=float, default=0.05, help="画像等の配信遅延（秒）")
+    parser.add_argument("--fixture-dir", help="保存済みHTML（page_N.html）のディレクトリ")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,112 @@
+"""ローカルのフィクスチャサーバーに対して分担クロール（app.py --shards）を実行し、
+ワーカー数ごとのクロール時間と、分担の結果の重複・欠落を確認する。
+
+ワーカー数ごとに新しいDBを使い、同じ一覧ページを2回クロールする。
+1. initial: すべて新規の商品
+2. repeat: 同じ価格で再度クロール（価格履歴が増えないこと＝書き込みが冪等であることを確認）
+
+Playwrightでの描画時間は --page-delay（一覧ページ1つを返すまでの待ち時間）で再現する。
+ワーカーごとの同時取得数は --concurrency（1ワーカー＝1つのChromiumで描画できるページ数に相当）。
+wall_seconds にはワーカーの起動（Scrapy・scrapy-playwright の初期化）が含まれるため、
+ワーカー数による取得時間の違いは crawl_seconds（最初の分担の確保から最後の分担の完了まで）で比較する。
+
+    cd scrapers
+    python -m benchmarks.bench_shards --pages 40 --page-delay 0.5 --workers 1 2 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, select
+
+from benchmarks.fixtures import FixtureServer
+from model import models
+
+
+def run_app(server: FixtureServer, workers: int, args) -> tuple[dict, float]:
+    """app.py を別プロセスで実行し、クロール結果とかかった時間を返す。"""
+    command = [sys.executable, "app.py", "laptop", "-a", f"start_url={server.listing_url}",
+               "--shards", str(workers)]
+    started = time.perf_counter()
+    completed = subprocess.run(command, capture_output=True, text=True)
+    wall_seconds = time.perf_counter() - started
+    if args.verbose:
+        sys.stderr.write(completed.stderr)
+    try:
+        return json.loads(completed.stdout), wall_seconds
+    except ValueError:
+        sys.stderr.write(completed.stderr[-2000:])
+        raise RuntimeError(f"app.py が失敗しました（終了コード: {completed.returncode}）")
+
+
+def count_rows(database_url: str) -> dict:
+    """Products・PriceHistory・PriceChanges の行数と、同じ価格の変化点が重複している行数を返す。"""
+    engine = create_engine(database_url)
+    history = models.PriceHistory
+    with engine.connect() as conn:
+        duplicated = conn.execute(
+            select(func.count()).select_from(
+                select(history.order_code, history.price)
+                .group_by(history.order_code, history.price)
+                .having(func.count() > 1)
+                .subquery()
+            )
+        ).scalar()
+        result = {
+            "products": conn.execute(select(func.count()).select_from(models.Products)).scalar(),
+            "price_history": conn.execute(select(func.count()).select_from(history)).scalar(),
+            "duplicated_history": duplicated,
+            "price_changes": conn.execute(select(func.count()).select_from(models.PriceChanges)).scalar(),
+        }
+    engine.dispose()
+    return result
+
+
+def measure(workers: int, args, tmpdir: str) -> list[dict]:
+    database_url = f"sqlite:///{os.path.join(tmpdir, f'shards_{workers}.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    results = []
+    with FixtureServer(total_pages=args.pages, items_per_page=args.items, page_delay=args.page_delay) as server:
+        for label in ("initial", "repeat"):
+            server.hits.clear()
+            result, wall_seconds = run_app(server, workers, args)
+            results.append({
+                "crawl": label,
+                "workers": workers,
+                "status": result["status"],
+                "wall_seconds": round(wall_seconds, 3),
+                "crawl_seconds": result["shards"]["crawl_seconds"],
+                "shards": result["shards"]["statuses"],
+                "pages_fetched": sum(server.hits.values()),
+                "pages_fetched_twice": sorted(page for page, hits in server.hits.items() if hits > 1),
+                **count_rows(database_url),
+            })
+    return results
+
+
+def main(args) -> None:
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault("LINE_ACCESS_TOKEN", "benchmark")  # 新規DBのため通知は送信されない
+    os.environ["FETCH_MODE"] = "http"
+    os.environ["LISTING_PAGE_CONCURRENCY"] = str(args.concurrency)
+    os.environ["INCREMENTAL_CRAWL"] = "0"  # 2回目も全ページの商品を書き込む
+    print(f"一覧ページ: {args.pages}ページ × {args.items}商品, 描画時間: {args.page_delay}秒/ページ")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for workers in args.workers:
+            for result in measure(workers, args, tmpdir):
+                print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=40, help="生成する一覧ページ数")
+    parser.add_argument("--items", type=int, default=24, help="1ページあたりの商品数")
+    parser.add_argument("--page-delay", type=float, default=0.5, help="一覧ページ1つを返すまでの待ち時間（秒）")
+    parser.add_argument("--concurrency", type=int, default=3, help="ワーカーごとの同時取得数")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="計測するワーカー数")
+    parser.add_argument("--verbose", action="store_true", help="ワーカーのログを表示する")
+    main(parser.parse_args())
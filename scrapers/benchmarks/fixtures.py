@@ -0,0 +1,190 @@
+"""ベンチマーク用のDell一覧ページのフィクスチャと、それを配信するローカルHTTPサーバー"""
+import re
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+LISTING_PATH = "/ja-jp/shop/dell-laptops/scr/laptops"
+ASSET_DELAY = 0.05  # 画像・フォント等の配信に付ける遅延（秒）。実サイトの重いリソースを模擬する
+IMAGES_PER_ARTICLE = 4
+
+# 保存済みHTMLを複製して商品数を増やすときに書き換える箇所
+ORDER_CODE_PATTERN = re.compile(r'/([^/"?]+)\?ref')
+PRICE_PATTERN = re.compile(r'(ps-variant-price-amount[^>]*>)\s*([\d,]+)円')
+TOTAL_PAGES_PATTERN = re.compile(r'(dds__pagination__page-range-total[^>]*>)\s*\d+\s*<')
+
+
+def render_listing_page(page: int, total_pages: int, items_per_page: int,
+                        price_offset: int = 0, with_assets: bool = True) -> str:
+    """Dellの一覧ページと同じ構造のHTMLを生成する。
+
+    Args:
+        page (int): ページ番号（1始まり）
+        total_pages (int): 総ページ数
+        items_per_page (int): 1ページあたりの商品数
+        price_offset (int): 全商品の価格に加算する値（価格変動の再現用）
+        with_assets (bool): 画像・フォント・スクリプトの参照を含めるか
+
+    Returns:
+        str: 一覧ページのHTML
+    """
+    articles = []
+    for index in range(items_per_page):
+        code = f"cn{page:03d}{index:04d}"
+        price = 100000 + page * 1000 + index * 10 + price_offset
+        images = "".join(
+            f'<img src="/assets/{code}_{n}.jpg" width="200" height="150">'
+            for n in range(IMAGES_PER_ARTICLE)
+        ) if with_assets else ""
+        articles.append(
+            f'<article class="variant-stack ps-stack" id="{code}">'
+            f'{images}'
+            f'<h3><a href="//www.dell.com/ja-jp/shop/cty/pdp/spd/inspiron-{page}/{code}?ref=p13n">'
+            f'Inspiron {page % 7 + 13} ノートパソコン</a></h3>'
+            f'<div class="ps-model-number"><span>モデル番号</span><span>モデル: {code.upper()}</span></div>'
+            f'<span class="ps-variant-price-amount">{price:,}円</span>'
+            f'</article>'
+        )
+
+    head = (
+        '<link rel="stylesheet" href="/assets/fonts.css">'
+        '<script src="/assets/analytics.js"></script>'
+    ) if with_assets else ""
+    return (
+        f'<!DOCTYPE html><html lang="ja"><head><meta charset="utf-8">{head}</head><body>'
+        f'<main>{"".join(articles)}</main>'
+        f'<span class="dds__pagination__page-range-total"> {total_pages} </span>'
+        f'</body></html>'
+    )
+
+
+def scale_recorded_page(html: str, copy: int, total_pages: int, price_offset: int = 0) -> str:
+    """保存済みの一覧ページを、商品数を増やすための複製として書き換える。
+
+    Args:
+        html (str): 保存済みの一覧ページのHTML
+        copy (int): 複製の番号（0 は元のページ。1 以降は注文コードに -x<copy> を付けて別の商品にする）
+        total_pages (int): 複製後の総ページ数（ページ送りの総数を書き換える）
+        price_offset (int): 全商品の価格に加算する値（価格変動の再現用）
+
+    Returns:
+        str: 書き換えた一覧ページのHTML
+    """
+    if copy:
+        html = ORDER_CODE_PATTERN.sub(lambda m: f"/{m.group(1)}-x{copy}?ref", html)
+    if price_offset:
+        html = PRICE_PATTERN.sub(
+            lambda m: f"{m.group(1)}{int(m.group(2).replace(',', '')) + price_offset:,}円", html)
+    return TOTAL_PAGES_PATTERN.sub(lambda m: f"{m.group(1)} {total_pages} <", html)
+
+
+class FixtureServer:
+    """一覧ページのフィクスチャを配信するローカルHTTPサーバー
+
+    fixture_dir を指定した場合は保存済みのHTML（page_1.html, page_2.html, ...）を、
+    指定しない場合は render_listing_page で生成したHTMLを配信する。
+    保存済みのHTMLは scale 回複製し（scale_recorded_page）、保存したページ数 × scale ページとして配信する。
+
+    Attributes:
+        total_pages (int): 総ページ数
+        items_per_page (int): 1ページあたりの商品数（生成する場合のみ使用）
+        price_offset (int): 価格に加算する値（変更後は set_price_offset を使う）
+        page_delay (float): 一覧ページを返すまでの待ち時間（秒。Playwrightでの描画時間の再現用）
+        hits (dict[int, int]): ページ番号ごとのリクエスト回数
+    """
+
+    def __init__(self, total_pages: int = 5, items_per_page: int = 12, fixture_dir=None,
+                 price_offset: int = 0, asset_delay: float = ASSET_DELAY,
+                 host: str = "127.0.0.1", port: int = 0, scale: int = 1, page_delay: float = 0):
+        self.fixture_dir = Path(fixture_dir) if fixture_dir else None
+        self.recorded_pages = 0
+        if self.fixture_dir:
+            self.recorded_pages = len(list(self.fixture_dir.glob("page_*.html")))
+            total_pages = self.recorded_pages * scale
+        self.total_pages = total_pages
+        self.items_per_page = items_per_page
+        self.price_offset = price_offset
+        self.asset_delay = asset_delay
+        self.page_delay = page_delay
+        self.hits: dict[int, int] = {}
+        self._cache: dict[int, bytes] = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def listing_url(self) -> str:
+        return f"{self.base_url}{LISTING_PATH}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def set_price_offset(self, price_offset: int) -> None:
+        """以降に配信する全商品の価格を変更する（価格変動の再現用）。"""
+        with self._lock:
+            self.price_offset = price_offset
+            self._cache.clear()
+
+    def page_body(self, page: int) -> bytes | None:
+        """ページ番号に対応するHTMLを返す（範囲外はNone）。"""
+        if not 1 <= page <= self.total_pages:
+            return None
+        with self._lock:
+            self.hits[page] = self.hits.get(page, 0) + 1
+            if page not in self._cache:
+                if self.fixture_dir:
+                    copy, recorded_page = divmod(page - 1, self.recorded_pages)
+                    html = (self.fixture_dir / f"page_{recorded_page + 1}.html").read_text(encoding="utf-8")
+                    html = scale_recorded_page(html, copy, self.total_pages, self.price_offset)
+                else:
+                    html = render_listing_page(page, self.total_pages, self.items_per_page,
+                                               self.price_offset)
+                self._cache[page] = html.encode("utf-8")
+            return self._cache[page]
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path == LISTING_PATH:
+                    page = int(parse_qs(parsed.query).get("page", ["1"])[0])
+                    body = server.page_body(page)
+                    if server.page_delay:
+                        time.sleep(server.page_delay)
+                    if body is None:
+                        return self._send(404, b"", "text/plain")
+                    return self._send(200, body, "text/html; charset=utf-8")
+                if parsed.path.startswith("/assets/"):
+                    time.sleep(server.asset_delay)
+                    content_type = ("text/css" if parsed.path.endswith(".css")
+                                    else "application/javascript" if parsed.path.endswith(".js")
+                                    else "image/jpeg")
+                    return self._send(200, b"/* fixture */", content_type)
+                return self._send(404, b"", "text/plain")
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,60 @@
+"""Dellの一覧ページを描画してHTMLを保存し、ベンチマーク用のフィクスチャを作成する（初回のみ実行）。
+
+保存したディレクトリは FixtureServer(fixture_dir=...) や bench_crawl / bench_render の
+--fixture-dir にそのまま指定できる（page_1.html, page_2.html, ...）。
+
+    cd scrapers
+    python -m benchmarks.record_fixtures --output benchmarks/recorded --pages 5
+    python -m benchmarks.record_fixtures --output benchmarks/recorded_monitors --category monitors
+"""
+import argparse
+import asyncio
+import re
+
+from pathlib import Path
+
+from playwright.async_api import async_playwright
+
+from benchmarks.bench_render import launch_options
+from dell.categories import CATEGORIES, CATEGORY_LAPTOPS
+from dell.rendering import RENDER_CONTEXT_KWARGS
+
+TOTAL_PAGES_PATTERN = re.compile(r'dds__pagination__page-range-total[^>]*>\s*(\d+)\s*<')
+
+
+async def main(args) -> None:
+    category = CATEGORIES[args.category]
+    start_url = args.url or category.start_url
+    output = Path(args.output)
+    output.mkdir(parents=True, exist_ok=True)
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(**launch_options())
+        context = await browser.new_context(**RENDER_CONTEXT_KWARGS)
+        total_pages = args.pages
+        page_number = 1
+        while page_number <= total_pages:
+            url = start_url if page_number == 1 else f"{start_url}?page={page_number}"
+            page = await context.new_page()
+            await page.goto(url, wait_until="domcontentloaded")
+            await page.wait_for_selector(category.selectors.wait_for)
+            html = await page.content()
+            await page.close()
+
+            if page_number == 1:
+                # 実サイトの総ページ数より多くは保存しない
+                match = TOTAL_PAGES_PATTERN.search(html)
+                if match:
+                    total_pages = min(total_pages, int(match.group(1)))
+            (output / f"page_{page_number}.html").write_text(html, encoding="utf-8")
+            print(f"保存: {url} -> page_{page_number}.html")
+            page_number += 1
+        await browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", required=True, help="保存先のディレクトリ")
+    parser.add_argument("--pages", type=int, default=5, help="保存する一覧ページ数")
+    parser.add_argument("--category", default=CATEGORY_LAPTOPS, choices=list(CATEGORIES), help="保存するカテゴリ")
+    parser.add_argument("--url", help="一覧ページのURL（省略時はカテゴリのURL）")
+    asyncio.run(main(parser.parse_args()))
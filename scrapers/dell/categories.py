@@ -0,0 +1,60 @@
+"""クロールする商品カテゴリの設定
+
+カテゴリごとに一覧ページのURLと、商品情報を取り出すセレクタを定義する。
+Dellの一覧ページ（/scr/...）はカテゴリが違っても同じ構造のため、既定のセレクタを共有する。
+構造の異なるカテゴリを追加する場合は、ListingSelectors を個別に指定する。
+"""
+from dataclasses import dataclass, field
+
+from dell.rendering import ARTICLE_SELECTOR
+
+
+@dataclass(frozen=True)
+class ListingSelectors:
+    """一覧ページから商品情報を取り出すセレクタ（フィールドは article からの相対 XPath）"""
+    article: str = '//article[@class="variant-stack ps-stack"]'
+    link: str = ".//h3/a/@href"  # order_code と url の元になるリンク
+    name: str = ".//h3/a/text()"
+    model: str = ".//div[@class='ps-model-number']/span[2]/text()"
+    price: str = ".//span[@class='ps-variant-price-amount']/text()"
+    total_pages: str = '//span[@class="dds__pagination__page-range-total"]/text()'
+    wait_for: str = ARTICLE_SELECTOR  # Playwrightで描画完了を判定するCSSセレクタ
+
+
+@dataclass(frozen=True)
+class Category:
+    """クロールする商品カテゴリ
+
+    Attributes:
+        name (str): カテゴリ名（Products.category に保存する）
+        start_url (str): 一覧ページの1ページ目のURL
+        selectors (ListingSelectors): 商品情報を取り出すセレクタ
+    """
+    name: str
+    start_url: str
+    selectors: ListingSelectors = field(default_factory=ListingSelectors)
+
+
+CATEGORY_LAPTOPS = "laptops"
+CATEGORY_DESKTOPS = "desktops"
+CATEGORY_MONITORS = "monitors"
+CATEGORY_ACCESSORIES = "accessories"
+
+CATEGORIES = {
+    category.name: category for category in (
+        Category(CATEGORY_LAPTOPS, "https://www.dell.com/ja-jp/shop/dell-laptops/scr/laptops"),
+        Category(CATEGORY_DESKTOPS, "https://www.dell.com/ja-jp/shop/desktop-computers/scr/desktops"),
+        Category(CATEGORY_MONITORS, "https://www.dell.com/ja-jp/shop/dell-monitors/scr/monitors"),
+        Category(CATEGORY_ACCESSORIES, "https://www.dell.com/ja-jp/shop/accessories/scr/accessories"),
+    )
+}
+
+
+def get_categories(names) -> list[Category]:
+    """カンマ区切りの文字列またはリストのカテゴリ名から Category のリストを返す（不明な名前は ValueError）。"""
+    if isinstance(names, str):
+        names = [name.strip() for name in names.split(",") if name.strip()]
+    unknown = [name for name in names if name not in CATEGORIES]
+    if unknown:
+        raise ValueError(f"不明なカテゴリです: {unknown}（指定できるカテゴリ: {list(CATEGORIES)}）")
+    return [CATEGORIES[name] for name in names]
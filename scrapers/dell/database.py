@@ -0,0 +1,81 @@
+import os
+
+from datetime import datetime
+
+import pytz
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from model import models
+
+
+# 定数
+load_dotenv()
+
+if os.environ.get("DATABASE_URL"):
+    # ベンチマーク等で接続先を直接指定する場合
+    SQLALCHEMY_DATABASE_URI = os.environ["DATABASE_URL"]
+elif os.environ.get("ENV") == "local":
+    SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(os.getcwd(), 'instance', 'dell_laptop.db')}"
+else:
+    USER_NAME = os.environ.get('POSTGRE_USER_NAME')
+    PASSWORD = os.environ.get('POSTGRE_PASSWORD')
+    HOST_NAME = os.environ.get('POSTGRE_HOST_NAME')
+    DB_NAME = os.environ.get('POSTGRE_DB_NAME')
+    SQLALCHEMY_DATABASE_URI = f"postgresql://{USER_NAME}:{PASSWORD}@{HOST_NAME}.oregon-postgres.render.com/{DB_NAME}?sslmode=require"
+
+SCRAPE_GENERATION_ID = 1  # ScrapeGeneration は1行のみ
+CATALOG_WRITE_LOCK_KEY = 7305002  # 商品・価格履歴の書き込みを直列化する pg_advisory_xact_lock のキー
+
+# 方言ごとの INSERT ... ON CONFLICT 構文
+UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def create_db_engine():
+    """データベースに接続するエンジンを作成し、未作成のテーブルを作成する。"""
+    engine = create_engine(SQLALCHEMY_DATABASE_URI)
+    models.Base.metadata.create_all(engine)
+    return engine
+
+
+def dialect_name(bind) -> str:
+    """Engine / Connection / Session から接続先の方言名を取得する。"""
+    dialect = getattr(bind, "dialect", None) or bind.get_bind().dialect
+    return dialect.name
+
+
+def upsert_insert(bind, table):
+    """接続先の方言に応じた、ON CONFLICT 句を付けられる INSERT 文を作成する。"""
+    return UPSERT_INSERTS[dialect_name(bind)](table)
+
+
+def least_greatest(bind):
+    """2引数の最小・最大の関数（PostgreSQLではLEAST/GREATEST、SQLiteではMIN/MAX）を返す。"""
+    if dialect_name(bind) == "postgresql":
+        return func.least, func.greatest
+    return func.min, func.max
+
+
+def lock_catalog_writes(session) -> None:
+    """分担クロールの複数のワーカーからの商品・価格履歴の書き込みを、トランザクション単位で直列化する。
+
+    PostgreSQLのみ（トランザクション終了時に解放される）。SQLiteは書き込みが常に直列化される。
+    """
+    if dialect_name(session) == "postgresql":
+        session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CATALOG_WRITE_LOCK_KEY})
+
+
+def bump_scrape_generation(engine) -> None:
+    """スクレイプ世代番号を1つ進め、APIのキャッシュを無効化する。"""
+    table = models.ScrapeGeneration
+    stmt = upsert_insert(engine, table).values(
+        id=SCRAPE_GENERATION_ID, generation=1, updated_at=datetime.now(pytz.timezone('Asia/Tokyo')))
+    with engine.begin() as conn:
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=[table.id],
+            set_={"generation": table.generation + 1, "updated_at": stmt.excluded.updated_at},
+        ))
@@ -0,0 +1,159 @@
+# Define here your extensions
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/extensions.html
+
+import json
+import logging
+import os
+import resource
+import sys
+
+from datetime import datetime
+
+import pytz
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from dell.database import create_db_engine
+from model import models
+
+logger = logging.getLogger(__name__)
+
+# 計測する処理（stats の perf/<名前>_* に記録する）
+TIMING_DOWNLOAD_HTTP = "download_http"  # HTTPでの一覧ページの取得
+TIMING_DOWNLOAD_PLAYWRIGHT = "download_playwright"  # Playwrightでの一覧ページの描画
+TIMING_EXTRACTION = "extraction"  # 一覧ページからの商品の抽出
+TIMING_DB_FLUSH = "db_flush"  # パイプラインのDBへの書き込み
+TIMING_NOTIFICATION = "notification"  # 通知を積んでから送信完了まで
+TIMINGS = (TIMING_DOWNLOAD_HTTP, TIMING_DOWNLOAD_PLAYWRIGHT, TIMING_EXTRACTION, TIMING_DB_FLUSH,
+           TIMING_NOTIFICATION)
+
+
+def record_timing(stats, name: str, seconds: float) -> None:
+    """処理時間を stats に記録する（回数・合計・最大）。"""
+    stats.inc_value(f"perf/{name}_count")
+    stats.inc_value(f"perf/{name}_seconds", seconds)
+    stats.max_value(f"perf/{name}_max_seconds", seconds)
+
+
+def summarize_timing(stats: dict, name: str) -> dict:
+    """stats に記録した処理時間の回数・合計・平均・最大を返す。"""
+    count = stats.get(f"perf/{name}_count", 0)
+    total = stats.get(f"perf/{name}_seconds", 0.0)
+    return {
+        "count": count,
+        "total_seconds": round(total, 4),
+        "avg_seconds": round(total / count, 4) if count else None,
+        "max_seconds": round(stats.get(f"perf/{name}_max_seconds", 0.0), 4) if count else None,
+    }
+
+
+def peak_rss_mb() -> float:
+    """プロセスの最大RSS（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS はバイト単位
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class CrawlPerformanceExtension:
+    """クロールの処理時間と最大RSSを集計し、実行記録（JSON Lines と ScrapeRuns）に書き出す
+
+    一覧ページの取得時間はこの拡張が response_received で記録し、抽出時間・DB書き込み時間・
+    通知の遅延はスパイダーとパイプラインが record_timing で stats に記録する。
+    settings.py の PERF_REPORT_ENABLED が有効な場合のみ動作する。
+    """
+
+    def __init__(self, stats, report_file: str = "", save_to_db: bool = True):
+        self.stats = stats
+        self.report_file = report_file
+        self.save_to_db = save_to_db
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("PERF_REPORT_ENABLED"):
+            raise NotConfigured
+        ext = cls(crawler.stats, settings.get("PERF_REPORT_FILE", ""), settings.getbool("PERF_REPORT_DB", True))
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        # パイプラインの close_spider と CoreStats（finish_reason など）の後に集計する
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def response_received(self, response, request, spider):
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            name = TIMING_DOWNLOAD_PLAYWRIGHT if request.meta.get("playwright") else TIMING_DOWNLOAD_HTTP
+            record_timing(self.stats, name, latency)
+
+    def spider_closed(self, spider, reason):
+        report = self.build_report(spider, reason)
+        logger.info(f"クロール実行記録: {json.dumps(report, ensure_ascii=False, default=str)}")
+        if self.report_file:
+            self._append_report_file(report)
+        if self.save_to_db:
+            try:
+                self._save_report(report)
+            except Exception as e:
+                # 実行記録の保存に失敗してもクロール結果には影響させない
+                logger.error(f"クロール実行記録の保存失敗: {e}", exc_info=True)
+
+    def build_report(self, spider, reason: str) -> dict:
+        """stats から1回分のクロールの実行記録を作成する。"""
+        stats = self.stats.get_stats()
+        jst = pytz.timezone('Asia/Tokyo')
+        start_time = stats.get("start_time")  # UTC
+        return {
+            "spider": spider.name,
+            "started_at": start_time.astimezone(jst) if start_time else None,
+            "finished_at": datetime.now(jst),
+            "finish_reason": reason,
+            "duration_seconds": stats.get("elapsed_time_seconds"),
+            "items": stats.get("item_scraped_count", 0),
+            "pages": stats.get("response_received_count", 0),
+            "updated_count": stats.get("pipeline/updated_count", 0),
+            "peak_rss_mb": peak_rss_mb(),
+            "timings": {name: summarize_timing(stats, name) for name in TIMINGS},
+        }
+
+    def _append_report_file(self, report: dict) -> None:
+        """実行記録をJSON Lines形式でファイルに追記する。"""
+        directory = os.path.dirname(self.report_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.report_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False, default=str) + "\n")
+
+    def _save_report(self, report: dict) -> None:
+        """実行記録を ScrapeRuns に1行追加する。"""
+        timings = report["timings"]
+        engine = create_db_engine()
+        try:
+            with engine.begin() as conn:
+                conn.execute(models.ScrapeRuns.__table__.insert().values(
+                    spider=report["spider"],
+                    started_at=report["started_at"],
+                    finished_at=report["finished_at"],
+                    finish_reason=report["finish_reason"],
+                    duration_seconds=report["duration_seconds"],
+                    item_count=report["items"],
+                    page_count=report["pages"],
+                    updated_count=report["updated_count"],
+                    download_avg_seconds=_average_download_seconds(timings),
+                    extraction_seconds=timings[TIMING_EXTRACTION]["total_seconds"],
+                    db_flush_seconds=timings[TIMING_DB_FLUSH]["total_seconds"],
+                    notification_avg_seconds=timings[TIMING_NOTIFICATION]["avg_seconds"],
+                    peak_rss_mb=report["peak_rss_mb"],
+                    report=json.dumps(report, ensure_ascii=False, default=str),
+                ))
+        finally:
+            engine.dispose()
+
+
+def _average_download_seconds(timings: dict) -> float | None:
+    """HTTP・Playwright を合わせた一覧ページ1つあたりの平均取得時間"""
+    downloads = [timings[TIMING_DOWNLOAD_HTTP], timings[TIMING_DOWNLOAD_PLAYWRIGHT]]
+    count = sum(timing["count"] for timing in downloads)
+    if not count:
+        return None
+    return round(sum(timing["total_seconds"] for timing in downloads) / count, 4)
@@ -0,0 +1,92 @@
+"""一覧ページからの商品情報の高速な抽出（settings.py の EXTRACTION_MODE = "fast"）
+
+ItemLoader は商品ごとにローダーを作り、フィールドごとに XPath を評価して MapCompose を通すため、
+商品数が多いページでは CPU 時間が目立つ。ここではコンパイル済みの lxml XPath を
+解析済みの文書（response.selector.root）に直接適用し、items.py と同じ変換処理で dict を作る。
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+
+from lxml import etree
+
+from dell.categories import ListingSelectors
+from dell.items import add_https_to_url, extract_order_code, normalize_name, parse_model, parse_price
+
+
+@dataclass(frozen=True)
+class CompiledSelectors:
+    """ListingSelectors をコンパイルした XPath"""
+    article: etree.XPath
+    link: etree.XPath
+    name: etree.XPath
+    model: etree.XPath
+    price: etree.XPath
+
+
+@lru_cache(maxsize=None)
+def compile_selectors(selectors: ListingSelectors) -> CompiledSelectors:
+    """カテゴリのセレクタを一度だけコンパイルする。"""
+    return CompiledSelectors(
+        article=etree.XPath(selectors.article),
+        link=etree.XPath(selectors.link),
+        name=etree.XPath(selectors.name),
+        model=etree.XPath(selectors.model),
+        price=etree.XPath(selectors.price),
+    )
+
+
+def _first(values) -> str | None:
+    """XPath の結果から最初の空でない文字列を返す（TakeFirst と同じ）。"""
+    for value in values:
+        if value is not None and value != "":
+            return str(value)
+    return None
+
+
+def extract_article(article, compiled: CompiledSelectors) -> dict:
+    """article 要素1つから商品情報の dict を作る（値がないフィールドは含めない）。"""
+    item = {}
+    href = _first(compiled.link(article))
+    if href is not None:
+        item["order_code"] = extract_order_code(href)
+        item["url"] = add_https_to_url(href)
+    name = _first(compiled.name(article))
+    if name is not None:
+        item["name"] = name
+        item["normalized_name"] = normalize_name(name)
+    model = _first(compiled.model(article))
+    if model is not None:
+        item["model"] = parse_model(model)
+    price = _first(compiled.price(article))
+    if price is not None:
+        item["price"] = parse_price(price)
+    return item
+
+
+def extract_articles(root, selectors: ListingSelectors = ListingSelectors(), category: str | None = None,
+                     on_error=None) -> list[dict]:
+    """一覧ページの文書から全商品の dict を作る。
+
+    Args:
+        root: 解析済みの文書（lxml の要素。Scrapy では response.selector.root）
+        selectors (ListingSelectors): カテゴリのセレクタ
+        category (str | None): 商品に設定するカテゴリ名
+        on_error: 商品1件の変換に失敗した場合に (article, 例外) で呼ぶ関数（省略時は例外を送出する）
+
+    Returns:
+        list[dict]: 商品情報（ProductItem と同じフィールド）
+    """
+    compiled = compile_selectors(selectors)
+    items = []
+    for article in compiled.article(root):
+        try:
+            item = extract_article(article, compiled)
+        except Exception as e:
+            if on_error is None:
+                raise
+            on_error(article, e)
+            continue
+        if category is not None:
+            item["category"] = category
+        items.append(item)
+    return items
@@ -4,18 +4,21 @@
 # https://docs.scrapy.org/en/latest/topics/items.html
 
 import re
+import unicodedata
 
 import scrapy
 from itemloaders.processors import TakeFirst, MapCompose, Join
 
 # 定数の定義
 PRICE_SUFFIX = '円'
+WHITESPACE_PATTERN = re.compile(r'\s+')
+ORDER_CODE_PATTERN = re.compile(r'/([^/]+)\?ref')
 
 
 # order_codeを抽出するための関数
 def extract_order_code(url):
     """URLの中から注文コードを抽出する"""
-    match = re.search(r'/([^/]+)\?ref', url)
+    match = ORDER_CODE_PATTERN.search(url)
     if match:
         return match.group(1)  # 抽出した注文コードを返す
     return url  # マッチしなかった場合はそのまま返す
@@ -30,14 +33,22 @@ def parse_model(model):
     """モデル名から 'モデル: ' プレフィックスを除去する"""
     return model.replace('モデル: ', '')
 
+# 商品名を正規化するユーティリティ関数
+def normalize_name(name):
+    """表記揺らぎを吸収するため、全角・半角を統一（NFKC）し、大文字小文字を区別せず、空白を除去する
+
+    例: 「Inspiron 14 ノートパソコン」と「inspiron14ノートパソコン」は同じ「inspiron14ノートパソコン」になる
+    """
+    return WHITESPACE_PATTERN.sub('', unicodedata.normalize('NFKC', name).casefold())
+
 def add_https_to_url(url):
     """URLの先頭に 'https:' を付け足す"""
     if not url.startswith("https:"):
         return f"https:{url}"
     return url
 
-class LaptopItem(scrapy.Item):
-    """ノートパソコン情報を表すアイテムクラス"""
+class ProductItem(scrapy.Item):
+    """一覧ページの商品情報を表すアイテムクラス（全カテゴリ共通）"""
     order_code = scrapy.Field(
         input_processor=MapCompose(extract_order_code),
         output_processor=TakeFirst()  # 最初の値を取得
@@ -45,6 +56,10 @@ class LaptopItem(scrapy.Item):
     name = scrapy.Field(
         output_processor=TakeFirst()  # 最初の値を取得
     )
+    normalized_name = scrapy.Field(
+        input_processor=MapCompose(normalize_name),  # 名前の表記揺らぎを吸収した検索・グループ化用の名前
+        output_processor=TakeFirst()
+    )
     model = scrapy.Field(
         input_processor=MapCompose(parse_model),  # モデル名をクリーンアップ
         output_processor=TakeFirst()
@@ -57,6 +72,13 @@ class LaptopItem(scrapy.Item):
         input_processor=MapCompose(parse_price),  # 価格をパース
         output_processor=TakeFirst()
     )
+    category = scrapy.Field(
+        output_processor=TakeFirst()  # dell/categories.py のカテゴリ名
+    )
     scraped_at = scrapy.Field(
         output_processor=TakeFirst()
     )
+
+
+class LaptopItem(ProductItem):
+    """ノートパソコン情報を表すアイテムクラス"""
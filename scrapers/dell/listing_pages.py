@@ -0,0 +1,71 @@
+"""差分クロール（IncrementalListingMiddleware）の一覧ページのフィンガープリントと、内容が変わっていないページの商品の更新
+
+ミドルウェアは一覧ページごとに ListingPage を listing_page_scraped シグナルで送り、パイプラインが
+ページの商品と同じ書き込みの流れ（同じロック・トランザクション）で次の処理を行う。
+
+- 内容が変わったページ: ページの商品を書き込めた場合だけフィンガープリントを保存する
+  （書き込みに失敗したページを次回以降「変更なし」としてスキップしないようにする）
+- 内容が変わっていないページ: 商品の最終取得日時と実行IDを更新する（ロールアップと価格の統計はパイプラインが更新する）
+"""
+import hashlib
+
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from itemadapter import ItemAdapter
+from sqlalchemy import update
+
+from dell.database import upsert_insert
+from model import models
+
+
+@dataclass
+class ListingPage:
+    """一覧ページ1つ分のフィンガープリントと商品の価格"""
+    url: str
+    fingerprint: str
+    prices: dict = field(default_factory=dict)  # order_code -> 価格
+    unchanged: bool = False  # 前回のクロールと同じ内容（商品はパイプラインに流していない）
+
+
+# 内容が変わっていないページの商品は書き込まないため、Products に保存する値をすべて含める
+# （normalized_name は name から求める）
+FINGERPRINT_FIELDS = ("order_code", "price", "name", "model", "url", "category")
+
+
+def listing_fingerprint(items) -> str:
+    """一覧ページ内の商品の FINGERPRINT_FIELDS の値からページ内容のフィンガープリントを計算する。"""
+    rows = sorted(
+        "\t".join(str(ItemAdapter(item).get(field)) for field in FINGERPRINT_FIELDS) for item in items
+    )
+    return hashlib.sha1("\n".join(rows).encode("utf-8")).hexdigest()
+
+
+def save_fingerprints(bind, pages: list[ListingPage], checked_at: datetime) -> None:
+    """一覧ページのフィンガープリントを保存する（同じURLは上書き）。"""
+    if not pages:
+        return
+    # 同じURLが1文中に複数あるとON CONFLICTが失敗するため、最後の値だけ残す
+    rows = {
+        page.url: {"url": page.url, "fingerprint": page.fingerprint, "item_count": len(page.prices),
+                   "checked_at": checked_at}
+        for page in pages
+    }
+    table = models.ListingPages
+    stmt = upsert_insert(bind, table).values(list(rows.values()))
+    bind.execute(stmt.on_conflict_do_update(
+        index_elements=[table.url],
+        set_={column: stmt.excluded[column] for column in ("fingerprint", "item_count", "checked_at")},
+    ))
+
+
+def touch_products(bind, order_codes, run_id: str | None, scraped_at: datetime) -> None:
+    """内容が変わっていないページの商品の最終取得日時と実行IDを更新する。"""
+    order_codes = list(order_codes)
+    if not order_codes:
+        return
+    bind.execute(
+        update(models.Products)
+        .where(models.Products.order_code.in_(order_codes))
+        .values(scraped_at=scraped_at, run_id=run_id)
+    )
@@ -4,10 +4,17 @@
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
 from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from sqlalchemy import select
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
 
+from dell.database import create_db_engine
+from dell.listing_pages import ListingPage, listing_fingerprint
+from dell.signals import listing_page_scraped
+from model import models
+
 
 class DellSpiderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
@@ -101,3 +108,75 @@ class DellDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class IncrementalListingMiddleware:
+    """一覧ページの内容が前回のクロールから変わっていない場合、そのページの商品をスキップする
+
+    ページ内の商品の価格・商品名・URLなどから計算したフィンガープリントが前回と一致した場合、
+    商品をパイプラインに流さず、Products の最終取得日時（scraped_at）とロールアップだけを更新する。
+    DBへの書き込み（フィンガープリントの保存と商品の更新）は listing_page_scraped シグナルを受けた
+    パイプラインが、商品の書き込みと同じロックの下で行う（dell/listing_pages.py）。
+    settings.py の INCREMENTAL_CRAWL が有効な場合のみ動作する（NOTIFICATION_TEST_MODE では無効）。
+    """
+
+    def __init__(self, stats, signals_manager):
+        self.stats = stats
+        self.signals = signals_manager
+        self.fingerprints = {}  # url -> 前回のフィンガープリント
+        self.changed_count = 0  # 内容が変わったページ数
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("INCREMENTAL_CRAWL") or settings.getbool("NOTIFICATION_TEST_MODE"):
+            raise NotConfigured
+        s = cls(crawler.stats, crawler.signals)
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def spider_opened(self, spider):
+        engine = create_db_engine()
+        with engine.connect() as conn:
+            rows = conn.execute(select(models.ListingPages.url, models.ListingPages.fingerprint))
+            self.fingerprints = dict(rows.all())
+        engine.dispose()
+        spider.logger.info(f"一覧ページのフィンガープリントを読み込みました: {len(self.fingerprints)}件")
+
+    def process_spider_output(self, response, result, spider):
+        outputs = list(result)
+        items = [output for output in outputs if is_item(output)]
+        if not items:
+            yield from outputs
+            return
+
+        url = response.request.url
+        page = ListingPage(
+            url=url,
+            fingerprint=listing_fingerprint(items),
+            prices={ItemAdapter(item).get("order_code"): ItemAdapter(item).get("price") for item in items},
+        )
+        if self.fingerprints.get(url) != page.fingerprint:
+            self.changed_count += 1
+            yield from outputs
+            # 商品がパイプラインに渡った後に送る（パイプラインは商品を書き込めたらフィンガープリントを保存する）
+            self.signals.send_catch_log(signal=listing_page_scraped, page=page, spider=spider)
+            return
+
+        # 前回と同じ内容のページは商品を流さず、最終取得日時とロールアップだけをパイプラインに更新させる
+        page.unchanged = True
+        self.signals.send_catch_log(signal=listing_page_scraped, page=page, spider=spider)
+        self.stats.inc_value("incremental/pages_skipped")
+        self.stats.inc_value("incremental/items_skipped", len(items))
+        spider.logger.info(f"前回から変更がないためスキップしました: {url}（{len(items)}件）")
+        for output in outputs:
+            if not is_item(output):
+                yield output
+
+    def spider_closed(self, spider):
+        spider.logger.info(
+            f"差分クロール結果: スキップ {self.stats.get_value('incremental/pages_skipped', 0)}ページ"
+            f"（{self.stats.get_value('incremental/items_skipped', 0)}件）,"
+            f" 更新 {self.changed_count}ページ"
+        )
@@ -5,123 +5,494 @@
 
 
 # useful for handling different item types with a single interface
-import os
+import functools
+import queue
+import threading
+import time
 
+from dataclasses import dataclass
 from datetime import datetime
-from dotenv import load_dotenv
 import pytz
-from scrapy.exceptions import DropItem
-from sqlalchemy import create_engine
+from sqlalchemy import insert, select
 from sqlalchemy.orm import sessionmaker
+from twisted.internet import defer
 
+from dell.database import bump_scrape_generation, create_db_engine, lock_catalog_writes, upsert_insert
+from dell.extensions import TIMING_DB_FLUSH, TIMING_NOTIFICATION, record_timing
+from dell.price_changes import (
+    claim_detection, detect_price_changes, mark_notified, notification_test_targets, pending_notifications
+)
+from dell.listing_pages import ListingPage, save_fingerprints, touch_products
+from dell.price_history import close_superseded_rows, exclude_current_prices, upsert_rollups
+from dell.product_stats import refresh_product_stats
+from dell.signals import listing_page_scraped, writes_flush_requested
 from model import models
+from notification.dispatcher import NotificationDispatcher
 from notification.line_notifier import LineNotifier
 
 
 # 定数
-load_dotenv()
-
-if os.environ.get("ENV") == "local":
-    SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(os.getcwd(), 'instance', 'dell_laptop.db')}"
-else:
-    USER_NAME = os.environ.get('POSTGRE_USER_NAME')
-    PASSWORD = os.environ.get('POSTGRE_PASSWORD')
-    HOST_NAME = os.environ.get('POSTGRE_HOST_NAME')
-    DB_NAME = os.environ.get('POSTGRE_DB_NAME')
-    SQLALCHEMY_DATABASE_URI = f"postgresql://{USER_NAME}:{PASSWORD}@{HOST_NAME}.oregon-postgres.render.com/{DB_NAME}?sslmode=require"
 DEFAULT_PRICE = 0  # 既存価格がない場合のデフォルト値
+DEFAULT_BATCH_SIZE = 100  # バッファ書き込み時のフラッシュ件数
+DEFAULT_FLUSH_INTERVAL = 30  # バッファ書き込み時のフラッシュ間隔（秒）
+DEFAULT_WRITER_QUEUE_SIZE = 4  # 書き込みスレッドに渡したまま未処理のバッチ数の上限
+
+# upsert時に更新するカラム（is_line_notificationは既存の設定を保持するため含めない）
+PRODUCT_UPSERT_COLUMNS = ("name", "normalized_name", "model", "category", "url", "price", "scraped_at", "run_id")
+
+
+@dataclass
+class BufferedWrite:
+    """フラッシュ待ちのアイテム1件分の書き込み内容"""
+    item: dict
+    scraped_at: datetime
+    record_history: bool = True
+
+    @property
+    def order_codes(self) -> set:
+        return {self.item.get('order_code')}
+
+
+@dataclass
+class PageWrite:
+    """フラッシュ待ちの差分クロールの一覧ページ1つ分の書き込み内容（dell/listing_pages.py）"""
+    page: ListingPage
+    scraped_at: datetime
+
+    @property
+    def order_codes(self) -> set:
+        """このエントリで更新する商品（内容が変わったページの商品は各アイテムのエントリで書き込む）"""
+        return set(self.page.prices) if self.page.unchanged else set()
 
 
 class SQLAlchemyPipeline:
-    def __init__(self):
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, stats=None,
+                 notification_test: bool = False):
         self.updated_count = 0
+        self.history_skipped_count = 0
+        self.stats = stats
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.notification_test = notification_test  # 価格が変わっていなくても通知する（DBの価格は実際の値のまま）
+        self.run_id = None
+        self.buffer: list = []  # BufferedWrite と PageWrite
+        self.last_flushed_at = time.monotonic()
+        self.snapshot: dict[str, int] = {}  # order_code -> 価格
+        self.failed_order_codes: set[str] = set()  # 書き込みに失敗した商品
+        self.written_order_codes: set[str] = set()  # 書き込んだ商品（クロールの終了時に ProductStats を更新する）
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """settings.py の DB_* 設定からパイプラインを生成する。"""
+        settings = crawler.settings
+        pipeline = cls(
+            batch_size=settings.getint("DB_BATCH_SIZE", DEFAULT_BATCH_SIZE),
+            flush_interval=settings.getfloat("DB_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL),
+            stats=crawler.stats,
+            notification_test=settings.getbool("NOTIFICATION_TEST_MODE", False),
+        )
+        crawler.signals.connect(pipeline.flush_writes, signal=writes_flush_requested)
+        crawler.signals.connect(pipeline.add_listing_page, signal=listing_page_scraped)
+        return pipeline
 
     def open_spider(self, spider) -> None:
         """データベース接続を初期化し、テーブルを作成する。"""
-        self.engine = create_engine(SQLALCHEMY_DATABASE_URI)
-        models.Base.metadata.create_all(self.engine)
+        self.engine = create_db_engine()
         self.Session = sessionmaker(bind=self.engine)
         self.session = self.Session()
-        self.notifier = LineNotifier()
+        self.notifier = NotificationDispatcher(LineNotifier())
+        self.last_flushed_at = time.monotonic()
+        # 価格の変動は実行ID単位で検出する（分担クロールではワーカー間で共通の実行ID）
+        self.run_id = spider.run_id
+        self.snapshot = self._load_product_snapshot()
+        spider.logger.info(f"商品スナップショットを読み込みました: {len(self.snapshot)}件")
+        if self.notification_test:
+            spider.logger.info("通知テストモード: 通知設定ONの商品は価格の変更がなくても通知します")
 
     def process_item(self, item: dict, spider) -> dict:
         """アイテムを処理してデータベースに保存する。"""
         current_time = datetime.now(pytz.timezone('Asia/Tokyo'))
-        old_price = self._get_price_last_scraped(item)
-        new_price = item.get('price')
+        # 価格履歴は価格が変わったときだけ記録する（Productsの最終取得日時とロールアップは毎回更新）
+        # 価格の変動の検出と通知はクロールの終了時に PriceChanges でまとめて行う
+        record_history = item.get('price') != self._get_price_last_scraped(item)
+        if not record_history:
+            self.history_skipped_count += 1
+        # 同一クロール内で同じ商品が再度現れても書き込み順に依存せず判定できるよう、即時に反映する
+        self._update_snapshot(item)
 
-        # データベースに商品と価格履歴を保存
-        self._save_product_and_history(item, current_time, spider)
+        # バッファに積み、件数または経過時間でまとめて書き込む
+        self.buffer.append(BufferedWrite(item, current_time, record_history))
+        if self._should_flush():
+            self._flush(spider)
+        return item
 
-        # 価格が変更された場合、かつ通知設定ONの場合、LINE通知を送信
-        if new_price != old_price and self._get_line_notification_status(item):
-            self._send_notification(item, old_price, new_price)
+    def add_listing_page(self, page: ListingPage, spider) -> None:
+        """差分クロールの一覧ページを商品と同じ流れで書き込む（listing_page_scraped）。
 
-        return item
+        内容が変わったページのフィンガープリントは、そのページの商品を書き込めた場合だけ保存する。
+        """
+        self.buffer.append(PageWrite(page, datetime.now(pytz.timezone('Asia/Tokyo'))))
+        if self._should_flush():
+            self._flush(spider)
+
+    def flush_writes(self, spider) -> defer.Deferred:
+        """バッファを書き込み、書き込みに失敗した商品の累計数で発火する Deferred を返す（writes_flush_requested）。"""
+        self._flush(spider)
+        return defer.succeed(len(self.failed_order_codes))
 
     def close_spider(self, spider) -> None:
-        """データベースセッションと接続を終了する。"""
+        """残りのバッファを書き込み、価格の変動を検出・通知してからセッションと接続を終了する。"""
+        self._flush(spider)
+        self._refresh_product_stats(spider)
+        self._publish_price_changes(spider)
+        self._bump_scrape_generation(spider)
+        self.notifier.close()
         self.session.close()
-        print(self.updated_count, end="")
+        self._record_timings()
+        spider.logger.info(f"価格変更がないため価格履歴を記録しなかった商品: {self.history_skipped_count}件")
+        if self.stats is not None:
+            self.stats.set_value("price_history/unchanged_count", self.history_skipped_count)
+            self.stats.set_value("pipeline/updated_count", self.updated_count)
+
+    def _record_timings(self) -> None:
+        """通知の遅延を stats に記録する（DB書き込み時間は書き込みごとに記録済み）。"""
+        if self.stats is None:
+            return
+        for latency in self.notifier.latencies:
+            record_timing(self.stats, TIMING_NOTIFICATION, latency)
 
-    def _save_product_and_history(self, item: dict, current_time: datetime, spider) -> None:
-        """データベースに商品データと価格履歴を保存する。"""
+    def _refresh_product_stats(self, spider) -> None:
+        """この実行で書き込んだ商品の ProductStats を更新する（実行ごとに1回、書き込みのトランザクションの外で行う）。"""
+        if not self.written_order_codes:
+            return
         try:
-            product = self._create_product(item, current_time)
-            self.session.merge(product)
-            self.session.commit() # PriceHistoryでForeign Keyが見つからないのでそれぞれcommit
+            refresh_product_stats(self.session, self.written_order_codes, datetime.now(pytz.timezone('Asia/Tokyo')))
+            self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            spider.logger.error(f"価格の統計の更新失敗: {e}", exc_info=True)
+            return
+        spider.logger.info(f"価格の統計を更新しました: {len(self.written_order_codes)}件")
+
+    def _publish_price_changes(self, spider) -> None:
+        """この実行の価格の変動を PriceChanges に記録し、通知設定ONの商品の変更を通知する。
 
-            price_history = self._create_price_history(item, current_time)
-            self.session.add(price_history)
+        分担クロールでは、全ワーカーの分担が終わった（全ワーカーの書き込みが終わった）時点で、
+        検出済みの記録を追加できたワーカーだけが行う。
+        """
+        if not spider.is_run_finished(len(self.failed_order_codes)):
+            spider.logger.info("他のワーカーの分担が残っているため、価格の変動の検出は行いません")
+            return
+        now = datetime.now(pytz.timezone('Asia/Tokyo'))
+        try:
+            complete = spider.is_run_complete()
+            if not claim_detection(self.session, self.run_id, now, complete):
+                self.session.rollback()
+                spider.logger.info("他のワーカーが価格の変動を検出済みのため、検出は行いません")
+                return
+            counts = detect_price_changes(self.session, self.run_id, now, spider.crawls,
+                                          detect_disappeared=complete)
+            if self.notification_test:
+                changes = notification_test_targets(self.session, self.run_id)
+            else:
+                changes = pending_notifications(self.session, self.run_id)
             self.session.commit()
+        except Exception as e:
+            self.session.rollback()
+            spider.logger.error(f"価格の変動の検出失敗: {e}", exc_info=True)
+            return
+
+        spider.logger.info(f"価格の変動: 新規 {counts['new']}件, 変更 {counts['changed']}件,"
+                           f" 掲載終了 {counts['disappeared']}件（通知 {len(changes)}件）")
+        if self.stats is not None:
+            for change_type, count in counts.items():
+                self.stats.set_value(f"price_changes/{change_type}", count)
+        for change in changes:
+            # 通知テストモードでは通知日時を記録しない
+            on_sent = None if self.notification_test else functools.partial(self._mark_notified, change["id"])
+            self._send_notification(change, change["old_price"], change["new_price"], on_sent)
+
+    def _mark_notified(self, change_id: int) -> None:
+        """送信に成功した価格の変動に通知日時を記録する（通知の送信スレッドから呼ばれる）。"""
+        with self.engine.begin() as conn:
+            mark_notified(conn, [change_id], datetime.now(pytz.timezone('Asia/Tokyo')))
 
-            spider.logger.info(f"DB登録成功: {product.order_code}")
-            self.updated_count += 1
+    def _bump_scrape_generation(self, spider) -> None:
+        """スクレイプ世代番号を進めてAPIのキャッシュを無効化する（失敗してもクロール結果には影響させない）。"""
+        try:
+            bump_scrape_generation(self.engine)
         except Exception as e:
+            spider.logger.error(f"スクレイプ世代番号の更新失敗: {e}", exc_info=True)
+
+    def _should_flush(self) -> bool:
+        """バッファの件数または前回フラッシュからの経過時間がしきい値を超えたか判定する。"""
+        return (len(self.buffer) >= self.batch_size
+                or time.monotonic() - self.last_flushed_at >= self.flush_interval)
+
+    def _flush(self, spider) -> None:
+        """バッファ内のアイテムを一括upsert・一括insertで書き込み、成功分の通知を送信する。"""
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        self.last_flushed_at = time.monotonic()
+        self._write_buffered(batch, spider)
+
+    def _write_buffered(self, batch: list, spider) -> None:
+        """バッチを書き込む（失敗した場合は1件ずつ書き込み直す）。"""
+        try:
+            self._write_batch(batch)
+            written = batch
+        except Exception as e:
+            # 1件の不正データでバッチ全体を失わないよう、1件ずつ書き込み直す
             self.session.rollback()
-            spider.logger.error(f"DB登録失敗: {item.get('order_code')}): {e}", exc_info=True)
-            raise DropItem(f"{item.get('order_code')}の処理を中止します: {e}")
+            spider.logger.warning(f"一括書き込みに失敗したため1件ずつ再試行します（{len(batch)}件）: {e}")
+            written = self._write_individually(batch, spider)
 
-    def _create_product(self, item: dict, current_time: datetime) -> models.Products:
-        """アイテムから Product オブジェクトを作成する。"""
-        return models.Products(
-            order_code=item.get('order_code'),
-            name=item.get('name'),
-            model=item.get('model'),
-            url=item.get('url'),
-            price=item.get('price'),
-            scraped_at=current_time,
-            # TODO: 既存の設定を上書きしてFalseにしてしまう。一旦定義なしにするが、既存の設定を保持する仕組みにしたい
-            # is_line_notification=False
-        )
+        self.written_order_codes.update(*(entry.order_codes for entry in written))
+        item_count = sum(isinstance(entry, BufferedWrite) for entry in written)
+        spider.logger.info(f"DB一括登録成功: {len(written)}/{len(batch)}件")
+        self.updated_count += item_count
+
+    def _write_batch(self, batch: list) -> None:
+        """Products への複数行upsert、PriceHistory への変化点の一括insert、ロールアップと
+        差分クロールの一覧ページの更新を1トランザクションで実行する。
+
+        Args:
+            batch (list): BufferedWrite と PageWrite のリスト（受け取った順）
+        """
+        started_at = time.perf_counter()
+        items = [entry for entry in batch if isinstance(entry, BufferedWrite)]
+        pages = [entry for entry in batch if isinstance(entry, PageWrite)]
+        unchanged = [entry for entry in pages if entry.page.unchanged]
+        # 同一order_codeが1文中に複数あるとON CONFLICTが失敗するため、最後の値だけ残す
+        product_rows = {
+            entry.item.get('order_code'): self._product_row(entry.item, entry.scraped_at)
+            for entry in items
+        }
+        history_rows = [
+            self._price_history_row(entry.item, entry.scraped_at)
+            for entry in items if entry.record_history
+        ]
 
-    def _create_price_history(self, item: dict, current_time: datetime) -> models.PriceHistory:
-        """アイテムから PriceHistory オブジェクトを作成する。"""
-        return models.PriceHistory(
-            order_code=item.get('order_code'),
-            price=item.get('price'),
-            scraped_at=current_time
+        # 分担クロールの他のワーカーと同時に書き込まないよう直列化し、記録済みの変化点は追加しない
+        lock_catalog_writes(self.session)
+        history_rows = exclude_current_prices(self.session, history_rows)
+        if product_rows:
+            self.session.execute(self._build_product_upsert(list(product_rows.values())))
+        if history_rows:
+            self.session.execute(insert(models.PriceHistory), history_rows)
+            close_superseded_rows(self.session, {row["order_code"] for row in history_rows})
+        for entry in unchanged:
+            touch_products(self.session, entry.page.prices, self.run_id, entry.scraped_at)
+        upsert_rollups(self.session, [
+            (entry.item.get('order_code'), entry.item.get('price'), entry.scraped_at)
+            for entry in items
+        ] + [
+            (order_code, price, entry.scraped_at)
+            for entry in unchanged for order_code, price in entry.page.prices.items()
+        ])
+        # 商品の書き込みに失敗したページのフィンガープリントは保存しない（次回も商品を書き込む）
+        save_fingerprints(self.session, [
+            entry.page for entry in pages
+            if not entry.page.unchanged and not self.failed_order_codes.intersection(entry.page.prices)
+        ], max(entry.scraped_at for entry in batch))
+        self.session.commit()
+        if self.stats is not None:
+            record_timing(self.stats, TIMING_DB_FLUSH, time.perf_counter() - started_at)
+
+    def _write_individually(self, batch: list, spider) -> list:
+        """1件ずつ書き込み、成功したものだけを返す。
+
+        一覧ページのエントリはそのページの商品の後にあるため、商品の書き込みに失敗した
+        ページのフィンガープリントは保存されない。
+        """
+        written = []
+        for entry in batch:
+            try:
+                self._write_batch([entry])
+                written.append(entry)
+            except Exception as e:
+                self.session.rollback()
+                self.failed_order_codes.update(entry.order_codes)
+                spider.logger.error(f"DB登録失敗: {sorted(entry.order_codes)}: {e}", exc_info=True)
+        return written
+
+    def _build_product_upsert(self, rows: list[dict]):
+        """Products への INSERT ... ON CONFLICT (order_code) DO UPDATE 文を作成する。"""
+        stmt = upsert_insert(self.engine, models.Products).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=[models.Products.order_code],
+            set_={column: stmt.excluded[column] for column in PRODUCT_UPSERT_COLUMNS},
         )
 
+    def _product_row(self, item: dict, current_time: datetime) -> dict:
+        """アイテムから Products の1行分の値を作成する。"""
+        return {
+            "order_code": item.get('order_code'),
+            "name": item.get('name'),
+            "normalized_name": item.get('normalized_name'),
+            "model": item.get('model'),
+            "category": item.get('category'),
+            "url": item.get('url'),
+            "price": item.get('price'),
+            "scraped_at": current_time,
+            "run_id": self.run_id,
+            # is_line_notification は既存の設定を保持するため含めない
+        }
+
+    def _price_history_row(self, item: dict, current_time: datetime) -> dict:
+        """アイテムから PriceHistory の1行分の値を作成する。"""
+        return {
+            "order_code": item.get('order_code'),
+            "price": item.get('price'),
+            "scraped_at": current_time,
+            "run_id": self.run_id,
+        }
+
+    def _load_product_snapshot(self) -> dict[str, int]:
+        """Products 全件の order_code -> 価格 を1クエリで読み込む。"""
+        rows = self.session.execute(select(models.Products.order_code, models.Products.price))
+        return dict(rows.all())
+
+    def _update_snapshot(self, item: dict) -> None:
+        """スナップショットの価格を更新する。"""
+        self.snapshot[item.get('order_code')] = item.get('price')
+
     def _get_price_last_scraped(self, item: dict) -> int:
-        """指定されたアイテムの以前の価格を取得する。"""
-        existing_product = self.session.query(models.Products).filter_by(
-            order_code=item.get('order_code')
-        ).first()
-        return existing_product.price if existing_product else DEFAULT_PRICE
-
-    def _send_notification(self, item: dict, old_price: int, new_price: int) -> None:
-        """価格変更に関する通知を送信する。"""
-        self.notifier.send_notifications(
+        """指定されたアイテムの以前の価格をスナップショットから取得する。"""
+        return self.snapshot.get(item.get('order_code'), DEFAULT_PRICE)
+
+    def _send_notification(self, item: dict, old_price: int, new_price: int, on_sent=None) -> None:
+        """価格変更に関する通知を送信キューに積む（on_sent は送信に成功した後に呼ばれる）。"""
+        self.notifier.enqueue(
             name=item.get('name'),
             model=item.get('model'),
             old_price=old_price,
             new_price=new_price,
-            url=item.get('url')
+            url=item.get('url'),
+            on_sent=on_sent,
         )
 
-    def _get_line_notification_status(self, item: dict) -> bool:
-        product = self.session.query(models.Products).filter_by(
-            order_code=item.get('order_code')
-        ).first()
-        return product.is_line_notification if product else False
+
+_STOP_WRITER = object()  # 書き込みスレッド停止用の番兵
+
+
+@dataclass
+class WriteBarrier:
+    """書き込みスレッドに渡す、それまでのバッチを書き込み終えたら deferred を発火させる目印"""
+    batch: list
+    deferred: defer.Deferred
+
+
+class ThreadedWriterPipeline(SQLAlchemyPipeline):
+    """DBへの書き込みを専用スレッドで行う SQLAlchemyPipeline
+
+    Playwright の描画と同じリアクター（asyncio）のスレッドでDBの応答を待たないよう、
+    フラッシュしたバッチを上限付きのキューで書き込みスレッドに渡す。書き込みが追いつかず
+    キューが満杯の場合は、空きができるまで process_item の完了を待たせる（Scrapyは処理中の
+    アイテムが多いとダウンロードを控えるため、クロール全体が書き込みの速度に合わせて遅くなる）。
+    空きは書き込みスレッドが Deferred で知らせるため、待っている間もリアクターのスレッドプールを使わない。
+
+    self.session は open_spider の後は書き込みスレッドだけが使う。
+    """
+
+    def __init__(self, *args, queue_size: int = DEFAULT_WRITER_QUEUE_SIZE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.queue_size = queue_size
+        self.slots = threading.BoundedSemaphore(queue_size)  # キューの空き
+        self.write_queue: queue.Queue = queue.Queue()
+        self.writer: threading.Thread | None = None
+        self.slot_waiters: list[defer.Deferred] = []  # キューの空きを待っている process_item（リアクターのスレッドでのみ操作する）
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = super().from_crawler(crawler)
+        pipeline.queue_size = crawler.settings.getint("DB_WRITER_QUEUE_SIZE", DEFAULT_WRITER_QUEUE_SIZE)
+        pipeline.slots = threading.BoundedSemaphore(pipeline.queue_size)
+        return pipeline
+
+    def open_spider(self, spider) -> None:
+        super().open_spider(spider)
+        self.writer = threading.Thread(target=self._run_writer, args=(spider,), name="db-writer", daemon=True)
+        self.writer.start()
+
+    def process_item(self, item: dict, spider):
+        """アイテムをバッファに積む。書き込みスレッドのキューが満杯なら、空くまで完了を待たせる。"""
+        super().process_item(item, spider)
+        if self.buffer and self._should_flush():
+            # キューが満杯でフラッシュできなかった
+            if self.stats is not None:
+                self.stats.inc_value("pipeline/writer_backpressure")
+            waiter = defer.Deferred()
+            self.slot_waiters.append(waiter)
+            return waiter.addCallback(lambda _: item)
+        return item
+
+    def close_spider(self, spider) -> None:
+        """残りのバッファを渡し、書き込みスレッドがすべて書き込み終えてから終了処理を行う。"""
+        if self.buffer:
+            self.slots.acquire()
+            self._submit(spider)
+        self.write_queue.put(_STOP_WRITER)
+        self.writer.join()
+        super().close_spider(spider)
+
+    def flush_writes(self, spider) -> defer.Deferred:
+        """バッファを渡し、書き込みスレッドがそれまでのバッチをすべて書き込んだら発火する Deferred を返す。
+
+        キューの空きを待たずに渡す（書き込みスレッドのキューに積まれているバッチの後に書き込む）。
+        """
+        batch, self.buffer = self.buffer, []
+        self.last_flushed_at = time.monotonic()
+        barrier = WriteBarrier(batch, defer.Deferred())
+        self.write_queue.put(barrier)
+        return barrier.deferred
+
+    def _flush(self, spider) -> None:
+        """キューに空きがあればバッファを書き込みスレッドに渡す（なければバッファに残す）。"""
+        if not self.buffer or not self.slots.acquire(blocking=False):
+            return
+        self._submit(spider)
+
+    def _submit(self, spider) -> None:
+        """バッファを書き込みスレッドに渡す（キューの空きを1つ確保して呼ぶ）。"""
+        batch, self.buffer = self.buffer, []
+        self.last_flushed_at = time.monotonic()
+        self.write_queue.put(batch)
+
+    def _on_slot_freed(self, spider) -> None:
+        """キューに空きができたら、溜まっているバッファを渡して待っている process_item を完了させる（リアクターのスレッドで呼ぶ）。"""
+        if self.buffer and self._should_flush():
+            self._flush(spider)
+        waiters, self.slot_waiters = self.slot_waiters, []
+        for waiter in waiters:
+            waiter.callback(None)
+
+    def _run_writer(self, spider) -> None:
+        """キューから受け取ったバッチを順に書き込む。"""
+        from twisted.internet import reactor
+
+        while True:
+            batch = self.write_queue.get()
+            if batch is _STOP_WRITER:
+                return
+            if isinstance(batch, WriteBarrier):
+                self._write_in_thread(batch.batch, spider)
+                reactor.callFromThread(batch.deferred.callback, len(self.failed_order_codes))
+                continue
+            try:
+                self._write_in_thread(batch, spider)
+            finally:
+                self.slots.release()
+                reactor.callFromThread(self._on_slot_freed, spider)
+
+    def _write_in_thread(self, batch: list, spider) -> None:
+        """書き込みスレッドでバッチを書き込む（例外はログに記録して書き込みを続ける）。"""
+        if not batch:
+            return
+        try:
+            self._write_buffered(batch, spider)
+        except Exception as e:
+            self.failed_order_codes.update(*(entry.order_codes for entry in batch))
+            spider.logger.error(f"書き込みスレッドでのDB登録失敗（{len(batch)}件）: {e}", exc_info=True)
@@ -0,0 +1,186 @@
+"""クロール1回分の価格の変動（PriceChanges）の検出と、通知する変動の取り出し
+
+クロール中は商品ごとに比較せず、終了時に実行ID（run_id）単位でまとめて検出する。
+
+- new / changed: この実行で追加した PriceHistory の行について、ウィンドウ関数（LAG）で
+  直前の価格を求め、Products の現在の価格と比べる（1つの INSERT ... SELECT）
+- disappeared: 取得したカテゴリの商品のうち、この実行の一覧ページに載っていなかった商品
+  （一覧から消えてから1回だけ記録する）。一部のページを取得できなかった場合は検出しない
+
+分担クロールでは PriceChangeRuns に実行IDを記録できたワーカーだけが検出する（claim_detection）。
+"""
+from datetime import datetime
+
+from sqlalchemy import Float, and_, case, cast, exists, func, literal, null, or_, select, update
+from sqlalchemy.orm import aliased
+
+from dell.database import upsert_insert
+from model import models
+
+CHANGE_NEW = "new"
+CHANGE_CHANGED = "changed"
+CHANGE_DISAPPEARED = "disappeared"
+
+# INSERT ... SELECT で値を入れる PriceChanges のカラム（select の列と同じ順）
+CHANGE_COLUMNS = ("run_id", "order_code", "change_type", "old_price", "new_price",
+                  "price_delta", "percent_delta", "detected_at")
+
+
+def detect_price_changes(bind, run_id: str, detected_at: datetime, categories,
+                         detect_disappeared: bool = True) -> dict[str, int]:
+    """実行IDの価格の変動を PriceChanges に追加し、種類ごとの件数を返す（検出済みの行は追加しない）。
+
+    Args:
+        bind: Session / Connection
+        run_id (str): クロールの実行ID
+        detected_at (datetime): 検出日時
+        categories: 取得したカテゴリ名（disappeared の対象）
+        detect_disappeared (bool): 一覧から消えた商品も検出するか（全ページを取得できた場合のみ True にする）
+    """
+    _insert_changes(bind, _price_change_select(run_id, detected_at))
+    if detect_disappeared and categories:
+        _insert_changes(bind, _disappeared_select(run_id, detected_at, categories))
+
+    changes = models.PriceChanges
+    counts = dict(bind.execute(
+        select(changes.change_type, func.count())
+        .where(changes.run_id == run_id)
+        .group_by(changes.change_type)
+    ).all())
+    return {change_type: counts.get(change_type, 0)
+            for change_type in (CHANGE_NEW, CHANGE_CHANGED, CHANGE_DISAPPEARED)}
+
+
+def claim_detection(bind, run_id: str, detected_at: datetime, complete: bool) -> bool:
+    """実行IDの検出済みの記録を追加し、追加できたら True を返す（他のワーカーが記録済みなら False）。
+
+    検出と同じトランザクションで呼ぶ。検出に失敗してロールバックした場合は記録も残らない。
+    """
+    table = models.PriceChangeRuns
+    result = bind.execute(
+        upsert_insert(bind, table)
+        .values(run_id=run_id, detected_at=detected_at, complete=int(complete))
+        .on_conflict_do_nothing(index_elements=[table.run_id])
+    )
+    return result.rowcount == 1
+
+
+def pending_notifications(bind, run_id: str) -> list[dict]:
+    """実行IDの価格の変更のうち、通知設定ONでまだ通知していないものを返す。
+
+    notified_at は送信に成功してから mark_notified で記録する（送信できなかった変更は未通知のまま残る）。
+    検出は実行ごとに1つのワーカーだけが行う（claim_detection）ため、同じ変動を二重に通知しない。
+    """
+    changes, products = models.PriceChanges, models.Products
+    rows = bind.execute(
+        select(changes.id, changes.order_code, changes.old_price, changes.new_price)
+        .where(changes.run_id == run_id,
+               changes.change_type == CHANGE_CHANGED,
+               changes.notified_at.is_(None),
+               changes.order_code.in_(select(products.order_code).where(products.is_line_notification == 1)))
+    ).all()
+    return _with_product_details(bind, [
+        {"id": change_id, "order_code": order_code, "old_price": old_price, "new_price": new_price}
+        for change_id, order_code, old_price, new_price in rows
+    ])
+
+
+def mark_notified(bind, change_ids, notified_at: datetime) -> None:
+    """送信に成功した価格の変動に通知日時を記録する。"""
+    changes = models.PriceChanges
+    bind.execute(update(changes).where(changes.id.in_(list(change_ids))).values(notified_at=notified_at))
+
+
+def notification_test_targets(bind, run_id: str) -> list[dict]:
+    """通知テストモード用に、この実行で見つかった通知設定ONの全商品を返す（価格の変更がなければ新旧同じ価格）。"""
+    changes, products = models.PriceChanges, models.Products
+    rows = bind.execute(
+        select(products.order_code, func.coalesce(changes.old_price, products.price), products.price)
+        .outerjoin(changes, and_(changes.order_code == products.order_code, changes.run_id == run_id))
+        .where(products.run_id == run_id, products.is_line_notification == 1)
+    ).all()
+    return _with_product_details(bind, [
+        {"order_code": order_code, "old_price": old_price, "new_price": new_price}
+        for order_code, old_price, new_price in rows
+    ])
+
+
+def _price_change_select(run_id: str, detected_at: datetime):
+    """この実行で追加した価格履歴の行から new / changed の行を作る SELECT"""
+    history = models.PriceHistory
+    products = models.Products
+    run_codes = select(history.order_code).where(history.run_id == run_id)
+    # 対象の商品の全履歴に対して直前の価格（LAG）を求める
+    previous = (
+        select(history.order_code, history.run_id, history.scraped_at,
+               func.lag(history.price).over(partition_by=history.order_code,
+                                            order_by=history.scraped_at).label("old_price"))
+        .where(history.order_code.in_(run_codes))
+        .subquery()
+    )
+    # 1回の実行で同じ商品の行が複数ある場合は、実行前の価格（最初の行の直前の価格）と比べる
+    first_in_run = (
+        select(previous.c.order_code, previous.c.old_price,
+               func.row_number().over(partition_by=previous.c.order_code,
+                                      order_by=previous.c.scraped_at).label("position"))
+        .where(previous.c.run_id == run_id)
+        .subquery()
+    )
+    old_price, new_price = first_in_run.c.old_price, products.price
+    return (
+        select(literal(run_id), products.order_code,
+               case((old_price.is_(None), CHANGE_NEW), else_=CHANGE_CHANGED),
+               old_price, new_price, new_price - old_price,
+               _percent_delta(old_price, new_price),
+               literal(detected_at))
+        .join_from(first_in_run, products, products.order_code == first_in_run.c.order_code)
+        .where(first_in_run.c.position == 1, or_(old_price.is_(None), old_price != new_price))
+    )
+
+
+def _disappeared_select(run_id: str, detected_at: datetime, categories):
+    """取得したカテゴリの商品のうち、この実行で見つからなかった（未記録の）商品の行を作る SELECT"""
+    products = models.Products
+    reported = aliased(models.PriceChanges)
+    already_reported = exists().where(reported.order_code == products.order_code,
+                                      reported.change_type == CHANGE_DISAPPEARED,
+                                      reported.detected_at >= products.scraped_at)
+    return (
+        select(literal(run_id), products.order_code, literal(CHANGE_DISAPPEARED),
+               products.price, null(), null(), null(), literal(detected_at))
+        .where(or_(products.run_id.is_(None), products.run_id != run_id),
+               products.category.in_(list(categories)),
+               ~already_reported)
+    )
+
+
+def _percent_delta(old_price, new_price):
+    """変動率（%）。旧価格が NULL または 0 の場合は NULL"""
+    return case(
+        (or_(old_price.is_(None), old_price == 0), null()),
+        else_=cast(new_price - old_price, Float) * 100 / old_price,
+    )
+
+
+def _insert_changes(bind, changes_select) -> None:
+    table = models.PriceChanges
+    stmt = upsert_insert(bind, table).from_select(list(CHANGE_COLUMNS), changes_select)
+    bind.execute(stmt.on_conflict_do_nothing(index_elements=[table.run_id, table.order_code]))
+
+
+def _with_product_details(bind, changes: list[dict]) -> list[dict]:
+    """通知の本文に使う商品名・型番・URLを付け加える。"""
+    if not changes:
+        return changes
+    products = models.Products
+    details = {
+        row.order_code: row for row in bind.execute(
+            select(products.order_code, products.name, products.model, products.url)
+            .where(products.order_code.in_([change["order_code"] for change in changes]))
+        )
+    }
+    return [
+        {**change, "name": details[change["order_code"]].name, "model": details[change["order_code"]].model,
+         "url": details[change["order_code"]].url}
+        for change in changes if change["order_code"] in details
+    ]
@@ -0,0 +1,99 @@
+"""価格履歴（変化点のみ保存）と日次・週次ロールアップの更新処理"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import aliased
+
+from dell.database import least_greatest, upsert_insert
+from model import models
+
+
+def close_superseded_rows(bind, order_codes=None) -> None:
+    """新しい価格行が追加された商品について、直前の行の valid_to を次の行の valid_from で埋める。
+
+    同じバッチ内で1商品に複数の変化点が追加された場合も、最新の行だけが valid_to=NULL のまま残る。
+    order_codes を省略した場合は全商品が対象。
+    """
+    newer = aliased(models.PriceHistory)
+    next_valid_from = (
+        select(func.min(newer.scraped_at))
+        .where(newer.order_code == models.PriceHistory.order_code,
+               newer.scraped_at > models.PriceHistory.scraped_at)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(models.PriceHistory)
+        .where(models.PriceHistory.valid_to.is_(None))
+        .values(valid_to=next_valid_from)
+    )
+    if order_codes is not None:
+        stmt = stmt.where(models.PriceHistory.order_code.in_(order_codes))
+    bind.execute(stmt)
+
+
+def exclude_current_prices(bind, rows: list[dict]) -> list[dict]:
+    """現在の価格（valid_to が NULL の行）と同じ価格の行を除く。
+
+    分担クロールで同じ商品を複数のワーカーが取得した場合や、分担を取得し直した場合も
+    同じ変化点を重複して記録しないようにする。
+    """
+    if not rows:
+        return rows
+    current = dict(bind.execute(
+        select(models.PriceHistory.order_code, models.PriceHistory.price)
+        .where(models.PriceHistory.valid_to.is_(None),
+               models.PriceHistory.order_code.in_({row["order_code"] for row in rows}))
+    ).all())
+    return [row for row in rows if current.get(row["order_code"]) != row["price"]]
+
+
+def summarize_observations(observations) -> tuple[dict, dict]:
+    """(order_code, price, observed_at) の並びを日次・週次ごとの最小・最大・最終値に集計する。
+
+    Args:
+        observations: 観測時刻順に並んだ (order_code, price, observed_at) のイテラブル
+
+    Returns:
+        tuple[dict, dict]: (order_code, 日付) と (order_code, 週の開始日) をキーにした
+            {"min_price", "max_price", "last_price"} の辞書
+    """
+    daily, weekly = {}, {}
+    for order_code, price, observed_at in observations:
+        day = observed_at.date() if isinstance(observed_at, datetime) else observed_at
+        week_start = day - timedelta(days=day.weekday())
+        for summaries, key in ((daily, (order_code, day)), (weekly, (order_code, week_start))):
+            summary = summaries.get(key)
+            if summary is None:
+                summaries[key] = {"min_price": price, "max_price": price, "last_price": price}
+            else:
+                summary["min_price"] = min(summary["min_price"], price)
+                summary["max_price"] = max(summary["max_price"], price)
+                summary["last_price"] = price
+    return daily, weekly
+
+
+def upsert_rollups(bind, observations) -> None:
+    """観測した価格で日次・週次ロールアップの最小・最大・最終値を更新する。"""
+    daily, weekly = summarize_observations(observations)
+    _upsert_rollup(bind, models.PriceDailyRollup, "day", daily)
+    _upsert_rollup(bind, models.PriceWeeklyRollup, "week_start", weekly)
+
+
+def _upsert_rollup(bind, model, period_column: str, summaries: dict) -> None:
+    """既存のロールアップ行と集計結果をマージする（最小・最大は比較、最終値は上書き）。"""
+    if not summaries:
+        return
+    rows = [
+        {"order_code": order_code, period_column: period, **summary}
+        for (order_code, period), summary in summaries.items()
+    ]
+    least, greatest = least_greatest(bind)
+    stmt = upsert_insert(bind, model).values(rows)
+    bind.execute(stmt.on_conflict_do_update(
+        index_elements=[model.order_code, getattr(model, period_column)],
+        set_={
+            "min_price": least(model.min_price, stmt.excluded.min_price),
+            "max_price": greatest(model.max_price, stmt.excluded.max_price),
+            "last_price": stmt.excluded.last_price,
+        },
+    ))
@@ -0,0 +1,83 @@
+"""商品ごとの価格の統計（ProductStats）の更新
+
+パイプラインがクロールの終了時に1回、その実行で書き込んだ商品の行だけを更新する（書き込みの
+トランザクションの外で行い、全商品・全履歴は集計し直さない）。30日・90日の期間は日ごとにずれるため、
+差分ではなく直近90日分の日次ロールアップから求め直す。
+
+- 30日・90日の最小・平均: その商品の直近90日分の日次ロールアップから求める（平均は日ごとの最終価格の平均）
+- 現在の価格の位置（price_percentile_90d）: 直近90日のうち、日ごとの最終価格が現在の価格より安かった日の
+  割合（%）。観測した価格の分布のパーセンタイルではなく、0 なら直近90日で最も安い水準
+- 全期間の最小・最大: 既存の値と直近90日の最小・最大を比べて更新する
+- 価格が最後に変わった日時: 価格履歴（変化点のみ）の最新の scraped_at
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func, literal, select
+
+from dell.database import least_greatest, upsert_insert
+from model import models
+
+SHORT_WINDOW_DAYS = 30
+LONG_WINDOW_DAYS = 90
+CHUNK_SIZE = 500  # 1回の更新で対象にする商品数
+
+# INSERT ... SELECT で値を入れる ProductStats のカラム（select の列と同じ順）
+STATS_COLUMNS = ("order_code", "current_price", "all_time_min_price", "all_time_max_price",
+                 "min_price_30d", "avg_price_30d", "min_price_90d", "avg_price_90d",
+                 "price_percentile_90d", "last_changed_at", "updated_at")
+
+
+def refresh_product_stats(bind, order_codes, now: datetime) -> None:
+    """指定した商品の ProductStats を、日次ロールアップと価格履歴から更新する。
+
+    Args:
+        bind: Session / Connection
+        order_codes: 更新する商品の注文コード
+        now (datetime): 更新日時（この日付を含む直近30日・90日を集計する）
+    """
+    order_codes = sorted(order_codes)
+    for start in range(0, len(order_codes), CHUNK_SIZE):
+        _refresh_chunk(bind, order_codes[start:start + CHUNK_SIZE], now)
+
+
+def _refresh_chunk(bind, order_codes: list[str], now: datetime) -> None:
+    table = models.ProductStats
+    stmt = upsert_insert(bind, table).from_select(list(STATS_COLUMNS), _stats_select(order_codes, now))
+    least, greatest = least_greatest(bind)
+    bind.execute(stmt.on_conflict_do_update(
+        index_elements=[table.order_code],
+        set_={
+            # 既存の値が無い（NULL）場合は直近90日の値を使う
+            "all_time_min_price": least(func.coalesce(table.all_time_min_price, stmt.excluded.all_time_min_price),
+                                        stmt.excluded.all_time_min_price),
+            "all_time_max_price": greatest(func.coalesce(table.all_time_max_price, stmt.excluded.all_time_max_price),
+                                           stmt.excluded.all_time_max_price),
+            **{column: getattr(stmt.excluded, column) for column in STATS_COLUMNS
+               if column not in ("order_code", "all_time_min_price", "all_time_max_price")},
+        },
+    ))
+
+
+def _stats_select(order_codes: list[str], now: datetime):
+    """商品ごとの直近90日の日次ロールアップを集計する SELECT"""
+    products, rollup, history = models.Products, models.PriceDailyRollup, models.PriceHistory
+    today = now.date()
+    in_short_window = rollup.day > today - timedelta(days=SHORT_WINDOW_DAYS)
+    last_changed_at = (
+        select(func.max(history.scraped_at))
+        .where(history.order_code == products.order_code)
+        .scalar_subquery()
+    )
+    return (
+        select(products.order_code, products.price,
+               func.min(rollup.min_price), func.max(rollup.max_price),
+               func.min(case((in_short_window, rollup.min_price))),
+               func.avg(case((in_short_window, rollup.last_price))),
+               func.min(rollup.min_price), func.avg(rollup.last_price),
+               func.avg(case((rollup.last_price < products.price, 100.0), else_=0.0)),
+               last_changed_at, literal(now))
+        .join_from(products, rollup, rollup.order_code == products.order_code)
+        .where(products.order_code.in_(order_codes),
+               rollup.day > today - timedelta(days=LONG_WINDOW_DAYS))
+        .group_by(products.order_code, products.price)
+    )
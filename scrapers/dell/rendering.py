@@ -0,0 +1,69 @@
+from urllib.parse import urlparse
+
+from scrapy_playwright.page import PageMethod
+
+# 描画プロファイル
+RENDER_PROFILE_LIGHT = "light"  # 不要なリソースを読み込まず、商品一覧の表示だけを待つ
+RENDER_PROFILE_FULL = "full"  # ページ全体を読み込み、loadイベントまで待つ（コンテキストは light と同じ共有コンテキスト）
+
+RENDER_CONTEXT_NAME = "dell"  # 全ページで共有するブラウザコンテキスト名
+# 共有コンテキストの作成オプション（最初のPlaywrightリクエスト時に作成され、ブラウザもその時点で起動する）
+RENDER_CONTEXT_KWARGS = {"service_workers": "block"}
+ARTICLE_SELECTOR = "article.variant-stack"  # 商品一覧の描画完了を判定するセレクタ
+
+# lightプロファイルで読み込みを中止するリソース種別
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+# lightプロファイルで読み込みを中止する外部の計測・広告ドメイン
+BLOCKED_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "facebook.net",
+    "adobedtm.com",
+    "demdex.net",
+    "omtrdc.net",
+    "everesttech.net",
+    "bing.com",
+    "criteo.com",
+    "criteo.net",
+    "hotjar.com",
+    "tiqcdn.com",
+    "qualtrics.com",
+)
+
+
+def should_abort_request(request) -> bool:
+    """XPathでの抽出に不要なリクエスト（画像・フォント・計測タグ等）かを判定する。
+
+    Args:
+        request (playwright.async_api.Request): Playwrightのリクエスト
+
+    Returns:
+        bool: 読み込みを中止する場合はTrue
+    """
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    host = urlparse(request.url).hostname or ""
+    return any(host == domain or host.endswith(f".{domain}") for domain in BLOCKED_DOMAINS)
+
+
+def playwright_meta(profile: str, wait_for: str = ARTICLE_SELECTOR) -> dict:
+    """描画プロファイルに応じたPlaywright用のRequest.metaを作成する（wait_for は描画完了を判定するセレクタ）。"""
+    if profile == RENDER_PROFILE_FULL:
+        # リソースの読み込みと待ち方は従来どおり（コンテキストは共有コンテキストを使う）
+        return {
+            "playwright": True,
+            "playwright_context": RENDER_CONTEXT_NAME,
+            "playwright_context_kwargs": RENDER_CONTEXT_KWARGS,
+        }
+    return {
+        "playwright": True,
+        "playwright_context": RENDER_CONTEXT_NAME,
+        "playwright_context_kwargs": RENDER_CONTEXT_KWARGS,
+        # loadイベント（画像等の読み込み完了）を待たず、商品一覧が表示された時点で取得する
+        "playwright_page_goto_kwargs": {"wait_until": "domcontentloaded"},
+        "playwright_page_methods": [
+            PageMethod("wait_for_selector", wait_for),
+        ],
+    }
@@ -9,6 +9,8 @@
 
 import os
 
+from dell.rendering import RENDER_PROFILE_LIGHT, should_abort_request
+
 
 BOT_NAME = "dell"
 
@@ -50,6 +52,22 @@ ROBOTSTXT_OBEY = True
 #SPIDER_MIDDLEWARES = {
 #    "dell.middlewares.DellSpiderMiddleware": 543,
 #}
+SPIDER_MIDDLEWARES = {
+    "dell.middlewares.IncrementalListingMiddleware": 543,
+}
+
+# 差分クロール
+#   前回と内容が同じ一覧ページの商品をパイプラインに流さない（最終取得日時とロールアップのみ更新する）
+INCREMENTAL_CRAWL = os.environ.get("INCREMENTAL_CRAWL", "1") == "1"
+
+# 通知テストモード（APIの notification_test がECSタスクの環境変数で有効にする）
+# DBの価格は変更せず、通知設定ONの商品は価格が変わっていなくても通知する。
+# 全商品をパイプラインに流すため、差分クロール（INCREMENTAL_CRAWL）は無効になる
+NOTIFICATION_TEST_MODE = os.environ.get("NOTIFICATION_TEST_MODE", "0") == "1"
+
+# 分担クロール（app.py --shards / ECSタスクの環境変数 SHARD_RUN_ID）
+#   確保したまま終わらない分担（ワーカーの異常終了など）を他のワーカーが確保し直すまでの時間（秒）
+SHARD_CLAIM_TIMEOUT = int(os.environ.get("SHARD_CLAIM_TIMEOUT", 1800))
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
@@ -59,16 +77,29 @@ ROBOTSTXT_OBEY = True
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+EXTENSIONS = {
+   "dell.extensions.CrawlPerformanceExtension": 500,
+}
+
+# クロールの実行記録（処理時間・最大RSS）
+PERF_REPORT_ENABLED = True
+PERF_REPORT_DB = True  # ScrapeRuns テーブルに保存する
+PERF_REPORT_FILE = os.environ.get("PERF_REPORT_FILE", "")  # 指定した場合はJSON Lines形式で追記する
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
+# DB_WRITER_THREAD が有効な場合は、DBへの書き込みを専用スレッドで行う ThreadedWriterPipeline を使う
+DB_WRITER_THREAD = os.environ.get("DB_WRITER_THREAD", "1") == "1"
 ITEM_PIPELINES = {
-   "dell.pipelines.SQLAlchemyPipeline": 300,
+   "dell.pipelines.ThreadedWriterPipeline" if DB_WRITER_THREAD else "dell.pipelines.SQLAlchemyPipeline": 300,
 }
 
+# SQLAlchemyPipelineの書き込み設定
+# アイテムはバッファし、複数行upsert/一括insertでまとめて書き込む
+DB_BATCH_SIZE = 100  # バッファがこの件数に達したら書き込む
+DB_FLUSH_INTERVAL = 30  # 前回の書き込みからこの秒数が経過したら書き込む
+DB_WRITER_QUEUE_SIZE = 4  # 書き込みスレッドが未処理のバッチ数の上限（超えるとアイテムの処理を待たせる）
+
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
 #AUTOTHROTTLE_ENABLED = True
@@ -94,13 +125,32 @@ ITEM_PIPELINES = {
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
 FEED_EXPORT_ENCODING = "utf-8"
 
-# playwright用
+# 一覧ページの取得方法
+#   hybrid    : まずPlaywrightを使わずHTTPで取得し、商品が抽出できないページだけPlaywrightで再取得する
+#   playwright: すべてのページをPlaywrightで取得する
+#   http      : すべてのページをHTTPで取得する（Playwrightを使わない）
+FETCH_MODE = os.environ.get("FETCH_MODE", "hybrid")
+
+# 一覧ページからの商品の抽出方法
+#   fast: コンパイル済みの XPath で1ページ分をまとめて dict に変換する（dell/extraction.py）
+#   loader: 商品ごとに ItemLoader で LaptopItem を作る（従来の動作）
+EXTRACTION_MODE = os.environ.get("EXTRACTION_MODE", "fast")
+
+# playwright用（meta["playwright"]がFalseのリクエストは通常のHTTPで取得される）
 DOWNLOAD_HANDLERS = {
     "http": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
     "https": "scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler",
 }
 PLAYWRIGHT_DEFAULT_NAVIGATION_TIMEOUT = 150000  # 150秒
 
+# 一覧ページの同時取得数（Playwrightで同時に描画するページ数の上限）
+LISTING_PAGE_CONCURRENCY = int(os.environ.get("LISTING_PAGE_CONCURRENCY", 3))
+LISTING_PAGE_RETRY_TIMES = 2  # 取得失敗・商品0件のページを再取得する回数
+CONCURRENT_REQUESTS = LISTING_PAGE_CONCURRENCY
+CONCURRENT_REQUESTS_PER_DOMAIN = LISTING_PAGE_CONCURRENCY
+PLAYWRIGHT_MAX_CONTEXTS = 1
+PLAYWRIGHT_MAX_PAGES_PER_CONTEXT = LISTING_PAGE_CONCURRENCY
+
 # ChromiumをLambda対応にする
 PLAYWRIGHT_LAUNCH_OPTIONS = {
     "headless": True,
@@ -109,3 +159,10 @@ PLAYWRIGHT_LAUNCH_OPTIONS = {
     # "debug": "pw:api"
 }
 
+# Playwrightの描画プロファイル（dell/rendering.py 参照）
+#   light: 画像・フォント・計測タグ等の読み込みを中止し、商品一覧の表示だけを待つ
+#   full : ページ全体を読み込む
+PLAYWRIGHT_RENDER_PROFILE = os.environ.get("PLAYWRIGHT_RENDER_PROFILE", RENDER_PROFILE_LIGHT)
+if PLAYWRIGHT_RENDER_PROFILE == RENDER_PROFILE_LIGHT:
+    PLAYWRIGHT_ABORT_REQUEST = should_abort_request
+
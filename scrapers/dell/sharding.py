@@ -0,0 +1,200 @@
+"""一覧ページを分担して複数のプロセス・ECSタスクでクロールするための分担（シャード）の管理
+
+1回の実行（run_id）の分担を CrawlShards に記録し、各ワーカーは未着手の分担を1つずつ確保して取得する。
+
+1. 各ワーカーはカテゴリごとに1ページ目だけの分担を作成する（既にあれば何もしない）
+2. 1ページ目の分担を確保したワーカーが総ページ数を取得し、2ページ目以降を連続した範囲で
+   shard_count 個の分担に分けて追加する
+3. 各ワーカーは未着手の分担がなくなるまで確保と取得を繰り返す
+
+分担の確保は status が pending の行だけを更新する条件付きの UPDATE で行うため、
+複数のワーカーが同時に確保しようとしても1つのワーカーだけが成功する。
+確保したまま claim_timeout 秒以上終わらない分担（ワーカーの異常終了など）は、他のワーカーが確保し直す。
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import pytz
+from sqlalchemy import and_, func, or_, select, update
+
+from dell.database import upsert_insert
+from model import models
+
+SHARD_PENDING = "pending"
+SHARD_CLAIMED = "claimed"
+SHARD_DONE = "done"
+SHARD_FAILED = "failed"
+
+DEFAULT_CLAIM_TIMEOUT = 1800  # 確保したまま終わらない分担を他のワーカーが確保し直すまでの時間（秒）
+PLAN_SHARD_INDEX = 0  # 1ページ目（総ページ数の取得）の分担
+
+
+@dataclass(frozen=True)
+class Shard:
+    """ワーカーが確保した分担"""
+    id: int
+    category: str
+    shard_index: int
+    first_page: int
+    last_page: int
+
+    @property
+    def pages(self) -> range:
+        return range(self.first_page, self.last_page + 1)
+
+    @property
+    def is_plan(self) -> bool:
+        """1ページ目を取得して残りの分担を作成する分担か"""
+        return self.shard_index == PLAN_SHARD_INDEX
+
+
+def split_pages(total_pages: int, shard_count: int) -> list[tuple[int, int]]:
+    """2ページ目から total_pages までを、ページ数がほぼ等しい連続した範囲に分ける。"""
+    pages = total_pages - 1
+    if pages <= 0:
+        return []
+    shard_count = max(1, min(shard_count, pages))
+    size, remainder = divmod(pages, shard_count)
+    ranges = []
+    first_page = 2
+    for index in range(shard_count):
+        last_page = first_page + size - 1 + (1 if index < remainder else 0)
+        ranges.append((first_page, last_page))
+        first_page = last_page + 1
+    return ranges
+
+
+class ShardCoordinator:
+    """CrawlShards を通じた分担の作成・確保・完了の記録
+
+    Args:
+        engine: データベースのエンジン
+        run_id (str): 実行ID（同じ実行のワーカーで共通）
+        shard_count (int): 2ページ目以降を分ける数
+        worker (str): このワーカーの識別子（確保した分担に記録する）
+        claim_timeout (float): 確保したまま終わらない分担を確保し直すまでの時間（秒）
+    """
+
+    def __init__(self, engine, run_id: str, shard_count: int, worker: str,
+                 claim_timeout: float = DEFAULT_CLAIM_TIMEOUT):
+        self.engine = engine
+        self.run_id = run_id
+        self.shard_count = shard_count
+        self.worker = worker
+        self.claim_timeout = claim_timeout
+
+    def ensure_plan(self, categories) -> None:
+        """カテゴリごとに1ページ目の分担を作成する（既にある場合は何もしない）。"""
+        self._insert_shards([
+            {"category": category, "shard_index": PLAN_SHARD_INDEX, "first_page": 1, "last_page": 1}
+            for category in categories
+        ])
+
+    def add_page_shards(self, category: str, total_pages: int) -> int:
+        """2ページ目以降の分担を作成し、分担の数を返す（作成済みの分担は変更しない）。"""
+        ranges = split_pages(total_pages, self.shard_count)
+        self._insert_shards([
+            {"category": category, "shard_index": index, "first_page": first_page, "last_page": last_page}
+            for index, (first_page, last_page) in enumerate(ranges, start=1)
+        ])
+        return len(ranges)
+
+    def claim(self) -> Shard | None:
+        """未着手（または確保したまま期限切れ）の分担を1つ確保して返す。なければ None。"""
+        table = models.CrawlShards
+        now = self._now()
+        claimable = and_(
+            table.run_id == self.run_id,
+            or_(table.status == SHARD_PENDING,
+                and_(table.status == SHARD_CLAIMED,
+                     table.claimed_at < now - timedelta(seconds=self.claim_timeout))),
+        )
+        with self.engine.begin() as conn:
+            candidates = conn.execute(
+                select(table.id, table.category, table.shard_index, table.first_page, table.last_page)
+                .where(claimable)
+                .order_by(table.shard_index, table.id)
+            ).all()
+        for candidate in candidates:
+            with self.engine.begin() as conn:
+                # 確保できる状態のままなら確保する（他のワーカーが先に確保した場合は0行）
+                result = conn.execute(
+                    update(table)
+                    .where(table.id == candidate.id, claimable)
+                    .values(status=SHARD_CLAIMED, worker=self.worker, claimed_at=now, finished_at=None)
+                )
+            if result.rowcount == 1:
+                return Shard(candidate.id, candidate.category, candidate.shard_index,
+                             candidate.first_page, candidate.last_page)
+        return None
+
+    def finish(self, shard: Shard, succeeded: bool, item_count: int) -> None:
+        """確保した分担の完了を記録する（他のワーカーが確保し直していた場合は記録しない）。"""
+        table = models.CrawlShards
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(table)
+                .where(table.id == shard.id, table.worker == self.worker, table.status == SHARD_CLAIMED)
+                .values(status=SHARD_DONE if succeeded else SHARD_FAILED,
+                        finished_at=self._now(), item_count=item_count)
+            )
+
+    def status_counts(self) -> dict[str, int]:
+        """実行IDの分担の状態ごとの数"""
+        table = models.CrawlShards
+        with self.engine.connect() as conn:
+            return dict(conn.execute(
+                select(table.status, func.count()).where(table.run_id == self.run_id).group_by(table.status)
+            ).all())
+
+    def planning_in_progress(self) -> bool:
+        """他のワーカーが1ページ目を取得中（残りの分担がまだ作成されていない）か。"""
+        table = models.CrawlShards
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(table.id).where(table.run_id == self.run_id,
+                                       table.shard_index == PLAN_SHARD_INDEX,
+                                       table.status == SHARD_CLAIMED).limit(1)
+            ).first() is not None
+
+    def _insert_shards(self, rows: list[dict]) -> None:
+        if not rows:
+            return
+        table = models.CrawlShards
+        stmt = upsert_insert(self.engine, table).values([
+            {"run_id": self.run_id, "shard_count": self.shard_count, "status": SHARD_PENDING, **row}
+            for row in rows
+        ])
+        with self.engine.begin() as conn:
+            conn.execute(stmt.on_conflict_do_nothing(
+                index_elements=[table.run_id, table.category, table.shard_index]))
+
+    @staticmethod
+    def _now() -> datetime:
+        """DBと同じ日本時間（タイムゾーンなし）の現在時刻"""
+        return datetime.now(pytz.timezone('Asia/Tokyo')).replace(tzinfo=None)
+
+
+def summarize_shards(engine, run_id: str) -> dict:
+    """実行IDの分担の状態ごとの数と、取得したページ数・商品数、最初の確保から最後の完了までの秒数を集計する。"""
+    table = models.CrawlShards
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(table.status, table.first_page, table.last_page, table.item_count,
+                   table.claimed_at, table.finished_at)
+            .where(table.run_id == run_id)
+        ).all()
+    statuses = {}
+    for row in rows:
+        statuses[row.status] = statuses.get(row.status, 0) + 1
+    done = [row for row in rows if row.status == SHARD_DONE]
+    claimed = [row.claimed_at for row in rows if row.claimed_at]
+    finished = [row.finished_at for row in rows if row.finished_at]
+    return {
+        "run_id": run_id,
+        "shards": len(rows),
+        "statuses": statuses,
+        "pages_done": sum(row.last_page - row.first_page + 1 for row in done),
+        "items": sum(row.item_count or 0 for row in done),
+        "crawl_seconds": (max(finished) - min(claimed)).total_seconds() if claimed and finished else None,
+    }
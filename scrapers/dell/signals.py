@@ -0,0 +1,10 @@
+"""スパイダー・ミドルウェアとパイプラインの間で使う独自のシグナル"""
+
+# それまでにパイプラインに渡した商品の書き込みを求める（send_catch_log_deferred で送る）。
+# パイプラインは書き込み（コミット）が終わったら、書き込みに失敗した商品の累計数で発火する Deferred を返す。
+# 分担クロールのスパイダーが、分担の完了を記録する前に送る
+writes_flush_requested = object()
+
+# 差分クロールのミドルウェアが一覧ページごとに送る（引数 page: dell.listing_pages.ListingPage）。
+# 内容が変わったページは、そのページの商品をパイプラインに渡した後に送る
+listing_page_scraped = object()
@@ -0,0 +1,13 @@
+from dell.categories import CATEGORIES
+from dell.spiders.listing import ListingSpider
+
+
+class CatalogSpider(ListingSpider):
+    """全カテゴリ（dell/categories.py）の一覧ページを1つのプロセスでまとめて取得するスパイダー
+
+    カテゴリごとに別のタスクで実行する場合と違い、全カテゴリのページが同じダウンロードの
+    同時実行数とPlaywrightのブラウザコンテキストを共有するため、所要時間はカテゴリ数ではなく
+    総ページ数に比例する。一部のカテゴリだけ取得する場合: scrapy crawl catalog -a categories=laptops,monitors
+    """
+    name = "catalog"
+    default_categories = list(CATEGORIES)
@@ -0,0 +1,389 @@
+import dataclasses
+import os
+import socket
+import time
+import uuid
+
+from urllib.parse import urlparse
+
+import scrapy
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider
+from scrapy.loader import ItemLoader
+from twisted.internet import task
+
+from dell.categories import Category, get_categories
+from dell.database import create_db_engine
+from dell.extensions import TIMING_EXTRACTION, record_timing
+from dell.extraction import extract_articles
+from dell.items import ProductItem
+from dell.rendering import RENDER_PROFILE_LIGHT, playwright_meta
+from dell.sharding import (
+    DEFAULT_CLAIM_TIMEOUT, SHARD_CLAIMED, SHARD_DONE, SHARD_PENDING, Shard, ShardCoordinator
+)
+from dell.signals import writes_flush_requested
+
+DEFAULT_PAGE_RETRY_TIMES = 2  # 一覧ページ1つあたりの再取得回数
+SHARD_POLL_INTERVAL = 1.0  # 他のワーカーが分担を作成するのを待つ間の確認間隔（秒）
+
+# 一覧ページの取得方法（settings.py の FETCH_MODE）
+FETCH_MODE_HYBRID = "hybrid"
+FETCH_MODE_PLAYWRIGHT = "playwright"
+FETCH_MODE_HTTP = "http"
+
+# 一覧ページからの商品の抽出方法（settings.py の EXTRACTION_MODE）
+EXTRACTION_MODE_FAST = "fast"  # コンパイル済みの XPath で dict を作る（dell/extraction.py）
+EXTRACTION_MODE_LOADER = "loader"  # 商品ごとに ItemLoader で ProductItem を作る
+
+
+@dataclasses.dataclass
+class CategoryCrawl:
+    """1カテゴリ分のクロールの進み具合"""
+    category: Category
+    total_pages: int | None = None  # 1ページ目の取得後に確定する
+    fetched_pages: set = dataclasses.field(default_factory=set)
+    failed_pages: set = dataclasses.field(default_factory=set)
+    fetch_counts: dict = dataclasses.field(default_factory=lambda: {"http": 0, "playwright": 0})  # 取得方法ごとのページ数
+    http_fallback: bool = False  # 1ページ目をHTTPで抽出できなかった場合、以降はPlaywrightで取得する
+    assigned_pages: set = dataclasses.field(default_factory=set)  # 分担クロールで確保したページ
+    page_items: dict = dataclasses.field(default_factory=dict)  # ページ番号ごとの商品数（分担クロールのみ）
+
+    def expected_pages(self, sharded: bool) -> set:
+        """取得するはずのページ（分担クロールでは確保した分担のページ）"""
+        if sharded:
+            return self.assigned_pages
+        return set(range(1, (self.total_pages or 1) + 1))
+
+
+class ListingSpider(scrapy.Spider):
+    """カテゴリ（dell/categories.py）の一覧ページを全ページ取得し、商品をアイテムとして返すスパイダーの基底クラス
+
+    複数のカテゴリを1つのスパイダーで取得するため、ダウンロードの同時実行数
+    （settings.py の LISTING_PAGE_CONCURRENCY）とPlaywrightのブラウザコンテキストは全カテゴリで共有する。
+
+    -a shard_run=... -a shard_count=N を指定した場合は分担クロール（dell/sharding.py）のワーカーとして動作し、
+    CrawlShards から確保した分担のページだけを取得する。処理中のページがなくなるたびに（spider_idle）
+    パイプラインの書き込みを待って分担の完了を記録してから次の分担を確保し、確保できる分担がなくなったら終了する。
+
+    Attributes:
+        default_categories (list[str]): -a categories=... を省略した場合に取得するカテゴリ名
+    """
+    default_categories: list[str] = []
+
+    def __init__(self, *args, categories=None, start_url=None, shard_run=None, shard_count=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.shard_run = shard_run
+        self.run_id = shard_run or uuid.uuid4().hex  # 価格の変動（PriceChanges）を検出する単位
+        self.shard_count = int(shard_count)
+        self.shard_coordinator: ShardCoordinator | None = None
+        self.active_shards: list[Shard] = []
+        self.shard_poll: task.LoopingCall | None = None
+        self.finishing_shards = False  # パイプラインの書き込みを待って分担の完了を記録している間 True
+        self.write_failures = 0  # パイプラインが書き込みに失敗した商品の累計数（前回の分担の完了時点）
+        selected = get_categories(categories or self.default_categories)
+        if start_url:
+            # 一覧ページの取得先を変更する（ベンチマークのフィクスチャサーバーなど）: -a start_url=...
+            if len(selected) != 1:
+                raise ValueError("start_url はカテゴリを1つだけ指定した場合に使えます")
+            selected = [dataclasses.replace(selected[0], start_url=start_url)]
+        self.crawls = {category.name: CategoryCrawl(category) for category in selected}
+        self.allowed_domains = sorted({urlparse(category.start_url).hostname for category in selected})
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        if spider.shard_run:
+            crawler.signals.connect(spider._claim_next_shard, signal=signals.spider_idle)
+        return spider
+
+    def start_requests(self):
+        if self.shard_run:
+            yield from self._start_sharded_requests()
+            return
+        # GET request
+        for crawl in self.crawls.values():
+            yield self._page_request(crawl, 1)
+
+    def parse(self, response):
+        # screenshot = response.meta["playwright_page_methods"][0]
+        crawl = self.crawls[response.meta["category"]]
+        current_page = response.meta["current_page"]
+
+        started_at = time.perf_counter()
+        items = self._extract_items_from_articles(response, crawl.category)
+        record_timing(self.crawler.stats, TIMING_EXTRACTION, time.perf_counter() - started_at)
+        if not items:
+            if self._can_escalate(response):
+                # HTTPで取得したHTMLに商品が含まれない場合はPlaywrightで描画し直す
+                self.logger.info(f"[{crawl.category.name}] {current_page}ページ目をPlaywrightで再取得します")
+                if current_page == 1 or self.shard_run:
+                    # 分担クロールでは1ページ目を取得しないワーカーもあるため、最初に失敗したページで判定する
+                    crawl.http_fallback = True
+                yield self._page_request(crawl, current_page, use_playwright=True, dont_filter=True)
+                return
+            # articleが見つからない場合は描画が不完全な可能性があるため再取得する
+            retry_request = self._retry_page_request(response.request, "商品が見つかりません")
+            if retry_request:
+                yield retry_request
+                return
+        else:
+            crawl.fetched_pages.add(current_page)
+            crawl.page_items[current_page] = len(items)
+            crawl.fetch_counts["playwright" if response.meta.get("playwright") else "http"] += 1
+
+        # parse内からyieldしないと動かない
+        for item in items:
+            yield item
+
+        if current_page == 1:
+            # 総ページ数が分かった時点で残りのページを一度に発行する
+            # 同時に描画するページ数は settings.py の LISTING_PAGE_CONCURRENCY で制限する（全カテゴリ共通）
+            crawl.total_pages = self._get_total_pages(response, crawl.category)
+            if self.shard_run:
+                # 残りのページは分担として登録し、各ワーカーが確保して取得する
+                shards = self.shard_coordinator.add_page_shards(crawl.category.name, crawl.total_pages)
+                self.logger.info(f"[{crawl.category.name}] 総ページ数: {crawl.total_pages}"
+                                 f"（2ページ目以降を{shards}個の分担に分けました）")
+                # 1ページ目の処理の完了（spider_idle）を待たずに次の分担を取得する
+                shard = self.shard_coordinator.claim()
+                if shard:
+                    yield from self._shard_requests(shard)
+                return
+            for page in range(2, crawl.total_pages + 1):
+                yield self._page_request(crawl, page)
+
+    def closed(self, reason):
+        """取得できたページ数と想定ページ数のサマリーを出力する（全カテゴリの合計とカテゴリごと）。"""
+        if self.shard_run:
+            if self.shard_poll is not None and self.shard_poll.running:
+                self.shard_poll.stop()
+            # タイムアウトなどで途中終了した場合、取得しきれなかった分担は失敗として記録する
+            self._finish_active_shards()
+        totals = {"expected": 0, "fetched": 0, "failed": 0, "http": 0, "playwright": 0}
+        for name, crawl in self.crawls.items():
+            expected_pages = crawl.expected_pages(bool(self.shard_run))
+            expected = len(expected_pages)
+            missing = sorted(expected_pages - crawl.fetched_pages)
+            counts = {"expected": expected, "fetched": len(crawl.fetched_pages),
+                      "failed": len(crawl.failed_pages), **crawl.fetch_counts}
+            for key, count in counts.items():
+                totals[key] += count
+                if len(self.crawls) > 1:
+                    self.crawler.stats.set_value(f"{self.name}/{name}/pages_{key}", count)
+            log = self.logger.info if not missing else self.logger.warning
+            log(f"[{name}] ページ取得結果: {len(crawl.fetched_pages)}/{expected}ページ（未取得: {missing}）"
+                f" HTTP: {crawl.fetch_counts['http']}ページ, Playwright: {crawl.fetch_counts['playwright']}ページ")
+        for key, count in totals.items():
+            self.crawler.stats.set_value(f"{self.name}/pages_{key}", count)
+
+    def is_run_finished(self, write_failures: int = 0) -> bool:
+        """この実行の取得が終わったか（分担クロールでは全ワーカーの分担が終わったか）。
+
+        パイプラインの終了処理で、残りのバッファを書き込んだ後に呼ぶ。分担クロールでは確保したままの
+        分担の完了を記録してから判定する。
+
+        Args:
+            write_failures (int): パイプラインが書き込みに失敗した商品の累計数
+        """
+        if not self.shard_run:
+            return True
+        self._finish_active_shards(write_failures)
+        counts = self.shard_coordinator.status_counts()
+        return not counts.get(SHARD_PENDING) and not counts.get(SHARD_CLAIMED)
+
+    def is_run_complete(self) -> bool:
+        """この実行で全カテゴリの全ページを取得できたか（一覧から消えた商品を判定できるか）。"""
+        if self.shard_run:
+            return set(self.shard_coordinator.status_counts()) == {SHARD_DONE}
+        return all(crawl.total_pages and crawl.expected_pages(False) <= crawl.fetched_pages
+                   for crawl in self.crawls.values())
+
+    def _start_sharded_requests(self):
+        """分担を作成し（作成済みなら何もしない）、最初の分担を確保してそのページのリクエストを返す。"""
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.shard_coordinator = ShardCoordinator(
+            create_db_engine(), self.shard_run, self.shard_count, worker,
+            claim_timeout=self.settings.getfloat("SHARD_CLAIM_TIMEOUT", DEFAULT_CLAIM_TIMEOUT),
+        )
+        self.shard_coordinator.ensure_plan(self.crawls)
+        self.logger.info(f"分担クロールを開始します: run_id={self.shard_run}, worker={worker}")
+        shard = self.shard_coordinator.claim()
+        if shard:
+            yield from self._shard_requests(shard)
+
+    def _shard_requests(self, shard: Shard):
+        """確保した分担のページのリクエストを返す。"""
+        crawl = self.crawls[shard.category]
+        self.active_shards.append(shard)
+        crawl.assigned_pages.update(shard.pages)
+        self.crawler.stats.inc_value("shard/claimed")
+        self.logger.info(f"[{shard.category}] 分担{shard.shard_index}を確保しました"
+                         f"（{shard.first_page}〜{shard.last_page}ページ）")
+        for page in shard.pages:
+            yield self._page_request(crawl, page)
+
+    def _claim_next_shard(self):
+        """処理中のページがなくなったら確保した分担の完了を記録し、次の分担を確保する（spider_idle）。
+
+        分担の商品がパイプラインのバッファや書き込みスレッドに残ったまま完了を記録しないよう、
+        書き込みが終わるのを待ってから記録する（他のワーカーが価格の変動を検出するのは全分担の完了後）。
+        """
+        if self.active_shards or self.finishing_shards:
+            if not self.finishing_shards:
+                self.finishing_shards = True
+                d = self.crawler.signals.send_catch_log_deferred(signal=writes_flush_requested, spider=self)
+                d.addCallback(self._on_shard_writes_flushed)
+            raise DontCloseSpider
+        if self._schedule_next_shard():
+            raise DontCloseSpider
+        if self.shard_coordinator.planning_in_progress():
+            self._start_shard_poll()
+            raise DontCloseSpider
+
+    def _on_shard_writes_flushed(self, results) -> None:
+        """パイプラインの書き込みが終わったら分担の完了を記録し、次の分担を確保する。
+
+        確保できる分担がない場合は、次の spider_idle で終了（または他のワーカーの1ページ目の取得待ち）になる。
+        """
+        self.finishing_shards = False
+        write_failures = max((result for _, result in results if isinstance(result, int)), default=0)
+        self._finish_active_shards(write_failures)
+        if not self._schedule_next_shard() and self.shard_coordinator.planning_in_progress():
+            self._start_shard_poll()
+
+    def _start_shard_poll(self) -> None:
+        """他のワーカーが1ページ目を取得中のため、残りの分担が作成されたらすぐに確保できるよう確認を続ける。"""
+        if self.shard_poll is None or not self.shard_poll.running:
+            self.shard_poll = task.LoopingCall(self._poll_shards)
+            self.shard_poll.start(SHARD_POLL_INTERVAL, now=False)
+
+    def _poll_shards(self) -> None:
+        """分担を確保できるか、他のワーカーの1ページ目の取得が終わるまで確認する。"""
+        if self._schedule_next_shard() or not self.shard_coordinator.planning_in_progress():
+            self.shard_poll.stop()
+
+    def _schedule_next_shard(self) -> bool:
+        """次の分担を確保し、そのページのリクエストをスケジュールする（確保できたら True）。"""
+        shard = self.shard_coordinator.claim()
+        if shard is None:
+            return False
+        for request in self._shard_requests(shard):
+            self.crawler.engine.crawl(request)
+        return True
+
+    def _finish_active_shards(self, write_failures: int | None = None) -> None:
+        """確保した分担の完了（全ページ取得できたか）と商品数を記録する。
+
+        前回の記録から書き込みに失敗した商品が増えていた場合は、確保していた分担を失敗として記録する
+        （一覧から消えた商品を誤って検出しないようにするため）。
+        """
+        writes_failed = write_failures is not None and write_failures > self.write_failures
+        if write_failures is not None:
+            self.write_failures = max(self.write_failures, write_failures)
+        for shard in self.active_shards:
+            crawl = self.crawls[shard.category]
+            succeeded = set(shard.pages) <= crawl.fetched_pages and not writes_failed
+            item_count = sum(crawl.page_items.get(page, 0) for page in shard.pages)
+            self.shard_coordinator.finish(shard, succeeded, item_count)
+            self.crawler.stats.inc_value("shard/done" if succeeded else "shard/failed")
+        self.active_shards = []
+
+    def _page_request(self, crawl: CategoryCrawl, page: int, retry_count: int = 0,
+                      use_playwright: bool | None = None, dont_filter: bool = False) -> scrapy.Request:
+        """指定カテゴリ・指定ページの一覧ページのリクエストを作成する。"""
+        start_url = crawl.category.start_url
+        url = start_url if page == 1 else f"{start_url}?page={page}"
+        if use_playwright is None:
+            use_playwright = self._use_playwright_first(crawl)
+        render_meta = (
+            playwright_meta(self.settings.get("PLAYWRIGHT_RENDER_PROFILE", RENDER_PROFILE_LIGHT),
+                            crawl.category.selectors.wait_for)
+            if use_playwright else {"playwright": False}
+        )
+        return scrapy.Request(
+            url=url,
+            callback=self.parse,
+            errback=self._handle_page_error,
+            dont_filter=dont_filter or retry_count > 0,
+            meta={
+                **render_meta,
+                "category": crawl.category.name,
+                "current_page": page,
+                "page_retry_count": retry_count,
+                }
+            )
+
+    def _retry_page_request(self, request, reason: str) -> scrapy.Request | None:
+        """再取得回数の上限内であれば同じページのリクエストを作り直す。"""
+        crawl = self.crawls[request.meta["category"]]
+        page = request.meta["current_page"]
+        retry_count = request.meta.get("page_retry_count", 0)
+        max_retry_times = self.settings.getint("LISTING_PAGE_RETRY_TIMES", DEFAULT_PAGE_RETRY_TIMES)
+        if retry_count >= max_retry_times:
+            self.logger.error(f"[{crawl.category.name}] {page}ページ目の取得を諦めました（{reason}）")
+            crawl.failed_pages.add(page)
+            return None
+        self.logger.warning(f"[{crawl.category.name}] {page}ページ目を再取得します（{retry_count + 1}回目）: {reason}")
+        return self._page_request(crawl, page, retry_count + 1,
+                                  use_playwright=request.meta.get("playwright", False))
+
+    def _fetch_mode(self) -> str:
+        return self.settings.get("FETCH_MODE", FETCH_MODE_HYBRID)
+
+    def _use_playwright_first(self, crawl: CategoryCrawl) -> bool:
+        """新しく発行するページのリクエストを最初からPlaywrightで取得するか判定する。"""
+        mode = self._fetch_mode()
+        return mode == FETCH_MODE_PLAYWRIGHT or (mode == FETCH_MODE_HYBRID and crawl.http_fallback)
+
+    def _can_escalate(self, response) -> bool:
+        """HTTPで取得したページをPlaywrightで取得し直せるか判定する。"""
+        return self._fetch_mode() == FETCH_MODE_HYBRID and not response.meta.get("playwright")
+
+    def _handle_page_error(self, failure):
+        """ダウンロードに失敗したページを再取得する。"""
+        retry_request = self._retry_page_request(failure.request, repr(failure.value))
+        if retry_request:
+            yield retry_request
+
+    def _extract_items_from_articles(self, response, category: Category):
+        """現在のページのarticleタグを処理し、アイテムを生成"""
+        if self.settings.get("EXTRACTION_MODE", EXTRACTION_MODE_FAST) == EXTRACTION_MODE_LOADER:
+            return self._extract_items_with_loader(response, category)
+        return extract_articles(response.selector.root, category.selectors, category.name,
+                                on_error=self._log_extraction_error)
+
+    def _log_extraction_error(self, article, error):
+        self.logger.error(f"id={article.get('id', 'unknown')}読み込み中にエラーが発生しました: {error}")
+
+    def _extract_items_with_loader(self, response, category: Category):
+        """ItemLoader で各articleタグからアイテムを生成（EXTRACTION_MODE = "loader"）"""
+        selectors = category.selectors
+        items = []
+        # TODO: xpathが見つからないとitems = []となり、for文が回らない→エラーが出ない
+        for article in response.xpath(selectors.article):
+            try:
+                loader = ItemLoader(item=ProductItem(), selector=article)
+                loader.add_xpath('order_code', selectors.link)
+                loader.add_xpath('name', selectors.name)
+                loader.add_xpath('normalized_name', selectors.name)
+                loader.add_xpath('model', selectors.model)
+                loader.add_xpath('price', selectors.price)
+                loader.add_xpath('url', selectors.link)
+                loader.add_value('category', category.name)
+                items.append(loader.load_item())
+            except Exception as e:
+                self.logger.error(f"id={article.attrib.get('id', 'unknown')}読み込み中にエラーが発生しました: {e}")
+        return items
+
+    def _get_total_pages(self, response, category: Category) -> int:
+        total_pages_text = response.xpath(category.selectors.total_pages).get()
+
+        if total_pages_text is None:
+            self.logger.error(f"[{category.name}] ページ総数の取得に失敗")
+            return 1  # デフォルトで1ページに設定
+
+        try:
+            return int(total_pages_text.strip())
+        except ValueError:
+            self.logger.error(f"[{category.name}] ページ総数のパースに失敗: {total_pages_text}")
+            return 1
@@ -0,0 +1,46 @@
+"""既存の全商品の ProductStats を作成する（以降はパイプラインがクロールの終了時に、書き込んだ商品の行だけを更新する）。
+
+1. 直近90日の日次ロールアップがある商品の統計を作成・更新する
+2. 全期間の最小・最大を価格履歴の全行から求め直す
+
+    cd scrapers
+    python -m migrations.build_product_stats
+"""
+from datetime import datetime
+
+import pytz
+from sqlalchemy import Integer, cast, func, select, update
+
+from dell.database import create_db_engine, least_greatest
+from dell.product_stats import refresh_product_stats
+from model import models
+
+
+def main() -> None:
+    engine = create_db_engine()  # ProductStats テーブルが無ければ作成される
+    now = datetime.now(pytz.timezone('Asia/Tokyo'))
+    with engine.begin() as conn:
+        order_codes = conn.execute(select(models.Products.order_code)).scalars().all()
+        refresh_product_stats(conn, order_codes, now)
+
+        stats, history = models.ProductStats, models.PriceHistory
+        all_time = (
+            select(history.order_code,
+                   cast(func.min(history.price), Integer).label("min_price"),
+                   cast(func.max(history.price), Integer).label("max_price"))
+            .group_by(history.order_code)
+            .subquery()
+        )
+        least, greatest = least_greatest(conn)
+        conn.execute(
+            update(stats)
+            .where(stats.order_code == all_time.c.order_code)
+            .values(all_time_min_price=least(stats.all_time_min_price, all_time.c.min_price),
+                    all_time_max_price=greatest(stats.all_time_max_price, all_time.c.max_price))
+        )
+        count = conn.execute(select(func.count()).select_from(stats)).scalar()
+    print(f"ProductStats を作成しました: {count}件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""既存の PriceHistory を変化点のみの形式に移行し、日次・週次ロールアップを作成する。
+
+1. スキーマを更新する（migrations/upgrade.py。valid_to カラムと (order_code, scraped_at) の複合インデックスを含む）
+2. 削除前の全履歴から日次・週次ロールアップを作り直す
+3. 直前の行と価格が同じ行（連続する重複）を削除する
+4. 残った行の valid_to を次の変化点の日時で埋める
+
+    cd scrapers
+    python -m migrations.compact_price_history --dry-run
+    python -m migrations.compact_price_history
+"""
+import argparse
+
+from sqlalchemy import func, insert, select, text
+
+from dell.database import create_db_engine
+from dell.price_history import close_superseded_rows, summarize_observations
+from migrations.upgrade import upgrade
+from model import models
+
+FETCH_SIZE = 10000  # 全履歴を読み込む際の1回あたりの取得件数
+INSERT_CHUNK_SIZE = 5000  # ロールアップを書き込む際の1回あたりの件数
+
+# 同じ商品の直前の行（scraped_at順）と価格が同じ行を抽出する
+DUPLICATE_ROWS_SQL = f"""
+    SELECT id FROM (
+        SELECT id, price,
+               LAG(price) OVER (PARTITION BY order_code ORDER BY scraped_at, id) AS prev_price
+        FROM "{models.PRICE_HISTORY_TABLE}"
+    ) AS ordered
+    WHERE prev_price = price
+"""
+
+
+def rebuild_rollups(conn) -> int:
+    """全履歴から日次・週次ロールアップを作り直し、作成した行数を返す。"""
+    history = models.PriceHistory
+    rows = conn.execution_options(yield_per=FETCH_SIZE).execute(
+        select(history.order_code, history.price, history.scraped_at)
+        .order_by(history.scraped_at, history.id)
+    )
+    daily, weekly = summarize_observations(rows)
+
+    written = 0
+    for model, period_column, summaries in ((models.PriceDailyRollup, "day", daily),
+                                            (models.PriceWeeklyRollup, "week_start", weekly)):
+        conn.execute(model.__table__.delete())
+        values = [
+            {"order_code": order_code, period_column: period, **summary}
+            for (order_code, period), summary in summaries.items()
+        ]
+        for start in range(0, len(values), INSERT_CHUNK_SIZE):
+            conn.execute(insert(model), values[start:start + INSERT_CHUNK_SIZE])
+        written += len(values)
+    return written
+
+
+def delete_consecutive_duplicates(conn) -> int:
+    """直前の行と価格が同じ行を削除し、削除した行数を返す。"""
+    result = conn.execute(text(
+        f'DELETE FROM "{models.PRICE_HISTORY_TABLE}" WHERE id IN ({DUPLICATE_ROWS_SQL})'
+    ))
+    return result.rowcount
+
+
+def main(dry_run: bool) -> None:
+    engine = create_db_engine()
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        upgrade(conn)  # カラムの追加 → インデックスの作成の順に、不足しているものだけ
+        before = conn.execute(select(func.count()).select_from(models.PriceHistory)).scalar_one()
+        rollup_rows = rebuild_rollups(conn)
+        deleted = delete_consecutive_duplicates(conn)
+        close_superseded_rows(conn)
+
+        print(f"価格履歴: {before}件 -> {before - deleted}件（連続する重複 {deleted}件を削除）")
+        print(f"ロールアップ: {rollup_rows}件を作成")
+        if dry_run:
+            transaction.rollback()
+            print("--dry-run のため変更をロールバックしました")
+        else:
+            transaction.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="変更内容を表示するだけでコミットしない")
+    main(parser.parse_args().dry_run)
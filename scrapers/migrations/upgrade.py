@@ -0,0 +1,117 @@
+"""既存のデータベースを現在のモデルに合わせて更新する（何度実行しても同じ結果になる）。
+
+create_all は未作成のテーブルを作成するだけで、既存のテーブルにカラムやインデックスを追加しないため、
+次の順に実行する。app.py はクロールの前に毎回実行する（更新が不要な場合はテーブル定義を確認するだけ）。
+
+1. 未作成のテーブルを作成する
+2. 既存のテーブルに不足しているカラムを追加する（ADDED_COLUMNS）
+3. 不足しているインデックスを作成する（カラムがあるものだけ）
+4. 追加したカラムの値を埋める（category, normalized_name, 価格履歴の valid_to）
+
+価格履歴の連続する重複の削除とロールアップの作成（compact_price_history）、既存の全商品の
+ProductStats の作成（build_product_stats）は時間がかかるため、デプロイ後に1回だけ実行する。
+
+    cd scrapers
+    python -m migrations.upgrade
+"""
+import logging
+
+from sqlalchemy import bindparam, inspect, select, text, update
+
+from dell.categories import CATEGORY_LAPTOPS
+from dell.database import create_db_engine, dialect_name
+from dell.items import normalize_name
+from dell.price_history import close_superseded_rows
+from model import models
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_UPGRADE_LOCK_KEY = 7305003  # 分担クロールの複数のワーカーが同時に更新しないための pg_advisory_xact_lock のキー
+
+# 既存のテーブルに後から追加したカラム（追加した順）
+ADDED_COLUMNS = (
+    models.PriceHistory.__table__.c.valid_to,
+    models.PriceHistory.__table__.c.run_id,
+    models.Products.__table__.c.run_id,
+    models.Products.__table__.c.normalized_name,
+    models.Products.__table__.c.category,
+    models.ScrapeTasks.__table__.c.run_id,
+)
+
+
+def add_missing_columns(conn) -> set[str]:
+    """ADDED_COLUMNS のうち未作成のカラムを追加し、追加したカラム（"テーブル名.カラム名"）を返す。"""
+    inspector = inspect(conn)
+    added = set()
+    for column in ADDED_COLUMNS:
+        table = column.table.name
+        if column.name in {existing["name"] for existing in inspector.get_columns(table)}:
+            continue
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column.name} {column_type}'))
+        added.add(f"{table}.{column.name}")
+        logger.info(f"{table} に {column.name} カラムを追加しました")
+    return added
+
+
+def create_missing_indexes(conn) -> None:
+    """モデルに定義されたインデックスのうち、未作成でカラムがそろっているものを作成する。"""
+    inspector = inspect(conn)
+    for table in models.Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if not {column.name for column in index.columns} <= columns:
+                logger.warning(f"カラムが無いためインデックスを作成しません: {table.name}.{index.name}")
+                continue
+            index.create(conn)
+            logger.info(f"インデックスを作成しました: {table.name}.{index.name}")
+
+
+def backfill(conn, added: set[str]) -> None:
+    """追加したカラムの値を埋める（値が未設定の行だけ）。"""
+    products = models.Products
+    result = conn.execute(update(products).where(products.category.is_(None)).values(category=CATEGORY_LAPTOPS))
+    if result.rowcount:
+        logger.info(f"category を設定しました: {result.rowcount}件")
+
+    rows = conn.execute(
+        select(products.order_code, products.name)
+        .where(products.normalized_name.is_(None), products.name.is_not(None))
+    ).all()
+    if rows:
+        conn.execute(
+            update(products)
+            .where(products.order_code == bindparam("key"))
+            .values(normalized_name=bindparam("value")),
+            [{"key": order_code, "value": normalize_name(name)} for order_code, name in rows],
+        )
+        logger.info(f"normalized_name を設定しました: {len(rows)}件")
+
+    # valid_to を追加した直後だけ全履歴を埋める（以降はパイプラインが書き込みのたびに埋める）
+    if f"{models.PRICE_HISTORY_TABLE}.valid_to" in added:
+        close_superseded_rows(conn)
+        logger.info("価格履歴の valid_to を設定しました")
+
+
+def upgrade(conn) -> None:
+    """テーブル・カラム・インデックスの作成と値の設定を、この順に1トランザクションで実行する。"""
+    if dialect_name(conn) == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_UPGRADE_LOCK_KEY})
+    models.Base.metadata.create_all(conn)
+    added = add_missing_columns(conn)
+    create_missing_indexes(conn)
+    backfill(conn, added)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    engine = create_db_engine()
+    with engine.begin() as conn:
+        upgrade(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,203 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, String, Integer, Float, Text, ForeignKey, DateTime, Date, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import synonym
 
 Base = declarative_base()
 
 # テーブル名を定数化
 PRODUCTS_TABLE = 'Products'
 PRICE_HISTORY_TABLE = 'PriceHistory'
+LISTING_PAGES_TABLE = 'ListingPages'
+PRICE_DAILY_ROLLUP_TABLE = 'PriceDailyRollup'
+PRICE_WEEKLY_ROLLUP_TABLE = 'PriceWeeklyRollup'
+SCRAPE_GENERATION_TABLE = 'ScrapeGeneration'
+SCRAPE_TASKS_TABLE = 'ScrapeTasks'
+SCRAPE_RUNS_TABLE = 'ScrapeRuns'
+CRAWL_SHARDS_TABLE = 'CrawlShards'
+PRICE_CHANGES_TABLE = 'PriceChanges'
+PRICE_CHANGE_RUNS_TABLE = 'PriceChangeRuns'
+PRODUCT_STATS_TABLE = 'ProductStats'
 
 
 # SQLAlchemy Models
 class Products(Base):
     __tablename__ = PRODUCTS_TABLE
+    __table_args__ = (
+        Index("ix_products_name_model", "name", "model"),  # APIでの name と model からの商品検索用
+        Index("ix_products_normalized_name_model", "normalized_name", "model"),  # APIでの商品名ごとのグループ化用
+    )
     order_code = Column(String, primary_key=True, nullable=False)
     name = Column(String)
+    normalized_name = Column(String)  # 表記揺らぎを吸収した商品名（dell/items.py の normalize_name）
     model = Column(String)
+    category = Column(String)  # 商品カテゴリ（dell/categories.py のカテゴリ名）
     url = Column(String)
     price = Column(Integer)
     scraped_at = Column(DateTime)
+    run_id = Column(String)  # 最後に一覧ページで見つかったクロールの実行ID
     is_line_notification = Column(Integer)
 
 
 class PriceHistory(Base):
+    """価格の変化点の履歴（価格が変わったときだけ1行追加する）
+
+    scraped_at（= valid_from）から valid_to までその価格だったことを表す。
+    valid_to が NULL の行が現在の価格。
+    """
     __tablename__ = PRICE_HISTORY_TABLE
+    __table_args__ = (
+        Index("ix_price_history_order_code_scraped_at", "order_code", "scraped_at"),
+        Index("ix_price_history_run_id", "run_id"),  # 実行ごとの価格変動の検出用
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     order_code = Column(String, ForeignKey(f"{PRODUCTS_TABLE}.order_code"), nullable=False)
     price = Column(Integer)
-    scraped_at = Column(DateTime)
\ No newline at end of file
+    scraped_at = Column(DateTime)
+    valid_to = Column(DateTime)
+    run_id = Column(String)  # この行を追加したクロールの実行ID
+    valid_from = synonym("scraped_at")
+
+
+class ListingPages(Base):
+    """一覧ページごとの内容のフィンガープリント（差分クロール用）"""
+    __tablename__ = LISTING_PAGES_TABLE
+    url = Column(String, primary_key=True, nullable=False)
+    fingerprint = Column(String, nullable=False)  # ページ内の商品の価格・商品名・URLなどから計算したハッシュ（dell/listing_pages.py）
+    item_count = Column(Integer)
+    checked_at = Column(DateTime)
+
+
+class PriceDailyRollup(Base):
+    """商品ごと・日ごとの価格の最小・最大・最終値"""
+    __tablename__ = PRICE_DAILY_ROLLUP_TABLE
+    order_code = Column(String, ForeignKey(f"{PRODUCTS_TABLE}.order_code"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    min_price = Column(Integer)
+    max_price = Column(Integer)
+    last_price = Column(Integer)
+
+
+class PriceWeeklyRollup(Base):
+    """商品ごと・週ごと（月曜始まり）の価格の最小・最大・最終値"""
+    __tablename__ = PRICE_WEEKLY_ROLLUP_TABLE
+    order_code = Column(String, ForeignKey(f"{PRODUCTS_TABLE}.order_code"), primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    min_price = Column(Integer)
+    max_price = Column(Integer)
+    last_price = Column(Integer)
+
+
+class ScrapeGeneration(Base):
+    """スクレイプ完了ごとに加算する世代番号（APIのキャッシュ無効化用。id=1 の1行のみ）"""
+    __tablename__ = SCRAPE_GENERATION_TABLE
+    id = Column(Integer, primary_key=True)
+    generation = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime)
+
+
+class ScrapeTasks(Base):
+    """APIから起動したスクレイピング（ECSタスク）の記録（APIが同じ種類の実行の重複起動を防ぐために使う）"""
+    __tablename__ = SCRAPE_TASKS_TABLE
+    __table_args__ = (
+        Index("ix_scrape_tasks_trigger_started_at", "trigger", "started_at"),
+    )
+    task_arn = Column(String, primary_key=True)
+    trigger = Column(String, nullable=False)  # 起動したエンドポイント（check_price など）
+    run_id = Column(String)  # 同時に起動したタスク（分担クロールのワーカー）で共通の実行ID
+    status = Column(String)  # ECSタスクの最後に確認した状態
+    started_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime)
+
+
+class ScrapeRuns(Base):
+    """クロール1回ごとの処理時間と最大RSSの記録（dell/extensions.py の CrawlPerformanceExtension が追加する）"""
+    __tablename__ = SCRAPE_RUNS_TABLE
+    __table_args__ = (
+        Index("ix_scrape_runs_finished_at", "finished_at"),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    spider = Column(String, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    finish_reason = Column(String)
+    duration_seconds = Column(Float)
+    item_count = Column(Integer)
+    page_count = Column(Integer)
+    updated_count = Column(Integer)
+    download_avg_seconds = Column(Float)  # 一覧ページ1つあたりの平均取得時間
+    extraction_seconds = Column(Float)  # 商品の抽出時間の合計
+    db_flush_seconds = Column(Float)  # DBへの書き込み時間の合計
+    notification_avg_seconds = Column(Float)  # 通知を積んでから送信完了までの平均時間
+    peak_rss_mb = Column(Float)
+    report = Column(Text)  # 実行記録全体（JSON）
+
+
+class CrawlShards(Base):
+    """分担クロール（dell/sharding.py）の一覧ページの分担と、各ワーカーによる確保・完了の記録"""
+    __tablename__ = CRAWL_SHARDS_TABLE
+    __table_args__ = (
+        UniqueConstraint("run_id", "category", "shard_index", name="uq_crawl_shards_run_category_index"),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String, nullable=False)  # 同じ実行のワーカーで共通の実行ID
+    category = Column(String, nullable=False)
+    shard_index = Column(Integer, nullable=False)  # 0 は1ページ目（総ページ数の取得）
+    shard_count = Column(Integer, nullable=False)
+    first_page = Column(Integer, nullable=False)
+    last_page = Column(Integer, nullable=False)
+    status = Column(String, nullable=False)  # pending / claimed / done / failed
+    worker = Column(String)  # 確保したワーカー
+    claimed_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    item_count = Column(Integer)
+
+
+class PriceChanges(Base):
+    """クロール1回ごとの価格の変動（dell/price_changes.py がクロールの終了時にまとめて検出する）
+
+    change_type は new（新しく見つかった商品）/ changed（価格の変更）/ disappeared（一覧から消えた商品）。
+    LINE通知とAPIはこのテーブルを読む。
+    """
+    __tablename__ = PRICE_CHANGES_TABLE
+    __table_args__ = (
+        UniqueConstraint("run_id", "order_code", name="uq_price_changes_run_order_code"),
+        Index("ix_price_changes_detected_at", "detected_at"),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String, nullable=False)
+    order_code = Column(String, nullable=False)
+    change_type = Column(String, nullable=False)
+    old_price = Column(Integer)  # new の場合は NULL
+    new_price = Column(Integer)  # disappeared の場合は NULL
+    price_delta = Column(Integer)  # new_price - old_price
+    percent_delta = Column(Float)  # 変動率（%）
+    detected_at = Column(DateTime, nullable=False)
+    notified_at = Column(DateTime)  # LINE通知を送信した日時
+
+
+class PriceChangeRuns(Base):
+    """価格の変動を検出済みの実行ID（分担クロールで複数のワーカーが終了しても検出を1回だけにする）"""
+    __tablename__ = PRICE_CHANGE_RUNS_TABLE
+    run_id = Column(String, primary_key=True)
+    detected_at = Column(DateTime, nullable=False)
+    complete = Column(Integer)  # 全ページを取得でき、disappeared も検出したか（1 / 0）
+
+
+class ProductStats(Base):
+    """商品ごとの価格の統計（パイプラインがクロールの終了時に、書き込んだ商品の行だけ更新する）
+
+    30日・90日の値は日次ロールアップ（PriceDailyRollup）から求める。平均は日ごとの最終値の平均。
+    """
+    __tablename__ = PRODUCT_STATS_TABLE
+    order_code = Column(String, ForeignKey(f"{PRODUCTS_TABLE}.order_code"), primary_key=True)
+    current_price = Column(Integer)
+    all_time_min_price = Column(Integer)
+    all_time_max_price = Column(Integer)
+    min_price_30d = Column(Integer)
+    avg_price_30d = Column(Float)
+    min_price_90d = Column(Integer)
+    avg_price_90d = Column(Float)
+    # 直近90日のうち、日ごとの最終価格が現在の価格より安かった日の割合（%。価格の分布のパーセンタイルではない。0 なら90日間の最安水準）
+    price_percentile_90d = Column(Float)
+    last_changed_at = Column(DateTime)  # 価格が最後に変わった日時（最初に取得した日時を含む）
+    updated_at = Column(DateTime)
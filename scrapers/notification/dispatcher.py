@@ -0,0 +1,176 @@
+import logging
+import queue
+import threading
+import time
+
+from collections.abc import Callable
+
+import requests
+
+from notification.line_notifier import LineNotifier, MAX_MESSAGES_PER_REQUEST
+
+# 送信設定
+COALESCE_WAIT = 1.0  # 最初のメッセージを受け取ってから後続をまとめるために待つ秒数
+MAX_RETRIES = 3  # 送信失敗時の最大リトライ回数
+BACKOFF_BASE = 1.0  # リトライ間隔の基準秒数（1, 2, 4, ...秒と倍々に延ばす）
+RATE_LIMIT_REQUESTS = 60  # LINEのbroadcastのレート制限（リクエスト数）
+RATE_LIMIT_PERIOD = 3600  # 上記レート制限の期間（秒）
+DRAIN_TIMEOUT = 60  # close時に未送信の通知を送り切るまで待つ最大秒数
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()  # ワーカースレッド停止用の番兵
+
+
+class RateLimiter:
+    """トークンバケット方式で一定期間あたりのリクエスト数を制限するクラス
+
+    Attributes:
+        capacity (int): 期間あたりの最大リクエスト数
+        period (float): 期間（秒）
+    """
+
+    def __init__(self, capacity: int = RATE_LIMIT_REQUESTS, period: float = RATE_LIMIT_PERIOD):
+        self.capacity = capacity
+        self.period = period
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def acquire(self) -> None:
+        """トークンが1つ使えるようになるまで待機して消費する。"""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated_at) * self.capacity / self.period)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            time.sleep((1 - self.tokens) * self.period / self.capacity)
+
+
+class NotificationDispatcher:
+    """価格変更通知をキューに積み、バックグラウンドスレッドでまとめて送信するクラス
+
+    クロール中の処理（Twistedのリアクター）をLINE APIの応答待ちで止めないよう、
+    送信は専用スレッドで行う。キュー内の通知は最大5件ずつ1回のbroadcastにまとめる。
+    送信に成功した通知は、積むときに渡した on_sent を送信スレッドで呼び出す。
+
+    Attributes:
+        notifier (LineNotifier): 実際の送信を行う通知クラス
+        sent_count (int): 送信に成功したメッセージ数
+        failed_count (int): 送信を諦めたメッセージ数
+        latencies (list[float]): 通知を積んでから送信完了までの秒数
+    """
+
+    def __init__(self, notifier: LineNotifier, coalesce_wait: float = COALESCE_WAIT,
+                 max_retries: int = MAX_RETRIES, backoff_base: float = BACKOFF_BASE,
+                 rate_limiter: RateLimiter | None = None):
+        self.notifier = notifier
+        self.coalesce_wait = coalesce_wait
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.sent_count = 0
+        self.failed_count = 0
+        self.latencies: list[float] = []
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="line-notification-dispatcher",
+                                       daemon=True)
+        self.thread.start()
+
+    def enqueue(self, old_price, new_price, name, model, url, on_sent: Callable[[], None] | None = None) -> None:
+        """価格変更通知を送信キューに積む（すぐに戻る）。
+
+        Args:
+            on_sent: 送信に成功した後に送信スレッドで呼び出す関数（送信を諦めた場合は呼び出さない）
+        """
+        message = self.notifier.build_message(old_price, new_price, name, model, url)
+        self.queue.put((time.monotonic(), message, on_sent))
+
+    def close(self, timeout: float = DRAIN_TIMEOUT) -> None:
+        """キューに残った通知を送り切ってからワーカースレッドを終了する。"""
+        self.queue.put(_STOP)
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            logger.error(f"{timeout}秒以内に通知を送り切れませんでした。残り: 約{self.queue.qsize()}件")
+        logger.info(f"LINE通知の送信結果: 成功={self.sent_count}件, 失敗={self.failed_count}件")
+
+    def _run(self) -> None:
+        """キューから通知を取り出し、まとめて送信し続ける。"""
+        stopping = False
+        while not stopping:
+            first = self.queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+
+            # 後続の通知を少し待ち、1回のbroadcastにまとめる
+            deadline = time.monotonic() + self.coalesce_wait
+            while len(batch) < MAX_MESSAGES_PER_REQUEST:
+                try:
+                    entry = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            try:
+                self._send_with_retry(batch)
+            except Exception as e:
+                # メッセージの作成などで想定外の例外が起きても、送信スレッドを止めずに次の通知を送る
+                self.failed_count += len(batch)
+                logger.error(f"LINE通知の送信中に想定外のエラーが発生しました（{len(batch)}件）: {e}", exc_info=True)
+
+    def _send_with_retry(self, batch: list[tuple]) -> None:
+        """バックオフ付きでリトライしながら1回分のbroadcastを送信する。"""
+        messages = [message for _, message, _ in batch]
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            retry_after = None
+            try:
+                response = self.notifier.broadcast(messages)
+            except requests.RequestException as e:
+                logger.warning(f"LINE通知の送信中に例外が発生しました（{attempt + 1}回目）: {e}")
+            else:
+                if response.status_code == 200:
+                    self.sent_count += len(messages)
+                    self.latencies.extend(time.monotonic() - queued_at for queued_at, _, _ in batch)
+                    logger.info(f"通知が正常に送信されました。（{len(messages)}件）")
+                    self._notify_sent(batch)
+                    return
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    logger.error(
+                        f"通知の送信中にエラーが発生しました。ステータスコード: {response.status_code}, "
+                        f"レスポンス: {response.text}"
+                    )
+                    break
+                logger.warning(
+                    f"LINE通知の送信に失敗しました（{attempt + 1}回目）。"
+                    f"ステータスコード: {response.status_code}"
+                )
+                retry_after = response.headers.get("Retry-After")
+
+            if attempt < self.max_retries:
+                delay = self.backoff_base * 2 ** attempt
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+                time.sleep(delay)
+
+        self.failed_count += len(messages)
+        logger.error(f"LINE通知の送信を諦めました（{len(messages)}件）")
+
+    @staticmethod
+    def _notify_sent(batch: list[tuple]) -> None:
+        """送信に成功した通知の on_sent を呼び出す（失敗してもほかの通知の送信は続ける）。"""
+        for _, _, on_sent in batch:
+            if on_sent is None:
+                continue
+            try:
+                on_sent()
+            except Exception as e:
+                logger.error(f"通知の送信後の処理に失敗しました: {e}", exc_info=True)
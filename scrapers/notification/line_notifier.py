@@ -3,8 +3,11 @@ import logging
 import os
 
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
 REQUEST_URL = "https://api.line.me/v2/bot/message/broadcast"
+REQUEST_TIMEOUT = (5, 15)  # (接続, 読み込み) タイムアウト秒数
+MAX_MESSAGES_PER_REQUEST = 5  # LINEのbroadcastで1リクエストに含められるメッセージ数の上限
 
 # 環境変数を取得
 load_dotenv()
@@ -15,34 +18,54 @@ logger = logging.getLogger(__name__)
 
 
 class LineNotifier:
-    def __init__(self):
+    def __init__(self, request_url: str | None = None, timeout=REQUEST_TIMEOUT):
         self.access_token = os.getenv("LINE_ACCESS_TOKEN")
-        self.request_url = REQUEST_URL
+        # ローカルのスタブサーバーで検証できるよう、送信先を環境変数で差し替え可能にする
+        self.request_url = request_url or os.getenv("LINE_API_URL", REQUEST_URL)
+        self.timeout = timeout
 
         if not self.access_token:
             raise ValueError("LINE_ACCESS_TOKENが設定されていません。")
 
-    def send_notifications(self, old_price, new_price, name, model, url):
-        headers = {
+        # 接続を再利用するためのセッション
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.headers.update({
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.access_token}"
-        }
+        })
 
-        message = (
+    @staticmethod
+    def build_message(old_price, new_price, name, model, url) -> str:
+        """価格変更通知のメッセージ本文を作成する。"""
+        return (
             f"🍼ばぶー！おしらせでちゅ🍼\n"
             f"{name}-{model} が\n"
             f"¥{old_price}から¥{new_price} にかわったでちゅよ！\n"
             f"みてみてくだちゃい✨: {url}"
         )
 
+    def broadcast(self, messages: list[str]) -> requests.Response:
+        """複数のテキストメッセージを1回のbroadcastで送信する。
+
+        Raises:
+            ValueError: メッセージ数が上限を超えた場合
+            requests.RequestException: 通信に失敗した場合
+        """
+        if len(messages) > MAX_MESSAGES_PER_REQUEST:
+            raise ValueError(f"1回に送信できるメッセージは{MAX_MESSAGES_PER_REQUEST}件までです。")
+        return self.session.post(
+            self.request_url,
+            json={"messages": [{"type": "text", "text": message} for message in messages]},
+            timeout=self.timeout,
+        )
+
+    def send_notifications(self, old_price, new_price, name, model, url):
+        message = self.build_message(old_price, new_price, name, model, url)
+
         try:
-            response=requests.post(
-                self.request_url,
-                headers=headers,
-                json={
-                    "messages": [{"type": "text","text": message}]
-                }
-            )
+            response = self.broadcast([message])
 
             if response.status_code == 200:
                 logger.info("通知が正常に送信されました。")
@@ -0,0 +1,7 @@
+"""scrapers/ 直下のパッケージ（dell, notification など）をスクレイパーと同じ名前で読み込めるようにする。"""
+import os
+import sys
+
+SCRAPERS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRAPERS_DIR not in sys.path:
+    sys.path.insert(0, SCRAPERS_DIR)
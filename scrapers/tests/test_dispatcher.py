@@ -0,0 +1,154 @@
+"""NotificationDispatcher のテスト（LINE_API_URL でローカルのスタブHTTPサーバーに送信する）
+
+    cd scrapers
+    python -m pytest tests
+"""
+import json
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from notification.dispatcher import NotificationDispatcher, RateLimiter
+from notification.line_notifier import LineNotifier, MAX_MESSAGES_PER_REQUEST
+
+
+class StubLineServer(ThreadingHTTPServer):
+    """broadcast を受け取り、responses の (ステータスコード, ヘッダー) を順に返すスタブ（最後の応答を返し続ける）"""
+
+    def __init__(self, responses: list[tuple[int, dict]]):
+        super().__init__(("127.0.0.1", 0), StubLineHandler)
+        self.responses = list(responses)
+        self.requests = []  # (受信時刻, Authorization, メッセージ本文のリスト)
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v2/bot/message/broadcast"
+
+    def next_response(self, authorization: str, messages: list[str]) -> tuple[int, dict]:
+        with self.lock:
+            self.requests.append((time.monotonic(), authorization, messages))
+            return self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+
+
+class StubLineHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        messages = [message["text"] for message in body["messages"]]
+        status, headers = self.server.next_response(self.headers.get("Authorization"), messages)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server(request, monkeypatch):
+    server = StubLineServer(getattr(request, "param", [(200, {})]))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("LINE_ACCESS_TOKEN", "test-token")
+    monkeypatch.setenv("LINE_API_URL", server.url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_dispatcher(notifier=None, **kwargs) -> NotificationDispatcher:
+    options = {"coalesce_wait": 0.2, "backoff_base": 0.01, "rate_limiter": RateLimiter(capacity=1000, period=1)}
+    options.update(kwargs)
+    return NotificationDispatcher(notifier or LineNotifier(), **options)
+
+
+def enqueue(dispatcher: NotificationDispatcher, index: int, on_sent=None) -> None:
+    dispatcher.enqueue(old_price=100000, new_price=90000 + index, name="Inspiron 14 ノートパソコン",
+                       model=f"CN{index:07d}", url=f"https://www.dell.com/ja-jp/{index}", on_sent=on_sent)
+
+
+def test_sends_to_stub_server(stub_server):
+    sent = []
+    dispatcher = make_dispatcher()
+    enqueue(dispatcher, 1, on_sent=lambda: sent.append(1))
+    dispatcher.close(timeout=5)
+
+    assert len(stub_server.requests) == 1
+    _, authorization, messages = stub_server.requests[0]
+    assert authorization == "Bearer test-token"
+    assert len(messages) == 1 and "CN0000001" in messages[0]
+    assert (dispatcher.sent_count, dispatcher.failed_count) == (1, 0)
+    assert sent == [1]
+
+
+@pytest.mark.parametrize("stub_server", [[(429, {"Retry-After": "1"}), (200, {})]], indirect=True)
+def test_waits_for_retry_after_on_429(stub_server):
+    dispatcher = make_dispatcher()
+    enqueue(dispatcher, 1)
+    dispatcher.close(timeout=5)
+
+    assert len(stub_server.requests) == 2
+    # バックオフ（0.01秒）より長い Retry-After（1秒）だけ待ってから再送する
+    assert stub_server.requests[1][0] - stub_server.requests[0][0] >= 1
+    assert (dispatcher.sent_count, dispatcher.failed_count) == (1, 0)
+
+
+@pytest.mark.parametrize("stub_server", [[(500, {}), (500, {}), (200, {})]], indirect=True)
+def test_retries_server_errors(stub_server):
+    dispatcher = make_dispatcher()
+    enqueue(dispatcher, 1)
+    dispatcher.close(timeout=5)
+
+    assert len(stub_server.requests) == 3
+    assert (dispatcher.sent_count, dispatcher.failed_count) == (1, 0)
+
+
+@pytest.mark.parametrize("stub_server", [[(500, {})]], indirect=True)
+def test_gives_up_after_max_retries(stub_server):
+    sent = []
+    dispatcher = make_dispatcher(max_retries=2)
+    enqueue(dispatcher, 1, on_sent=lambda: sent.append(1))
+    dispatcher.close(timeout=5)
+
+    assert len(stub_server.requests) == 3
+    assert (dispatcher.sent_count, dispatcher.failed_count) == (0, 1)
+    assert sent == []
+
+
+def test_batches_up_to_five_messages(stub_server):
+    dispatcher = make_dispatcher(coalesce_wait=0.5)
+    for index in range(MAX_MESSAGES_PER_REQUEST + 2):
+        enqueue(dispatcher, index)
+    dispatcher.close(timeout=5)
+
+    assert [len(messages) for _, _, messages in stub_server.requests] == [MAX_MESSAGES_PER_REQUEST, 2]
+    assert dispatcher.sent_count == MAX_MESSAGES_PER_REQUEST + 2
+
+
+def test_keeps_sending_after_unexpected_error(stub_server):
+    class BrokenOnceNotifier(LineNotifier):
+        def __init__(self):
+            super().__init__()
+            self.calls = 0
+
+        def broadcast(self, messages):
+            self.calls += 1
+            if self.calls == 1:
+                raise KeyError("text")
+            return super().broadcast(messages)
+
+    dispatcher = make_dispatcher(BrokenOnceNotifier(), coalesce_wait=0)
+    enqueue(dispatcher, 1)
+    time.sleep(0.2)
+    enqueue(dispatcher, 2)
+    dispatcher.close(timeout=5)
+
+    assert not dispatcher.thread.is_alive()
+    assert (dispatcher.sent_count, dispatcher.failed_count) == (1, 1)
+    assert "CN0000002" in stub_server.requests[0][2][0]
@@ -0,0 +1,44 @@
+"""スクレイパー（dell/items.py）と API（api/utils/text.py）の normalize_name が同じ結果を返すことのテスト
+
+APIは Products.normalized_name（スクレイパーが保存した値）を normalize_name した商品名で検索するため、
+2つの実装がずれると商品が見つからなくなる。APIとスクレイパーは別々にデプロイするため実装は共有せず、
+このテストで一致を確認する。
+"""
+import importlib.util
+import os
+
+import pytest
+
+from dell.items import normalize_name
+
+API_TEXT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "api", "utils", "text.py")
+
+# 一覧ページに表示される商品名（表記揺らぎを含む）と正規化後の値
+DELL_PRODUCT_NAMES = [
+    ("Inspiron 14 ノートパソコン", "inspiron14ノートパソコン"),
+    ("inspiron14ノートパソコン", "inspiron14ノートパソコン"),
+    ("Inspiron 14  ノートパソコン", "inspiron14ノートパソコン"),
+    ("Ｉｎｓｐｉｒｏｎ　１４　ノートパソコン", "inspiron14ノートパソコン"),
+    ("XPS 13 ノートパソコン", "xps13ノートパソコン"),
+    ("New XPS 14 ノートパソコン", "newxps14ノートパソコン"),
+    ("Dell 14 Plus ノートパソコン", "dell14plusノートパソコン"),
+    ("Alienware m18 R2 ゲーミング ノートパソコン", "alienwarem18r2ゲーミングノートパソコン"),
+    ("Latitude 5550 ﾉｰﾄﾊﾟｿｺﾝ", "latitude5550ノートパソコン"),
+    ("Vostro 16\tノートパソコン\n", "vostro16ノートパソコン"),
+    ("Precision 3591 ワークステーション", "precision3591ワークステーション"),
+]
+
+
+def load_api_normalize_name():
+    spec = importlib.util.spec_from_file_location("api_utils_text", API_TEXT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.normalize_name
+
+
+@pytest.mark.parametrize("name, expected", DELL_PRODUCT_NAMES)
+def test_scraper_and_api_normalize_name_match(name, expected):
+    api_normalize_name = load_api_normalize_name()
+
+    assert normalize_name(name) == expected
+    assert api_normalize_name(name) == expected